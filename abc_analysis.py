@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+محرك تحليل ABC
+ABC Analysis - set-based consumption rollup with vectorized classification
+
+بدلاً من تحميل كل صنف ثم استعلام حركاته (N+1) والجمع في Python:
+1. item_consumption_daily: استهلاك وقيمة كل صنف لكل يوم، يُحدث تدريجياً
+   باستعلام مجمع واحد على الحركات الجديدة فقط (created_at بعد علامة المياه
+   العالية = أكبر last_transaction_at في الجدول)
+2. لكل فترة (monthly 30 يوماً، quarterly 91، yearly 365) استعلام مجمع واحد
+   على الجدول اليومي داخل نافذة الفترة فعلاً
+3. التصنيف دفعة واحدة بـ NumPy: ترتيب تنازلي حسب القيمة ثم النسبة التراكمية
+   (A حتى 80%، B حتى 95%، C الباقي)
+4. حذف نتائج الفترة وإدراجها دفعة واحدة في inventory_abc_analysis
+
+مع تقسيم المراكز (center_shards) يُحدث كل مركز على قاعدته (for_each_center)،
+فلكل مركز جدوله اليومي وعلامة مياهه العالية.
+
+الحركات تُقرأ بتأخير ABC_REFRESH_LAG_SECONDS حتى لا تفوت حركة لم تُثبت
+معاملتها بعد. تعديل حركة قديمة (edit_transaction) لا يظهر إلا بإعادة البناء
+الكاملة:
+    flask abc-analysis --period yearly [--full]
+"""
+
+import click
+import numpy as np
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, bindparam, delete, func, insert, select, tuple_, update
+from models import db, Transaction, InventoryABCAnalysis, ItemConsumptionDaily
+from center_shards import for_each_center
+
+PERIOD_DAYS = OrderedDict([('monthly', 30), ('quarterly', 91), ('yearly', 365)])
+
+# حدود النسبة التراكمية للفئات
+CATEGORY_LIMITS = (('A', 80.0), ('B', 95.0))
+
+
+def _as_date(value):
+    """func.date يعيد نصاً في SQLite وتاريخاً في MySQL"""
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _consumption_rows(since=None, until=None):
+    """عبارة مجمعة: (item_id، اليوم، الكمية، القيمة، عدد الحركات، آخر created_at)"""
+    transactions = Transaction.__table__
+    day = func.date(transactions.c.transaction_date)
+    statement = select(
+        transactions.c.item_id,
+        day.label('day'),
+        func.sum(transactions.c.quantity),
+        func.sum(func.coalesce(transactions.c.total_value, 0)),
+        func.count(),
+        func.max(transactions.c.created_at),
+    ).group_by(transactions.c.item_id, day)
+    if since is not None:
+        statement = statement.where(transactions.c.created_at > since)
+    if until is not None:
+        statement = statement.where(transactions.c.created_at <= until)
+    return statement
+
+
+def refresh_consumption_rollup(full=False, now=None):
+    """تحديث الجدول اليومي من الحركات الجديدة - يعيد عدد الحركات المضافة"""
+    daily = ItemConsumptionDaily.__table__
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(seconds=current_app.config.get('ABC_REFRESH_LAG_SECONDS', 300))
+
+    if full:
+        db.session.execute(delete(daily))
+        high_water_mark = None
+        cutoff = None
+    else:
+        high_water_mark = db.session.execute(select(func.max(daily.c.last_transaction_at))).scalar()
+
+    rows = db.session.execute(_consumption_rows(high_water_mark, cutoff)).all()
+    if not rows:
+        return 0
+
+    batch = {}
+    for item_id, day, quantity, value, count, last_at in rows:
+        batch[(item_id, _as_date(day))] = (quantity or 0, value or 0, count, last_at)
+
+    # الأيام الموجودة تُضاف إليها القيم، والجديدة تُدرج - عبارة واحدة لكل نوع
+    existing = set()
+    keys = list(batch)
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        existing.update(
+            (item_id, _as_date(day)) for item_id, day in db.session.execute(
+                select(daily.c.item_id, daily.c.day).where(tuple_(daily.c.item_id, daily.c.day).in_(chunk))
+            )
+        )
+
+    updates = [
+        {'key_item': item_id, 'key_day': day, 'add_quantity': quantity, 'add_value': value,
+         'add_count': count, 'last_at': last_at}
+        for (item_id, day), (quantity, value, count, last_at) in batch.items() if (item_id, day) in existing
+    ]
+    inserts = [
+        {'item_id': item_id, 'day': day, 'quantity': quantity, 'value': value,
+         'transaction_count': count, 'last_transaction_at': last_at}
+        for (item_id, day), (quantity, value, count, last_at) in batch.items() if (item_id, day) not in existing
+    ]
+    if updates:
+        db.session.execute(
+            update(daily)
+            .where(and_(daily.c.item_id == bindparam('key_item'), daily.c.day == bindparam('key_day')))
+            .values(
+                quantity=daily.c.quantity + bindparam('add_quantity'),
+                value=daily.c.value + bindparam('add_value'),
+                transaction_count=daily.c.transaction_count + bindparam('add_count'),
+                # الحركات الجديدة دائماً بعد علامة المياه العالية
+                last_transaction_at=bindparam('last_at'),
+            ),
+            updates,
+        )
+    if inserts:
+        db.session.execute(insert(daily), inserts)
+    return sum(count for _, _, count, _ in batch.values())
+
+
+def classify(values):
+    """فئات ABC ونسبة كل قيمة من المجموع - مصفوفات بنفس ترتيب المدخلات"""
+    values = np.asarray(values, dtype=float)
+    total = values.sum()
+    if not len(values) or total <= 0:
+        return np.array([], dtype='<U1'), np.zeros(len(values))
+
+    share = values / total * 100
+    order = np.argsort(-values, kind='stable')
+    cumulative = np.empty_like(share)
+    cumulative[order] = np.cumsum(share[order])
+
+    categories = np.full(len(values), 'C', dtype='<U1')
+    for category, limit in reversed(CATEGORY_LIMITS):
+        categories[cumulative <= limit] = category
+    return categories, share
+
+
+def regenerate_abc_analysis(period='yearly', today=None):
+    """إعادة تصنيف فترة من الجدول اليومي - يعيد عدد الأصناف المصنفة"""
+    daily = ItemConsumptionDaily.__table__
+    today = today or date.today()
+    window_days = PERIOD_DAYS.get(period, PERIOD_DAYS['yearly'])
+    since = today - timedelta(days=window_days)
+
+    rows = db.session.execute(
+        select(daily.c.item_id, func.sum(daily.c.quantity), func.sum(daily.c.value))
+        .where(daily.c.day > since, daily.c.day <= today)
+        .group_by(daily.c.item_id)
+        .having(func.sum(daily.c.value) > 0)
+    ).all()
+
+    analysis = InventoryABCAnalysis.__table__
+    db.session.execute(delete(analysis).where(analysis.c.period == period))
+    if not rows:
+        return 0
+
+    item_ids = [row[0] for row in rows]
+    consumption = np.array([row[1] or 0 for row in rows], dtype=float)
+    values = np.array([row[2] or 0 for row in rows], dtype=float)
+    categories, share = classify(values)
+    # معدل الاستهلاك الشهري
+    monthly_rate = consumption / max(window_days / 30.0, 1.0)
+
+    now = datetime.utcnow()
+    db.session.execute(insert(InventoryABCAnalysis), [
+        {
+            'item_id': item_id,
+            'analysis_date': today,
+            'period': period,
+            'abc_category': str(categories[index]),
+            'annual_consumption': float(consumption[index]),
+            'annual_value': float(values[index]),
+            'consumption_rate': float(monthly_rate[index]),
+            'percentage_of_total': float(share[index]),
+            'created_at': now,
+            'updated_at': now,
+        }
+        for index, item_id in enumerate(item_ids)
+    ])
+    return len(item_ids)
+
+
+def run_abc_analysis(periods=None, full=False):
+    """تحديث الجدول اليومي ثم تصنيف الفترات المطلوبة (المستدعي يثبت المعاملة)"""
+    processed = refresh_consumption_rollup(full=full)
+    classified = OrderedDict(
+        (period, regenerate_abc_analysis(period)) for period in (periods or PERIOD_DAYS)
+    )
+    return processed, classified
+
+
+def run_abc_analysis_for_centers(periods=None, full=False):
+    """run_abc_analysis على كل قاعدة مراكز مع التثبيت - المجاميع عبر المراكز"""
+    results = for_each_center(lambda: run_abc_analysis(periods, full))
+    processed = sum(result[0] for result in results.values())
+    classified = OrderedDict(
+        (period, sum(result[1][period] for result in results.values())) for period in (periods or PERIOD_DAYS)
+    )
+    return processed, classified
+
+
+def init_abc_analysis(app):
+    """تسجيل أمر التحديث الليلي"""
+
+    @app.cli.command('abc-analysis')
+    @click.option('--period', 'periods', multiple=True, type=click.Choice(list(PERIOD_DAYS)),
+                  help='الفترة (يمكن تكرارها) - افتراضياً جميع الفترات')
+    @click.option('--full', is_flag=True, help='إعادة بناء الاستهلاك اليومي من جميع الحركات')
+    def abc_analysis_command(periods, full):
+        """تحديث تحليل ABC من الحركات الجديدة"""
+        processed, classified = run_abc_analysis_for_centers(periods, full)
+        click.echo(f'{processed} حركة جديدة')
+        for period, count in classified.items():
+            click.echo(f'{period}: {count} صنف')
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+سكريبت إضافة الأعمدة الجديدة لدعم الذاكرة المؤقتة وتحسين الأداء
+Script to add new columns for caching and performance features
+"""
+
+from app import create_app, db
+from sqlalchemy import inspect, text
+import sys
+
+
+def seed_stock_value():
+    """قيمة الرصيد الحالي بسعر الوحدة (مع الطبقات الافتتاحية وإجماليات المراكز)"""
+    from center_shards import for_each_center
+    from stock_costing import rebuild_stock_costing
+    count = sum(for_each_center(rebuild_stock_costing).values())
+    print(f"✅ تم بناء قيمة المخزون لـ {count} صنف")
+
+
+def seed_inventory_alerts():
+    """ربط الإنذارات المفتوحة بمفاتيحها وتقييم القواعد لجميع الأصناف (لوحة نقص المخزون)"""
+    from center_shards import for_each_center
+    from inventory_alerts import rebuild_item_alerts
+    count = sum(for_each_center(rebuild_item_alerts).values())
+    print(f"✅ تم تقييم إنذارات {count} صنف")
+
+
+# تعبئة الأعمدة المضافة من البيانات الموجودة: (اسم الجدول, اسم العمود) -> دالة
+BACKFILLS = {
+    ('items', 'stock_value'): seed_stock_value,
+    ('smart_inventory_alerts', 'dedup_key'): seed_inventory_alerts,
+}
+
+def add_columns_if_not_exists():
+    """إضافة الأعمدة الجديدة إذا لم تكن موجودة"""
+
+    app = create_app('development')
+
+    with app.app_context():
+        try:
+            print("=" * 80)
+            print("🔄 بدء إضافة أعمدة تحسين الأداء")
+            print("=" * 80)
+
+            conn = db.engine.connect()
+            inspector = inspect(db.engine)
+
+            # قائمة الأعمدة المراد إضافتها
+            columns_to_add = [
+                # (اسم الجدول, اسم العمود, تعريف العمود)
+                ('users', 'permission_version', 'INTEGER NOT NULL DEFAULT 0'),
+                ('items', 'stock_version', 'INTEGER NOT NULL DEFAULT 0'),
+                ('items', 'stock_value', 'FLOAT NOT NULL DEFAULT 0'),
+                ('smart_inventory_alerts', 'dedup_key', 'VARCHAR(100)'),
+            ]
+
+            added = []
+            for table_name, column_name, column_def in columns_to_add:
+                # التحقق من وجود الجدول
+                if table_name not in inspector.get_table_names():
+                    print(f"⚠️  الجدول {table_name} غير موجود")
+                    continue
+
+                # التحقق من وجود العمود
+                columns = [col['name'] for col in inspector.get_columns(table_name)]
+
+                if column_name not in columns:
+                    try:
+                        alter_sql = f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_def}"
+                        conn.execute(text(alter_sql))
+                        conn.commit()
+                        added.append((table_name, column_name))
+                        print(f"✅ تم إضافة العمود {column_name} إلى {table_name}")
+                    except Exception as e:
+                        print(f"❌ خطأ في إضافة {column_name} إلى {table_name}: {str(e)}")
+                else:
+                    print(f"ℹ️  العمود {column_name} موجود بالفعل في {table_name}")
+
+            conn.close()
+
+            # تعبئة الأعمدة الجديدة (الجداول المساعدة تُنشأ إن لم تكن موجودة)
+            backfills = [BACKFILLS[column] for column in added if column in BACKFILLS]
+            if backfills:
+                db.create_all()
+                for backfill in backfills:
+                    backfill()
+                db.session.commit()
+
+            print("\n" + "=" * 80)
+            print("✅ تم إضافة الأعمدة بنجاح!")
+            print("=" * 80)
+
+            return True
+
+        except Exception as e:
+            print(f"\n❌ خطأ: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == '__main__':
+    success = add_columns_if_not_exists()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+سكريبت إضافة الفهارس المعرفة في النماذج إلى قاعدة بيانات موجودة
+Script to create model-defined indexes that are missing from an existing database
+
+db.create_all() لا يضيف فهارس إلى جداول موجودة مسبقاً، لذلك يقارن هذا
+السكريبت فهارس كل جدول في النماذج (مثل الفهارس المركبة التي تبدأ بـ center_id)
+مع الفهارس الموجودة وينشئ الناقص فقط.
+
+يشمل ذلك مجموعة الفهارس المركبة لأنماط الاستعلام الأكثر تكراراً (transactions،
+meal_records، employee_meal_transactions، notifications، activity_logs،
+item_issues). للبحث عن قراءات كاملة أخرى: flask index-advisor
+
+نماذج models/security_enhanced.py مسجلة في metadata خاصة بها (نسخة SQLAlchemy
+منفصلة) فتُفحص جداولها أيضاً - مثل فهرس rate_limit_violations.timestamp الذي
+يعتمد عليه الحذف على دفعات.
+"""
+
+from app import create_app, db
+from sqlalchemy import inspect
+import sys
+
+
+def model_metadatas():
+    """metadata النماذج الرئيسية ثم metadata نماذج security_enhanced"""
+    from security_services import PasswordPolicy
+    return [db.metadata, PasswordPolicy.metadata]
+
+
+def create_missing_indexes():
+    """إنشاء فهارس النماذج الناقصة في الجداول الموجودة - يعيد أسماء الفهارس المنشأة"""
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+
+    # metadata الأمان تحمل أيضاً نسخة من جداول models.py؛ نسخة db.metadata أولاً
+    tables = {}
+    for metadata in model_metadatas():
+        for table in metadata.tables.values():
+            tables.setdefault(table.name, table)
+
+    for table in sorted(tables.values(), key=lambda table: table.name):
+        if table.name not in existing_tables:
+            continue
+
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name in existing:
+                continue
+            try:
+                index.create(db.engine)
+                created.append(index.name)
+                columns = ', '.join(column.name for column in index.columns)
+                print(f"✅ تم إنشاء الفهرس {index.name} على {table.name} ({columns})")
+            except Exception as e:
+                print(f"❌ خطأ في إنشاء {index.name}: {str(e)}")
+    return created
+
+
+def add_indexes_if_not_exist(config_name='development'):
+    """إنشاء الفهارس الناقصة"""
+
+    app = create_app(config_name)
+
+    with app.app_context():
+        try:
+            print("=" * 80)
+            print("🔄 بدء إضافة فهارس تحسين الأداء")
+            print("=" * 80)
+
+            created = create_missing_indexes()
+
+            print("\n" + "=" * 80)
+            print(f"✅ تم إنشاء {len(created)} فهرس")
+            print("=" * 80)
+
+            return True
+
+        except Exception as e:
+            print(f"\n❌ خطأ: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == '__main__':
+    success = add_indexes_if_not_exist()
+    sys.exit(0 if success else 1)
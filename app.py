@@ -1,12 +1,34 @@
-from flask import Flask, render_template, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, redirect, url_for, flash, session, jsonify, request, has_request_context
 from flask_login import LoginManager, current_user, login_required
 from config import config
 from models import db, User, OrganizationSettings, UserRole, Notification
 from permissions_config import get_all_permissions_flat
+from fragment_cache import render_sidebar, init_fragment_cache
+from org_settings_cache import get_org_settings, init_org_settings_cache
+from identity_cache import load_cached_user, init_identity_cache
+from log_retention import init_log_retention
+from index_advisor import init_index_advisor
+from center_shards import init_center_shards
+from abc_analysis import init_abc_analysis
+from cost_analysis_engine import init_cost_analysis
+from stock_snapshots import init_stock_snapshots
+from stock_costing import init_stock_costing
+from inventory_alerts import init_inventory_alerts
 import os
 import click
 from datetime import datetime, timedelta
 import base64
+import hashlib
+
+class FingerprintedStaticFlask(Flask):
+    """تخزين طويل للملفات الثابتة المطلوبة ببصمة المحتوى فقط"""
+
+    def get_send_file_max_age(self, filename):
+        # رابط static_url يتغير مع المحتوى؛ الروابط بدون بصمة تبقى على الإعداد الافتراضي
+        if has_request_context() and request.args.get('v'):
+            return int(self.config['STATIC_FINGERPRINT_MAX_AGE'].total_seconds())
+        return super().get_send_file_max_age(filename)
+
 
 def create_app(config_name=None):
     """مصنع التطبيق"""
@@ -16,13 +38,28 @@ def create_app(config_name=None):
     
     config_class = config.get(config_name, config['default'])
     
-    app = Flask(__name__)
+    app = FingerprintedStaticFlask(__name__)
     app.config.from_object(config_class)
     config_class.init_app(app)
     
     # تهيئة قاعدة البيانات
     db.init_app(app)
     
+    # تهيئة ذاكرة الصلاحيات المؤقتة
+    from permission_cache import init_permission_cache
+    init_permission_cache(app)
+    init_fragment_cache(app)
+    init_org_settings_cache(app)
+    init_identity_cache(app)
+    init_log_retention(app)
+    init_index_advisor(app)
+    init_center_shards(app)
+    init_abc_analysis(app)
+    init_cost_analysis(app)
+    init_stock_snapshots(app)
+    init_stock_costing(app)
+    init_inventory_alerts(app)
+    
     # تهيئة نظام الأمان المتقدم (Phase 2)
     try:
         from security_middleware import init_security_middleware
@@ -46,7 +83,8 @@ def create_app(config_name=None):
     
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(user_id)
+        # نسخة هوية قصيرة المدة بدلاً من استعلام في كل طلب
+        return load_cached_user(user_id)
     
     # تسجيل Blueprints
     from routes.auth import auth_bp
@@ -89,11 +127,27 @@ def create_app(config_name=None):
             return base64.b64encode(data).decode('utf-8')
         return data
     
+    # بصمات الملفات الثابتة (تحسب مرة واحدة لكل عملية)
+    static_fingerprints = {}
+    
+    @app.template_global('static_url')
+    def static_url(filename):
+        """رابط ملف ثابت مع بصمة المحتوى حتى يتم تخزينه في المتصفح لمدة طويلة"""
+        fingerprint = static_fingerprints.get(filename)
+        if fingerprint is None:
+            try:
+                with open(os.path.join(app.static_folder, filename), 'rb') as f:
+                    fingerprint = hashlib.md5(f.read()).hexdigest()[:12]
+            except OSError:
+                fingerprint = ''
+            static_fingerprints[filename] = fingerprint
+        return url_for('static', filename=filename, v=fingerprint)
+    
     # Context processor
     @app.context_processor
     def inject_org_settings():
         """إدراج إعدادات المؤسسة في جميع القوالب"""
-        org_settings = OrganizationSettings.query.first()
+        org_settings = get_org_settings()
         if not org_settings:
             org_settings = OrganizationSettings()
         
@@ -103,11 +157,19 @@ def create_app(config_name=None):
                 return False
             return current_user.has_granular_permission(permission_key)
         
+        def has_any_permission(*permission_keys):
+            """التحقق من وجود صلاحية واحدة على الأقل (قناع بت)"""
+            if not current_user.is_authenticated:
+                return False
+            return current_user.has_any_permission(*permission_keys)
+        
         return {
             'org_settings': org_settings,
             'current_year': datetime.now().year,
             'current_user': current_user,
             'has_permission': has_permission,
+            'has_any_permission': has_any_permission,
+            'render_sidebar': render_sidebar,
             'utcnow': datetime.utcnow,
             'now': datetime.utcnow,
         }
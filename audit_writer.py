@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+كاتب سجل التدقيق غير المتزامن
+Audit Writer - bounded queue drained by a background thread with bulk inserts
+
+AuditTrailMiddleware يضع سجلات الطلبات (POST/PUT/DELETE/PATCH) في طابور
+محدود الحجم بدلاً من commit إضافي في مسار الاستجابة. خيط خلفي يسحب السجلات
+ويكتبها بعبارة INSERT واحدة لكل دفعة عند:
+- امتلاء الدفعة (AUDIT_BATCH_SIZE)
+- مرور AUDIT_FLUSH_SECONDS ثانية
+- إيقاف العملية (atexit)
+
+سياسة الامتلاء (AUDIT_OVERFLOW_POLICY):
+- drop_newest: تجاهل السجل الجديد (افتراضي - لا يتأخر الطلب أبداً)
+- drop_oldest: حذف أقدم سجل في الطابور لإفساح المجال
+- block: انتظار مكان لمدة AUDIT_BLOCK_TIMEOUT ثانية ثم التجاهل
+"""
+
+import os
+import time
+import queue
+import atexit
+import threading
+from flask import current_app
+
+# علامة لإيقاظ الخيط عند الإيقاف
+_STOP = object()
+
+
+class AuditWriter:
+    """طابور محدود + خيط كتابة بالدفعات"""
+
+    OVERFLOW_POLICIES = ('drop_newest', 'drop_oldest', 'block')
+
+    def __init__(self, max_queue=10000, batch_size=200, flush_seconds=2.0,
+                 overflow_policy='drop_newest', block_timeout=0.05, autostart=True):
+        if overflow_policy not in self.OVERFLOW_POLICIES:
+            raise ValueError(f'Unknown audit overflow policy: {overflow_policy}')
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.autostart = autostart
+        self.app = None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        # المقاييس
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+
+    # ---------------------- الإضافة ----------------------
+
+    def enqueue(self, row):
+        """إضافة سجل إلى الطابور حسب سياسة الامتلاء - إرجاع False إذا تم تجاهله"""
+        if self.autostart:
+            self._ensure_started()
+        try:
+            if self.overflow_policy == 'block':
+                self._queue.put(row, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(row)
+        except queue.Full:
+            if self.overflow_policy != 'drop_oldest':
+                self.dropped += 1
+                return False
+            try:
+                self._queue.get_nowait()
+                self.dropped += 1
+                self._queue.put_nowait(row)
+            except (queue.Empty, queue.Full):
+                self.dropped += 1
+                return False
+        self.enqueued += 1
+        return True
+
+    # ---------------------- الخيط الخلفي ----------------------
+
+    def _ensure_started(self):
+        """تشغيل الخيط عند أول استخدام (وبعد fork في عمليات gunicorn)"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._write(batch)
+
+    def _collect(self):
+        """انتظار دفعة كاملة أو انتهاء مهلة الكتابة"""
+        batch = []
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                break
+            try:
+                row = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if row is _STOP:
+                break
+            batch.append(row)
+        return batch
+
+    def _drain(self):
+        """سحب كل ما في الطابور حالياً"""
+        batch = []
+        while True:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                return batch
+            if row is not _STOP:
+                batch.append(row)
+
+    def _write(self, rows):
+        """كتابة دفعة بعبارة INSERT واحدة في اتصال مستقل"""
+        if self.app is None:
+            self.failed += len(rows)
+            return
+
+        from models import db
+        from security_middleware import SecurityLog
+        from security_rollups import log_deltas, apply_rollup_deltas
+
+        started = time.perf_counter()
+        with self._flush_lock, self.app.app_context():
+            try:
+                for start in range(0, len(rows), self.batch_size):
+                    chunk = rows[start:start + self.batch_size]
+                    with db.engine.begin() as conn:
+                        conn.execute(SecurityLog.__table__.insert(), chunk)
+                        # ملخصات لوحة تحكم الأمان في نفس المعاملة
+                        apply_rollup_deltas(conn, log_deltas(chunk))
+                    self.batches += 1
+                self.written += len(rows)
+            except Exception as e:
+                self.failed += len(rows)
+                current_app.logger.error(f'Error writing audit trail batch: {str(e)}')
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    # ---------------------- الإيقاف ----------------------
+
+    def flush(self):
+        """كتابة كل ما في الطابور فوراً (للإيقاف والاختبارات)"""
+        batch = self._drain()
+        if batch:
+            self._write(batch)
+        return len(batch)
+
+    def shutdown(self, timeout=5):
+        """إيقاف الخيط وكتابة السجلات المتبقية"""
+        self._stop.set()
+        if self._thread is not None and self._pid == os.getpid():
+            try:
+                self._queue.put_nowait(_STOP)
+            except queue.Full:
+                pass
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        """مقاييس الطابور"""
+        return {
+            'queue_depth': self._queue.qsize(),
+            'queue_capacity': self._queue.maxsize,
+            'overflow_policy': self.overflow_policy,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'batches': self.batches,
+            'last_flush_ms': round(self.last_flush_ms, 3),
+            'running': bool(self._thread and self._thread.is_alive()),
+        }
+
+
+_audit_writer = None
+
+
+def get_audit_writer():
+    """كاتب سجل التدقيق للعملية الحالية"""
+    return _audit_writer
+
+
+def get_audit_writer_stats():
+    """مقاييس كاتب سجل التدقيق"""
+    return _audit_writer.stats() if _audit_writer else {}
+
+
+def init_audit_writer(app):
+    """تهيئة كاتب سجل التدقيق من إعدادات التطبيق"""
+    global _audit_writer
+
+    if _audit_writer is not None:
+        _audit_writer.shutdown()
+
+    _audit_writer = AuditWriter(
+        max_queue=app.config.get('AUDIT_QUEUE_SIZE', 10000),
+        batch_size=app.config.get('AUDIT_BATCH_SIZE', 200),
+        flush_seconds=app.config.get('AUDIT_FLUSH_SECONDS', 2.0),
+        overflow_policy=app.config.get('AUDIT_OVERFLOW_POLICY', 'drop_newest'),
+        block_timeout=app.config.get('AUDIT_BLOCK_TIMEOUT', 0.05),
+    )
+    _audit_writer.app = app
+    return _audit_writer
+
+
+@atexit.register
+def _shutdown_audit_writer():
+    if _audit_writer is not None:
+        _audit_writer.shutdown()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+إحصائيات المراكز المجمعة
+Center Stats - every counter for every center in one grouped query, with a short TTL cache
+
+بدلاً من 5-7 استعلامات COUNT لكل مركز (الموظفون، المواد، الموردون، الوصفات،
+الحركات) تُجمع العدادات لجميع المراكز المطلوبة في عبارة واحدة:
+    SELECT center_id, 'employees', COUNT(*) FROM users WHERE ... GROUP BY center_id
+    UNION ALL SELECT center_id, 'inventory_items', COUNT(*) FROM items ...
+    ...
+وتُخزن النتائج لكل مركز لمدة CENTER_STATS_TTL_SECONDS، فتعرض قائمة المؤسس
+جميع المراكز باستعلام واحد على الأكثر.
+
+عند تفعيل تقسيم المراكز (center_shards) تُنفذ عدادات الجداول المقسمة على
+قاعدة كل مركز بالتوازي عبر federated_map، وعداد الموظفين مركزياً.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy import func, literal, select, union_all
+from models import db, User, Item, Supplier, Recipe, Transaction
+from center_shards import federated_map, get_shard_router
+
+
+def _counter_definitions():
+    """اسم العداد -> (النموذج، شروط إضافية)"""
+    return OrderedDict([
+        ('employees', (User, [User.is_active.is_(True)])),
+        ('inventory_items', (Item, [Item.is_active.is_(True)])),
+        ('suppliers', (Supplier, [Supplier.is_active.is_(True)])),
+        ('recipes', (Recipe, [Recipe.is_active.is_(True)])),
+        ('total_transactions', (Transaction, [])),
+    ])
+
+
+COUNTER_NAMES = tuple(_counter_definitions())
+
+
+def empty_counters():
+    return dict.fromkeys(COUNTER_NAMES, 0)
+
+
+def counters_statement(center_ids, names=COUNTER_NAMES):
+    """عبارة UNION ALL واحدة: (center_id، اسم العداد، العدد) لكل مركز"""
+    definitions = _counter_definitions()
+    parts = []
+    for name in names:
+        model, conditions = definitions[name]
+        parts.append(
+            select(model.center_id, literal(name).label('counter'), func.count().label('total'))
+            .where(model.center_id.in_(center_ids), *conditions)
+            .group_by(model.center_id)
+        )
+    # SELECT خارجي حتى تحدد الجلسة قاعدة البيانات من الجداول (عبارات UNION المجردة تذهب للمركزية)
+    return select(union_all(*parts).subquery())
+
+
+def query_center_counters(center_ids, names=COUNTER_NAMES):
+    """تنفيذ العبارة المجمعة - {center_id: {counter: count}}"""
+    counters = OrderedDict((center_id, dict.fromkeys(names, 0)) for center_id in center_ids)
+    if not counters:
+        return counters
+    for center_id, name, total in db.session.execute(counters_statement(list(counters), names)):
+        counters[center_id][name] = total
+    return counters
+
+
+class CenterStatsCache:
+    """عدادات كل مركز مع مدة صلاحية قصيرة"""
+
+    def __init__(self):
+        self._entries = {}  # center_id -> (expires_at, counters)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.queries = 0
+
+    def get_many(self, center_ids, loader, ttl):
+        """العدادات للمراكز المطلوبة - المراكز المنتهية تُحمل معاً باستدعاء loader واحد"""
+        now = time.monotonic()
+        result = OrderedDict()
+        missing = []
+        with self._lock:
+            for center_id in center_ids:
+                entry = self._entries.get(center_id)
+                if entry is not None and entry[0] > now:
+                    result[center_id] = entry[1]
+                    self.hits += 1
+                else:
+                    result[center_id] = None
+                    missing.append(center_id)
+                    self.misses += 1
+
+        if missing:
+            loaded = loader(missing)
+            with self._lock:
+                self.queries += 1
+                expires_at = time.monotonic() + ttl
+                for center_id in missing:
+                    counters = loaded.get(center_id) or empty_counters()
+                    self._entries[center_id] = (expires_at, counters)
+                    result[center_id] = counters
+        return result
+
+    def invalidate(self, center_id=None):
+        """إلغاء عدادات مركز (أو الكل)"""
+        with self._lock:
+            if center_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(center_id, None)
+
+    def stats(self):
+        """عدادات الأداء"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'queries': self.queries,
+                'size': len(self._entries),
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_center_stats_cache = CenterStatsCache()
+
+
+def _load_counters(center_ids):
+    router = get_shard_router()
+    if router is None:
+        return query_center_counters(center_ids)
+
+    # الموظفون في القاعدة المركزية (عبارة واحدة لجميع المراكز) والباقي في قاعدة كل مركز بالتوازي
+    central = [name for name, (model, _) in _counter_definitions().items()
+               if not router.is_sharded(model.__table__)]
+    sharded = [name for name in COUNTER_NAMES if name not in central]
+    counters = query_center_counters(center_ids, central)
+    per_center = federated_map(lambda center_id: query_center_counters([center_id], sharded)[center_id], center_ids)
+    for center_id, values in per_center.items():
+        counters[center_id].update(values)
+    return counters
+
+
+def get_center_stats(center_ids):
+    """عدادات المراكز المطلوبة - {center_id: {counter: count}}"""
+    ttl = current_app.config.get('CENTER_STATS_TTL_SECONDS', 60)
+    return _center_stats_cache.get_many(list(center_ids), _load_counters, ttl)
+
+
+def get_center_counters(center_id):
+    """عدادات مركز واحد (نسخة يمكن إضافة مفاتيح إليها)"""
+    return dict(get_center_stats([center_id])[center_id])
+
+
+def invalidate_center_stats(center_id=None):
+    _center_stats_cache.invalidate(center_id)
+
+
+def get_center_stats_cache_stats():
+    return _center_stats_cache.stats()
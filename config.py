@@ -35,6 +35,25 @@ class Config:
     ITEMS_PER_PAGE = 20
     ALLOW_REGISTRATION = False  # Admin only can create users
     
+    # Permission Cache - عدد المستخدمين المحفوظة صلاحياتهم في ذاكرة كل عملية
+    PERMISSION_CACHE_SIZE = int(os.environ.get('PERMISSION_CACHE_SIZE', 1024))
+    
+    # Sidebar Fragment Cache - الشريط الجانبي المخزن حسب (الصلاحيات، المركز، اللغة)
+    SIDEBAR_CACHE_ENABLED = os.environ.get('SIDEBAR_CACHE_ENABLED', 'true').lower() == 'true'
+    SIDEBAR_CACHE_SIZE = int(os.environ.get('SIDEBAR_CACHE_SIZE', 256))
+    DEFAULT_LOCALE = os.environ.get('DEFAULT_LOCALE', 'ar')
+    
+    # Static Files - الروابط التي تحمل بصمة المحتوى (static_url) فقط تُخزن لمدة طويلة
+    STATIC_FINGERPRINT_MAX_AGE = timedelta(days=365)
+    
+    # Organization Settings Snapshot - نسخة في الذاكرة يتم إعلام العمليات بتغييرها عبر ملف إشارة
+    ORG_SETTINGS_SIGNAL_FILE = os.environ.get('ORG_SETTINGS_SIGNAL_FILE')  # افتراضياً instance/org_settings.signal
+    ORG_SETTINGS_CHECK_INTERVAL = float(os.environ.get('ORG_SETTINGS_CHECK_INTERVAL', 2))
+    
+    # Identity Cache - نسخة المستخدم والمركز لـ user_loader (0 = تعطيل)
+    IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 15))
+    IDENTITY_CACHE_SIZE = int(os.environ.get('IDENTITY_CACHE_SIZE', 2048))
+    
     # Employee Meals Settings
     MEAL_COST_PER_UNIT = float(os.environ.get('MEAL_COST_PER_UNIT', 2.5))  # دينار جزائري
     MEAL_ALERT_THRESHOLD = float(os.environ.get('MEAL_ALERT_THRESHOLD', 500))  # التنبيه عند تجاوز 500 دج
@@ -52,10 +71,25 @@ class Config:
     # Session Management
     SESSION_TIMEOUT_MINUTES = int(os.environ.get('SESSION_TIMEOUT_MINUTES', 30))
     MAX_SESSIONS_PER_USER = int(os.environ.get('MAX_SESSIONS_PER_USER', 5))
+    SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', 10000))
+    SESSION_CACHE_TTL = int(os.environ.get('SESSION_CACHE_TTL', 30))  # ثوان قبل إعادة قراءة الجلسة
+    SESSION_ACTIVITY_FLUSH_SECONDS = int(os.environ.get('SESSION_ACTIVITY_FLUSH_SECONDS', 60))
     
     # Rate Limiting
     RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
     RATE_LIMIT_DEFAULT_PER_MINUTE = int(os.environ.get('RATE_LIMIT_DEFAULT_PER_MINUTE', 60))
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')  # memory أو sqlite (مشترك بين العمليات)
+    RATE_LIMIT_SQLITE_PATH = os.environ.get('RATE_LIMIT_SQLITE_PATH')  # افتراضياً instance/rate_limits.sqlite
+    RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000))
+    RATE_LIMIT_VIOLATION_BATCH_SIZE = int(os.environ.get('RATE_LIMIT_VIOLATION_BATCH_SIZE', 50))
+    RATE_LIMIT_VIOLATION_FLUSH_SECONDS = int(os.environ.get('RATE_LIMIT_VIOLATION_FLUSH_SECONDS', 5))
+    
+    # Security Config Snapshot - سياسة كلمات المرور وقواعد المعدل وعناوين IP الموثوقة وعلامات الميزات
+    SECURITY_CONFIG_SIGNAL_FILE = os.environ.get('SECURITY_CONFIG_SIGNAL_FILE')  # افتراضياً instance/security_config.signal
+    SECURITY_CONFIG_CHECK_INTERVAL = float(os.environ.get('SECURITY_CONFIG_CHECK_INTERVAL', 2))
+    
+    # Request Inspection - إضافة رأس Server-Timing بوقت فحص الحقن والتنظيف
+    SECURITY_SERVER_TIMING = os.environ.get('SECURITY_SERVER_TIMING', 'false').lower() == 'true'
     
     # Login Security
     LOGIN_ATTEMPT_LIMIT = int(os.environ.get('LOGIN_ATTEMPT_LIMIT', 5))
@@ -80,8 +114,47 @@ class Config:
     
     # Audit Logging
     AUDIT_LOGGING_ENABLED = os.environ.get('AUDIT_LOGGING_ENABLED', 'true').lower() == 'true'
+    AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))  # الحد الأقصى للطابور
+    AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 200))
+    AUDIT_FLUSH_SECONDS = float(os.environ.get('AUDIT_FLUSH_SECONDS', 2))
+    AUDIT_OVERFLOW_POLICY = os.environ.get('AUDIT_OVERFLOW_POLICY', 'drop_newest')  # drop_newest, drop_oldest, block
+    AUDIT_BLOCK_TIMEOUT = float(os.environ.get('AUDIT_BLOCK_TIMEOUT', 0.05))
     SECURITY_LOG_RETENTION_DAYS = int(os.environ.get('SECURITY_LOG_RETENTION_DAYS', 365))
     
+    # Log Retention - حذف السجلات المنتهية على دفعات بعد أرشفتها (flask purge-expired-logs)
+    EVENT_LOG_RETENTION_DAYS = int(os.environ.get('EVENT_LOG_RETENTION_DAYS', 90))  # integration_logs و realtime_events
+    RETENTION_CHUNK_SIZE = int(os.environ.get('RETENTION_CHUNK_SIZE', 1000))  # صفوف لكل معاملة حذف
+    RETENTION_PAUSE_SECONDS = float(os.environ.get('RETENTION_PAUSE_SECONDS', 0.05))  # استراحة بين الدفعات
+    RETENTION_ARCHIVE_ENABLED = os.environ.get('RETENTION_ARCHIVE_ENABLED', 'true').lower() == 'true'
+    RETENTION_ARCHIVE_DIR = os.environ.get('RETENTION_ARCHIVE_DIR')  # افتراضياً instance/log_archive
+    
+    # Center Shards - قاعدة بيانات لكل مركز للجداول التشغيلية (flask shard-centers للترحيل)
+    CENTER_SHARDING_ENABLED = os.environ.get('CENTER_SHARDING_ENABLED', 'false').lower() == 'true'
+    CENTER_SHARD_URL_TEMPLATE = os.environ.get('CENTER_SHARD_URL_TEMPLATE')  # افتراضياً sqlite:///instance/shards/center_{center_key}.db
+    FEDERATED_MAX_WORKERS = int(os.environ.get('FEDERATED_MAX_WORKERS', 8))  # استعلامات المؤسس المتوازية عبر المراكز
+    CENTER_STATS_TTL_SECONDS = float(os.environ.get('CENTER_STATS_TTL_SECONDS', 60))  # مدة صلاحية عدادات المراكز
+    
+    # ABC Analysis - تأخير قراءة الحركات الجديدة حتى لا تفوت معاملة لم تُثبت بعد (flask abc-analysis)
+    ABC_REFRESH_LAG_SECONDS = int(os.environ.get('ABC_REFRESH_LAG_SECONDS', 300))
+    
+    # Reference Numbers - حجز كتل من أرقام المستندات لكل (مركز، نوع، شهر)
+    REFERENCE_BLOCK_SIZE = int(os.environ.get('REFERENCE_BLOCK_SIZE', 50))
+    
+    # Cost Analysis - افتراضات حساب التكاليف (flask cost-analysis)
+    COST_HOLDING_PERCENT = float(os.environ.get('COST_HOLDING_PERCENT', 20))  # نسبة الاحتفاظ السنوية من قيمة المخزون
+    COST_PER_ORDER = float(os.environ.get('COST_PER_ORDER', 50))  # تكلفة كل أمر شراء
+    COST_ANALYSIS_BATCH_SIZE = int(os.environ.get('COST_ANALYSIS_BATCH_SIZE', 1000))  # صفوف لكل عبارة INSERT
+    COST_ANALYSIS_STALE_SECONDS = int(os.environ.get('COST_ANALYSIS_STALE_SECONDS', 900))  # تشغيل بدون تقدم لهذه المدة يُعتبر متوقفاً
+    
+    # Stock Costing - طريقة تقييم المخزون: weighted_average أو fifo (flask stock-costing --rebuild بعد التغيير)
+    INVENTORY_COSTING_METHOD = os.environ.get('INVENTORY_COSTING_METHOD', 'weighted_average')
+    
+    # Inventory Alerts - قواعد الإنذارات الذكية (flask inventory-alerts للمسح الدوري)
+    ALERT_OVERSTOCK_MULTIPLIER = float(os.environ.get('ALERT_OVERSTOCK_MULTIPLIER', 5))  # فائض = أكثر من الحد الأدنى × هذا العامل
+    ALERT_PRICE_CHANGE_PERCENT = float(os.environ.get('ALERT_PRICE_CHANGE_PERCENT', 20))  # نسبة تغير السعر التي تفتح إنذاراً
+    ALERT_SLOW_MOVING_DAYS = int(os.environ.get('ALERT_SLOW_MOVING_DAYS', 90))  # أيام بدون صرف
+    ALERT_LIST_LIMIT = int(os.environ.get('ALERT_LIST_LIMIT', 200))  # أحدث الإنذارات المعروضة
+    
     # CORS Configuration
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
     
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+محرك تحليل تكاليف المخزون
+Cost Analysis Engine - grouped queries, vectorized costs and a background job with progress
+
+بدلاً من استعلام حركات كل صنف ثم إدراج صف ORM لكل صنف داخل الطلب:
+1. استعلام واحد للأصناف (الرصيد الحالي وسعر الوحدة)
+2. استعلام مجمع واحد لقيمة الحركات وعددها وعدد أوامر الشراء داخل نافذة الفترة
+3. استعلام واحد للحركات المؤثرة في الرصيد مرتبة حسب الصنف والتاريخ، يُعاد منه
+   بناء الرصيد عبر الزمن بالرجوع من الرصيد الحالي، ثم متوسط المخزون الموزون
+   بالزمن بـ NumPy (بدلاً من الرصيد الحالي)
+4. التكاليف دفعة واحدة بـ NumPy:
+   - الاحتفاظ = متوسط المخزون × سعر الوحدة × COST_HOLDING_PERCENT% × (أيام الفترة / 365)
+   - الطلب = عدد أوامر الشراء × COST_PER_ORDER
+5. حذف نتائج الفترة وإدراجها بدفعات من COST_ANALYSIS_BATCH_SIZE صف
+
+اتجاه الحركات مطابق لـ add_transaction: الشراء والإرجاع يزيدان الرصيد،
+الإصدار ينقصه، والتحويل والتسوية لا يغيرانه.
+
+الحساب يعمل في خيط خلفي (start_cost_analysis) ويُتابع تقدمه من
+/inventory/cost-analysis/status - الحالة والقفل في background_job_states فتشغيل
+واحد فقط في جميع العمليات - أو من سطر الأوامر:
+    flask cost-analysis --period monthly
+مع تقسيم المراكز (center_shards) يُحسب كل مركز على قاعدته (for_each_center).
+"""
+
+import uuid
+import threading
+import click
+import numpy as np
+from datetime import date, datetime, time, timedelta
+from flask import current_app
+from sqlalchemy import case, delete, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from models import db, Item, Transaction, InventoryCostAnalysis, BackgroundJobState
+from abc_analysis import PERIOD_DAYS
+from stock_ledger import STOCK_DIRECTION, signed_quantity
+from center_shards import for_each_center
+
+
+def _item_balances():
+    """معرفات الأصناف ورصيدها الحالي وسعر الوحدة"""
+    items = Item.__table__
+    rows = db.session.execute(
+        select(items.c.id, items.c.quantity_in_stock, items.c.unit_price).order_by(items.c.id)
+    ).all()
+    item_ids = [row[0] for row in rows]
+    quantities = np.array([row[1] or 0 for row in rows], dtype=float)
+    prices = np.array([row[2] or 0 for row in rows], dtype=float)
+    return item_ids, quantities, prices
+
+
+def _movement_totals(index, since, until):
+    """قيمة الحركات وعددها وعدد أوامر الشراء لكل صنف داخل النافذة"""
+    transactions = Transaction.__table__
+    count = len(index)
+    values, counts, orders = np.zeros(count), np.zeros(count), np.zeros(count)
+    rows = db.session.execute(
+        select(
+            transactions.c.item_id,
+            func.sum(func.coalesce(transactions.c.total_value, 0)),
+            func.count(),
+            func.sum(case((transactions.c.transaction_type == 'purchase', 1), else_=0)),
+        )
+        .where(transactions.c.transaction_date > since, transactions.c.transaction_date <= until)
+        .group_by(transactions.c.item_id)
+    )
+    for item_id, value, transaction_count, purchase_count in rows:
+        position = index.get(item_id)
+        if position is not None:
+            values[position] = value or 0
+            counts[position] = transaction_count
+            orders[position] = purchase_count or 0
+    return values, counts, orders
+
+
+def _signed_movements(index, since, window_seconds):
+    """(موضع الصنف، ثانية الحركة داخل النافذة، الكمية بإشارتها) مرتبة حسب الصنف ثم الزمن"""
+    transactions = Transaction.__table__
+    # الحركات بعد نهاية النافذة تدخل في إعادة بناء الرصيد بمدة صفرية
+    rows = db.session.execute(
+        select(transactions.c.item_id, transactions.c.transaction_date, signed_quantity(transactions))
+        .where(transactions.c.transaction_date > since,
+               transactions.c.transaction_type.in_(list(STOCK_DIRECTION)))
+    ).all()
+    positions, seconds, quantities = [], [], []
+    for item_id, when, quantity in rows:
+        position = index.get(item_id)
+        if position is not None and when is not None:
+            positions.append(position)
+            seconds.append((when - since).total_seconds())
+            quantities.append(quantity or 0)
+
+    positions = np.array(positions, dtype=np.int64)
+    seconds = np.clip(np.array(seconds, dtype=float), 0, window_seconds)
+    quantities = np.array(quantities, dtype=float)
+    order = np.lexsort((seconds, positions))
+    return positions[order], seconds[order], quantities[order]
+
+
+def time_weighted_average(current, positions, seconds, quantities, window_seconds):
+    """
+    متوسط الرصيد الموزون بالزمن لكل صنف خلال النافذة [0, window_seconds]
+
+    current: الرصيد في نهاية النافذة لكل صنف
+    positions / seconds / quantities: الحركات مرتبة حسب الصنف ثم الزمن
+    الرصيد بعد كل حركة = الرصيد الحالي - مجموع حركات الصنف اللاحقة لها
+    """
+    current = np.asarray(current, dtype=float)
+    count = len(current)
+    if not len(positions):
+        return current.copy()
+
+    totals = np.bincount(positions, weights=quantities, minlength=count)
+    starts = np.r_[True, positions[1:] != positions[:-1]]
+    lasts = np.r_[positions[1:] != positions[:-1], True]
+
+    # مجموع حركات الصنف حتى الحركة الحالية (شاملة)
+    cumulative = np.cumsum(quantities)
+    group_base = (cumulative - quantities)[starts][np.cumsum(starts) - 1]
+    running = cumulative - group_base
+    balance_after = current[positions] - (totals[positions] - running)
+
+    next_seconds = np.where(lasts, window_seconds, np.r_[seconds[1:], window_seconds])
+    area = np.bincount(positions, weights=np.maximum(balance_after, 0) * (next_seconds - seconds),
+                       minlength=count)
+
+    # الرصيد قبل أول حركة في النافذة يغطي الفترة من بدايتها حتى تلك الحركة
+    first_seconds = np.full(count, float(window_seconds))
+    first_seconds[positions[starts]] = seconds[starts]
+    area += np.maximum(current - totals, 0) * first_seconds
+    return area / window_seconds
+
+
+def compute_cost_analysis(period='monthly', today=None, progress=None):
+    """حساب تكاليف جميع الأصناف لفترة - قاموس مصفوفات بترتيب item_ids"""
+    progress = progress or (lambda stage, done=0, total=0: None)
+    today = today or date.today()
+    window_days = PERIOD_DAYS.get(period, PERIOD_DAYS['monthly'])
+    until = datetime.combine(today, time.max)
+    since = until - timedelta(days=window_days)
+    window_seconds = (until - since).total_seconds()
+
+    progress('items')
+    item_ids, quantities, prices = _item_balances()
+    index = {item_id: position for position, item_id in enumerate(item_ids)}
+
+    progress('movements', 0, len(item_ids))
+    values, counts, orders = _movement_totals(index, since, until)
+    average_inventory = time_weighted_average(
+        quantities, *_signed_movements(index, since, window_seconds), window_seconds
+    )
+
+    progress('costs', 0, len(item_ids))
+    holding_percentage = float(current_app.config.get('COST_HOLDING_PERCENT', 20))
+    order_cost = float(current_app.config.get('COST_PER_ORDER', 50))
+    holding_cost = average_inventory * prices * holding_percentage / 100 * (window_days / 365.0)
+    ordering_cost = orders * order_cost
+
+    return {
+        'item_ids': item_ids,
+        'analysis_date': today,
+        'holding_percentage': holding_percentage,
+        'holding_cost': holding_cost,
+        'ordering_cost': ordering_cost,
+        'total_inventory_value': values,
+        'average_inventory': average_inventory,
+        'profitability': values - holding_cost,
+        'transaction_count': counts,
+    }
+
+
+def write_cost_analysis(period, result, progress=None):
+    """استبدال نتائج الفترة بدفعات INSERT (المستدعي يثبت المعاملة)"""
+    progress = progress or (lambda stage, done=0, total=0: None)
+    table = InventoryCostAnalysis.__table__
+    db.session.execute(delete(table).where(table.c.period == period))
+
+    item_ids = result['item_ids']
+    batch_size = current_app.config.get('COST_ANALYSIS_BATCH_SIZE', 1000)
+    now = datetime.utcnow()
+    progress('writing', 0, len(item_ids))
+    for start in range(0, len(item_ids), batch_size):
+        stop = min(start + batch_size, len(item_ids))
+        db.session.execute(insert(InventoryCostAnalysis), [
+            {
+                'item_id': item_ids[position],
+                'analysis_date': result['analysis_date'],
+                'period': period,
+                'holding_cost': float(result['holding_cost'][position]),
+                'holding_cost_percentage': result['holding_percentage'],
+                'ordering_cost': float(result['ordering_cost'][position]),
+                'shortage_cost': 0.0,
+                'total_inventory_value': float(result['total_inventory_value'][position]),
+                'average_inventory': float(result['average_inventory'][position]),
+                'profitability': float(result['profitability'][position]),
+                'created_at': now,
+                'updated_at': now,
+            }
+            for position in range(start, stop)
+        ])
+        progress('writing', stop, len(item_ids))
+    return len(item_ids)
+
+
+def run_cost_analysis(period='monthly', today=None, progress=None):
+    """حساب الفترة وكتابتها - يعيد عدد الأصناف"""
+    result = compute_cost_analysis(period, today, progress)
+    return write_cost_analysis(period, result, progress)
+
+
+class CostAnalysisJob:
+    """
+    حساب تحليل التكاليف في خيط خلفي مع حالة التقدم
+
+    الحالة والقفل في صف background_job_states (القاعدة المركزية) وليس في ذاكرة
+    العملية: التشغيل يُحجز بـ UPDATE مشروط فلا تعمل مهمتان معاً في عمليتين
+    مختلفتين، والتقدم يُقرأ من أي عملية. تشغيل توقفت نبضاته أكثر من
+    COST_ANALYSIS_STALE_SECONDS (عملية انتهت أثناءه) يمكن حجزه من جديد.
+    """
+
+    JOB_NAME = 'cost_analysis'
+
+    def __init__(self):
+        self._thread = None
+        self._owner = None
+
+    def start(self, app, period):
+        """تشغيل المهمة في الخلفية - False إذا كانت مهمة أخرى قيد التنفيذ"""
+        owner = self._claim(app, period)
+        if owner is None:
+            return False
+        self._thread = threading.Thread(target=self._run, args=(app, period, owner),
+                                        name='cost-analysis', daemon=True)
+        self._thread.start()
+        return True
+
+    def run(self, app, period):
+        """تنفيذ المهمة في الخيط الحالي (سطر الأوامر) - الحالة النهائية أو None إذا كانت قيد التنفيذ"""
+        owner = self._claim(app, period)
+        if owner is None:
+            return None
+        self._run(app, period, owner)
+        with app.app_context():
+            return self.status()
+
+    def join(self, timeout=None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _claim(self, app, period):
+        """حجز التشغيل في قاعدة البيانات - معرف التشغيل أو None"""
+        table = BackgroundJobState.__table__
+        owner = str(uuid.uuid4())
+        now = datetime.utcnow()
+        with app.app_context(), db.engine.begin() as conn:
+            try:
+                with conn.begin_nested():
+                    conn.execute(insert(table).values(job_name=self.JOB_NAME, state='idle'))
+            except IntegrityError:
+                pass
+            stale = now - timedelta(seconds=app.config.get('COST_ANALYSIS_STALE_SECONDS', 900))
+            claimed = conn.execute(
+                update(table)
+                .where(table.c.job_name == self.JOB_NAME,
+                       or_(table.c.state != 'running', table.c.heartbeat_at < stale))
+                .values(owner=owner, state='running', period=period, stage='queued', done=0, total=0,
+                        items=0, error=None, started_at=now, finished_at=None, heartbeat_at=now)
+            ).rowcount
+        return owner if claimed else None
+
+    def _update(self, owner, **values):
+        """تحديث حالة التشغيل (يتجاهل تشغيلاً حُجز بعده تشغيل آخر)"""
+        table = BackgroundJobState.__table__
+        with db.engine.begin() as conn:
+            conn.execute(
+                update(table).where(table.c.job_name == self.JOB_NAME, table.c.owner == owner)
+                .values(heartbeat_at=datetime.utcnow(), **values)
+            )
+
+    def _run(self, app, period, owner):
+        def progress(stage, done=0, total=0):
+            self._update(owner, stage=stage, done=done, total=total)
+
+        with app.app_context():
+            try:
+                counts = for_each_center(lambda: run_cost_analysis(period, progress=progress))
+                self._update(owner, state='done', stage='done', items=sum(counts.values()),
+                             finished_at=datetime.utcnow())
+            except Exception as e:
+                db.session.rollback()
+                app.logger.exception('Cost analysis failed')
+                self._update(owner, state='failed', error=str(e), finished_at=datetime.utcnow())
+            finally:
+                db.session.remove()
+
+    def status(self):
+        """حالة المهمة الحالية أو الأخيرة (من أي عملية)"""
+        table = BackgroundJobState.__table__
+        with db.engine.connect() as conn:
+            row = conn.execute(select(table).where(table.c.job_name == self.JOB_NAME)).mappings().first()
+        if row is None:
+            return {'state': 'idle'}
+        status = {key: row[key] for key in ('state', 'period', 'stage', 'done', 'total', 'items', 'error')}
+        for key in ('started_at', 'finished_at'):
+            status[key] = row[key].isoformat() if row[key] else None
+        return status
+
+
+_job = CostAnalysisJob()
+
+
+def start_cost_analysis(period):
+    """بدء حساب الفترة في الخلفية - False إذا كان حساب آخر قيد التنفيذ (في أي عملية)"""
+    return _job.start(current_app._get_current_object(), period)
+
+
+def get_cost_analysis_status():
+    return _job.status()
+
+
+def init_cost_analysis(app):
+    """تسجيل أمر الحساب من سطر الأوامر"""
+
+    @app.cli.command('cost-analysis')
+    @click.option('--period', default='monthly', type=click.Choice(list(PERIOD_DAYS)), help='الفترة')
+    def cost_analysis_command(period):
+        """حساب تحليل تكاليف المخزون لجميع الأصناف"""
+        status = _job.run(app, period)
+        if status is None:
+            raise click.ClickException('حساب تحليل التكاليف قيد التنفيذ بالفعل')
+        if status['state'] == 'failed':
+            raise click.ClickException(status['error'])
+        click.echo(f"{period}: {status['items']} صنف")
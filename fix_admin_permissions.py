@@ -4,6 +4,7 @@
 from app import create_app
 from models import db, User, UserPermission
 from permissions_config import get_all_permissions_flat
+from permission_cache import bump_permission_version
 
 app = create_app('development')
 
@@ -39,6 +40,7 @@ with app.app_context():
         )
         db.session.add(permission)
     
+    bump_permission_version(admin_user.id)
     db.session.commit()
     print(f"✅ تمت إضافة جميع الصلاحيات بنجاح!")
     
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+ذاكرة أجزاء القوالب المؤقتة
+Fragment Cache - cached rendering of template fragments (sidebar)
+
+الشريط الجانبي يعتمد فقط على صلاحيات المستخدم والمركز الحالي واللغة، لذلك يتم
+تخزين HTML الناتج في ذاكرة LRU مفتاحها (قناع الصلاحيات، center_id، اللغة).
+عند تعديل صلاحيات المستخدم يتغير القناع وبالتالي المفتاح، فلا يمكن أن يُعرض
+جزء قديم؛ المدخلات التي لم تعد مستخدمة تخرج تلقائياً من الذاكرة.
+"""
+
+import threading
+from collections import OrderedDict
+from flask import current_app, session
+from flask_login import current_user
+from markupsafe import Markup
+from navigation_config import get_sidebar_sections
+
+
+class FragmentCache:
+    """ذاكرة LRU لأجزاء HTML المولدة"""
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """البحث عن جزء مخزن"""
+        with self._lock:
+            html = self._entries.get(key)
+            if html is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return html
+
+    def put(self, key, html):
+        """تخزين جزء مولد"""
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """تفريغ الذاكرة (مثلاً بعد تعديل قالب الشريط الجانبي)"""
+        with self._lock:
+            self.evictions += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        """عدادات الأداء"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'capacity': self.capacity,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_sidebar_cache = FragmentCache()
+
+
+def _sidebar_cache_key(permissions):
+    """مفتاح الشريط الجانبي: (قناع الصلاحيات، المركز، اللغة)"""
+    center_id = session.get('current_center_id')
+    locale = session.get('locale') or current_app.config.get('DEFAULT_LOCALE', 'ar')
+    return (permissions.mask, center_id, locale)
+
+
+def render_sidebar():
+    """توليد الشريط الجانبي للمستخدم الحالي (من الذاكرة إن وجد)"""
+    if not current_user.is_authenticated:
+        return Markup('')
+
+    permissions = current_user.get_permission_set()
+    enabled = current_app.config.get('SIDEBAR_CACHE_ENABLED', True)
+
+    key = _sidebar_cache_key(permissions)
+    if enabled:
+        html = _sidebar_cache.get(key)
+        if html is not None:
+            return html
+
+    template = current_app.jinja_env.get_template('partials/sidebar.html')
+    html = Markup(template.render(
+        permissions=permissions,
+        sections=get_sidebar_sections(permissions.mask),
+    ))
+
+    if enabled:
+        _sidebar_cache.put(key, html)
+    return html
+
+
+def clear_fragment_cache():
+    """تفريغ جميع الأجزاء المخزنة"""
+    _sidebar_cache.clear()
+
+
+def get_fragment_cache_stats():
+    """عدادات ذاكرة الأجزاء"""
+    return _sidebar_cache.stats()
+
+
+def init_fragment_cache(app):
+    """تهيئة ذاكرة الأجزاء من إعدادات التطبيق"""
+    _sidebar_cache.capacity = app.config.get('SIDEBAR_CACHE_SIZE', 256)
@@ -6,6 +6,7 @@ import sys
 from app import create_app
 from models import db, User, UserPermission
 from permissions_config import get_all_permissions_flat
+from permission_cache import bump_permission_version
 
 def grant_all_permissions():
     """إعطاء جميع الصلاحيات لمستخدم المسؤول"""
@@ -52,7 +53,8 @@ def grant_all_permissions():
                 added_count += 1
                 print(f"  + إضافة: {perm_key} ({perm_data['name']})")
         
-        # حفظ التغييرات
+        # حفظ التغييرات (مع رفع نسخة الصلاحيات لإبطال الذاكرة المؤقتة)
+        bump_permission_version(admin_user.id)
         db.session.commit()
         
         print(f"\n[SUCCESS] تم بنجاح:")
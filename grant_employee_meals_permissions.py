@@ -15,6 +15,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from app import create_app
 from models import db, User, UserPermission
 from permissions_config import PERMISSIONS
+from permission_cache import bump_permission_version
 
 def grant_employee_meals_permissions(username="admin"):
     """منح صلاحيات وجبات الموظفين للمستخدم"""
@@ -78,6 +79,7 @@ def grant_employee_meals_permissions(username="admin"):
         
         # حفظ التغييرات
         try:
+            bump_permission_version(user.id)
             db.session.commit()
             print(f"\n✅ تم منح {granted_count} صلاحية بنجاح لـ {user.full_name}")
             
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+ذاكرة هوية المستخدم المؤقتة
+Identity Cache - short-TTL user and center snapshots for the user loader
+
+load_user يُستدعى في بداية كل طلب. بدلاً من User.query.get في كل مرة، تحتفظ
+كل عملية بنسخة خفيفة من صف المستخدم (المعرف، الدور، المركز، حالة التفعيل،
+permission_version ...) ومن حالة تفعيل كل مركز لمدة IDENTITY_CACHE_TTL ثانية.
+يتم إرفاق النسخة بجلسة SQLAlchemy بدون استعلام (merge مع load=False) حتى تبقى
+current_user كائن User كامل (العلاقات والدوال تعمل كالمعتاد).
+
+الإلغاء:
+- أي تعديل على صف User أو VocationalCenter عبر ORM (admin.edit_user، تعديل
+  المراكز، التعطيل، الملف الشخصي ...) يحذف النسخة بعد flush وبعد commit.
+- التحديثات الجماعية (query.update) يجب أن تستدعي invalidate_user_identity.
+- العمليات الأخرى تلتقط التغيير بعد انتهاء مدة TTL على الأكثر.
+"""
+
+import time
+import threading
+from collections import OrderedDict, namedtuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+from models import db, User, VocationalCenter
+
+
+IdentitySnapshot = namedtuple('IdentitySnapshot', [
+    'id', 'role', 'center_id', 'is_active', 'permission_version', 'attributes'
+])
+
+
+class TTLCache:
+    """ذاكرة LRU بمدة صلاحية لكل مدخل"""
+
+    def __init__(self, ttl=15, capacity=2048):
+        self.ttl = ttl
+        self.capacity = capacity
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """البحث عن مدخل غير منتهي الصلاحية"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """تخزين مدخل"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """حذف مدخل معين أو تفريغ الذاكرة بالكامل"""
+        with self._lock:
+            if key is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+            elif self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        """عدادات الأداء"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'size': len(self._entries),
+                'capacity': self.capacity,
+                'ttl': self.ttl,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_user_cache = TTLCache()
+_center_cache = TTLCache()
+
+_USER_COLUMNS = tuple(column.key for column in User.__table__.columns)
+
+
+def _snapshot_user(user):
+    """إنشاء نسخة خفيفة من كائن User محمل"""
+    attributes = {key: getattr(user, key) for key in _USER_COLUMNS}
+    return IdentitySnapshot(
+        id=user.id,
+        role=user.role,
+        center_id=user.center_id,
+        is_active=user.is_active,
+        permission_version=user.permission_version or 0,
+        attributes=attributes,
+    )
+
+
+def _attach_user(snapshot):
+    """إرفاق النسخة بجلسة قاعدة البيانات الحالية بدون استعلام"""
+    user = db.session.identity_map.get(db.session.identity_key(User, snapshot.id))
+    if user is not None:
+        return user
+
+    user = User()
+    for key, value in snapshot.attributes.items():
+        setattr(user, key, value)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def load_cached_user(user_id):
+    """user_loader: إرجاع المستخدم من الذاكرة أو تحميله (استعلام واحد)"""
+    if not _user_cache.ttl:
+        return db.session.get(User, user_id)
+
+    snapshot = _user_cache.get(user_id)
+    if snapshot is not None:
+        return _attach_user(snapshot)
+
+    user = db.session.get(User, user_id)
+    if user is not None:
+        _user_cache.put(user_id, _snapshot_user(user))
+    return user
+
+
+def is_center_active(center_id):
+    """حالة تفعيل المركز (من الذاكرة) - False إذا لم يوجد"""
+    if not center_id:
+        return False
+
+    active = _center_cache.get(center_id) if _center_cache.ttl else None
+    if active is None:
+        active = bool(db.session.query(VocationalCenter.is_active).filter_by(
+            id=center_id
+        ).scalar())
+        if _center_cache.ttl:
+            _center_cache.put(center_id, active)
+    return active
+
+
+def invalidate_user_identity(user_id=None):
+    """حذف نسخة مستخدم (أو جميع المستخدمين) من الذاكرة"""
+    _user_cache.invalidate(user_id)
+
+
+def invalidate_center_identity(center_id=None):
+    """حذف حالة مركز (أو جميع المراكز) من الذاكرة"""
+    _center_cache.invalidate(center_id)
+
+
+def _collect_identity_changes(session):
+    """معرفات المستخدمين والمراكز المعدلة في هذا flush"""
+    users, centers = set(), set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id:
+            users.add(obj.id)
+        elif isinstance(obj, VocationalCenter) and obj.id:
+            centers.add(obj.id)
+    return users, centers
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_identity_changes(session, flush_context, instances):
+    users, centers = _collect_identity_changes(session)
+    if users or centers:
+        pending = session.info.setdefault('identity_changes', (set(), set()))
+        pending[0].update(users)
+        pending[1].update(centers)
+
+
+def _invalidate_changes(changes):
+    user_ids, center_ids = changes
+    for user_id in user_ids:
+        _user_cache.invalidate(user_id)
+    for center_id in center_ids:
+        _center_cache.invalidate(center_id)
+
+
+@event.listens_for(Session, 'after_flush')
+def _invalidate_after_flush(session, flush_context):
+    changes = session.info.get('identity_changes')
+    if changes:
+        _invalidate_changes(changes)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    # إعادة الحذف بعد commit حتى لا تبقى نسخة حملها طلب متزامن قبل الحفظ
+    changes = session.info.pop('identity_changes', None)
+    if changes:
+        _invalidate_changes(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_identity_changes(session):
+    session.info.pop('identity_changes', None)
+
+
+def get_identity_cache_stats():
+    """عدادات ذاكرة الهوية"""
+    return {
+        'users': _user_cache.stats(),
+        'centers': _center_cache.stats(),
+    }
+
+
+def init_identity_cache(app):
+    """تهيئة ذاكرة الهوية من إعدادات التطبيق"""
+    ttl = app.config.get('IDENTITY_CACHE_TTL', 15)
+    capacity = app.config.get('IDENTITY_CACHE_SIZE', 2048)
+    for cache in (_user_cache, _center_cache):
+        cache.ttl = ttl
+        cache.capacity = capacity
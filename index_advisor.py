@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+مستشار الفهارس
+Index Advisor - records the SQL each endpoint issues and flags full table scans
+
+الأمر:
+    flask index-advisor --user admin [--path /inventory/items ...]
+
+يزور المسارات (GET) المحددة أو جميع مسارات GET بدون معاملات باسم المستخدم
+المحدد، ويسجل كل عبارة SELECT ينفذها كل endpoint (QueryRecorder على
+before_cursor_execute). بعد ذلك تُنفذ خطة كل عبارة بنفس المعاملات:
+- SQLite: EXPLAIN QUERY PLAN - السطر "SCAN <table>" بدون فهرس = قراءة كاملة
+- MySQL: EXPLAIN - type = ALL = قراءة كاملة
+
+لكل قراءة كاملة يُقترح فهرس من أعمدة الجدول في WHERE (المساواة أولاً) ثم
+ORDER BY. الاقتراحات تقريبية ويجب مراجعتها قبل إضافتها إلى النماذج، ثم
+تطبيقها بـ add_performance_indexes.py.
+"""
+
+import re
+import click
+import threading
+from collections import OrderedDict
+from flask import request, has_request_context
+from sqlalchemy import event
+from models import db, User
+
+
+class QueryRecorder:
+    """تسجيل عبارات SELECT المميزة لكل endpoint"""
+
+    def __init__(self, max_per_endpoint=200):
+        self.max_per_endpoint = max_per_endpoint
+        self.statements = OrderedDict()  # endpoint -> {statement: parameters}
+        self._lock = threading.Lock()
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if executemany or not statement.lstrip().upper().startswith('SELECT'):
+            return
+        endpoint = (request.endpoint or request.path) if has_request_context() else '<no request>'
+        with self._lock:
+            seen = self.statements.setdefault(endpoint, OrderedDict())
+            if statement not in seen and len(seen) < self.max_per_endpoint:
+                seen[statement] = parameters
+
+    def attach(self, engine):
+        event.listen(engine, 'before_cursor_execute', self)
+
+    def detach(self, engine):
+        event.remove(engine, 'before_cursor_execute', self)
+
+
+_SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?(.*)$')
+
+
+def explain_full_scans(conn, statement, parameters):
+    """الجداول التي تُقرأ بالكامل في خطة العبارة - قائمة (الجدول، الاسم المستعار، التفاصيل)"""
+    dialect = conn.dialect.name
+    scans = []
+    if dialect == 'sqlite':
+        for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters):
+            detail = row[-1]
+            match = _SQLITE_SCAN.match(detail)
+            if match and 'INDEX' not in match.group(3):
+                scans.append((match.group(1), match.group(2) or match.group(1), detail))
+    elif dialect in ('mysql', 'mariadb'):
+        for row in conn.exec_driver_sql(f'EXPLAIN {statement}', parameters).mappings():
+            if (row.get('type') or '').upper() == 'ALL':
+                table = row.get('table')
+                scans.append((table, table, f"type=ALL rows={row.get('rows')} possible_keys={row.get('possible_keys')}"))
+    return scans
+
+
+def _clause(statement, keyword, stop_keywords):
+    """نص جزء العبارة بعد الكلمة المفتاحية الأخيرة حتى أول كلمة توقف"""
+    upper = statement.upper()
+    start = upper.rfind(f' {keyword} ')
+    if start < 0:
+        return ''
+    start += len(keyword) + 2
+    end = len(statement)
+    for stop in stop_keywords:
+        position = upper.find(f' {stop} ', start)
+        if position >= 0:
+            end = min(end, position)
+    return statement[start:end]
+
+
+def suggest_index(statement, table, alias):
+    """اقتراح أعمدة فهرس لجدول تتم قراءته بالكامل (أو None)"""
+    column_pattern = re.compile(rf'\b{re.escape(alias)}\.(\w+)\s*(=|IN\b|IS\b|<|>|<=|>=|BETWEEN\b|LIKE\b)?', re.I)
+    where = _clause(statement, 'WHERE', ('GROUP BY', 'ORDER BY', 'LIMIT'))
+    order_by = _clause(statement, 'ORDER BY', ('LIMIT', 'OFFSET'))
+
+    equality, ranges = [], []
+    for column, operator in column_pattern.findall(where):
+        target = equality if (operator or '').upper() in ('=', 'IN', 'IS') else ranges
+        if column not in equality and column not in ranges:
+            target.append(column)
+    ordering = [column for column, _ in column_pattern.findall(order_by)
+                if column not in equality and column not in ranges]
+
+    columns = equality + ranges + ordering
+    if not columns:
+        return None
+    return f"CREATE INDEX ix_{table}_{'_'.join(columns)} ON {table} ({', '.join(columns)})"
+
+
+def analyze(recorder, engine):
+    """تقرير القراءات الكاملة لكل endpoint"""
+    findings = []
+    with engine.connect() as conn:
+        for endpoint, statements in recorder.statements.items():
+            for statement, parameters in statements.items():
+                try:
+                    scans = explain_full_scans(conn, statement, parameters)
+                except Exception as e:
+                    findings.append({'endpoint': endpoint, 'error': str(e), 'statement': statement})
+                    continue
+                for table, alias, detail in scans:
+                    findings.append({
+                        'endpoint': endpoint,
+                        'table': table,
+                        'plan': detail,
+                        'suggestion': suggest_index(statement, table, alias),
+                        'statement': statement,
+                    })
+    return findings
+
+
+def _default_paths(app):
+    """مسارات GET بدون معاملات"""
+    paths = []
+    for rule in app.url_map.iter_rules():
+        if 'GET' not in rule.methods or rule.arguments or rule.endpoint == 'static':
+            continue
+        if 'logout' in rule.endpoint:
+            continue
+        paths.append(rule.rule)
+    return sorted(paths)
+
+
+def init_index_advisor(app):
+    """تسجيل أمر مستشار الفهارس"""
+
+    @app.cli.command('index-advisor')
+    @click.option('--user', 'username', default='admin', help='المستخدم الذي تُزار المسارات باسمه')
+    @click.option('--path', 'paths', multiple=True, help='مسار محدد (يمكن تكراره) - افتراضياً جميع مسارات GET')
+    @click.option('--show-sql', is_flag=True, help='عرض نص العبارة لكل قراءة كاملة')
+    def index_advisor_command(username, paths, show_sql):
+        """تسجيل استعلامات المسارات وكشف القراءات الكاملة مع اقتراح فهارس"""
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            click.echo(f'المستخدم {username} غير موجود')
+            return
+
+        recorder = QueryRecorder()
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(user.id)
+            sess['_fresh'] = True
+
+        recorder.attach(db.engine)
+        try:
+            for path in paths or _default_paths(app):
+                try:
+                    status = client.get(path).status_code
+                except Exception as e:
+                    status = f'error: {e}'
+                click.echo(f'GET {path} -> {status}')
+        finally:
+            recorder.detach(db.engine)
+
+        findings = analyze(recorder, db.engine)
+        suggestions = OrderedDict()
+        click.echo('')
+        for finding in findings:
+            if 'error' in finding:
+                click.echo(f"[{finding['endpoint']}] تعذر تحليل العبارة: {finding['error']}")
+                continue
+            click.echo(f"[{finding['endpoint']}] قراءة كاملة لـ {finding['table']}: {finding['plan']}")
+            if show_sql:
+                click.echo(f"    {finding['statement']}")
+            if finding['suggestion']:
+                suggestions.setdefault(finding['suggestion'], set()).add(finding['endpoint'])
+
+        click.echo('')
+        click.echo(f'{len(findings)} قراءة كاملة في {len(recorder.statements)} endpoint')
+        for suggestion, endpoints in suggestions.items():
+            click.echo(f"{suggestion};  -- {', '.join(sorted(endpoints))}")
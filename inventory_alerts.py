@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+الإنذارات الذكية للمخزون
+Inventory Alerts - event-driven rule evaluation for the items a transaction touched
+
+بدلاً من فحص كامل الكتالوج (quantity_in_stock <= minimum_quantity) عند كل عرض،
+تُقيّم القواعد لحظة تثبيت المعاملة التي غيرت الرصيد أو السعر، وللأصناف
+المتأثرة فقط:
+- stock_ledger يسجل الأصناف التي تحركت (mark_items_changed)
+- before_flush / after_flush يسجلان الأصناف الجديدة أو التي تغير حدها الأدنى
+  أو سعرها عبر ORM
+- before_commit يقيّم القواعد لهذه الأصناف داخل نفس المعاملة (نقطة حفظ
+  مستقلة: فشل الإنذارات لا يلغي العملية نفسها)
+
+القواعد:
+- low_stock: الرصيد <= الحد الأدنى (يُحل تلقائياً عند إعادة التعبئة)
+- overstock: الرصيد > الحد الأدنى × ALERT_OVERSTOCK_MULTIPLIER
+- price_alert: تغير سعر الوحدة بنسبة >= ALERT_PRICE_CHANGE_PERCENT (يُحل يدوياً)
+- slow_moving: قاعدة زمنية - بدون صرف منذ ALERT_SLOW_MOVING_DAYS يوماً؛ تُفحص
+  بالمسح الدوري فقط وتُحل فور أي صرف للصنف
+
+إنذار مفتوح واحد لكل (صنف، نوع) عبر dedup_key الفريد (يُفرغ عند الحل)، فقائمة
+الإنذارات قراءة مفهرسة على (is_resolved, alert_type, triggered_at).
+
+    flask inventory-alerts [--rebuild]
+(add_performance_columns.py يشغل إعادة التقييم عند إضافة dedup_key لقاعدة قائمة)
+مع تقسيم المراكز (center_shards) يعمل الأمر على قاعدة كل مركز (for_each_center).
+"""
+
+import click
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import bindparam, event, inspect, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import db, Item, Transaction, SmartInventoryAlert
+from center_shards import for_each_center
+
+# أنواع الإنذارات التي تُحل تلقائياً عند زوال شرطها في التقييم الفوري
+STATE_RULES = ('low_stock', 'overstock')
+
+# الحقول التي يعيد تغييرها تقييم الصنف
+_WATCHED_ATTRIBUTES = ('quantity_in_stock', 'minimum_quantity', 'unit_price')
+
+_CHUNK = 500
+
+
+def _dedup_key(item_id, alert_type):
+    return f'{item_id}:{alert_type}'
+
+
+def mark_items_changed(item_ids, issued=(), session=None):
+    """تسجيل أصناف تحركت في المعاملة الحالية (issued: أصناف صُرف منها)"""
+    info = (session or db.session).info
+    info.setdefault('alert_items', set()).update(item_ids)
+    info.setdefault('alert_issued', set()).update(issued)
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_item_changes(session, flush_context, instances):
+    """الأصناف المعدلة عبر ORM (الحد الأدنى، السعر) مع السعر السابق"""
+    for obj in session.dirty:
+        if not isinstance(obj, Item):
+            continue
+        state = inspect(obj)
+        if not any(state.attrs[name].history.has_changes() for name in _WATCHED_ATTRIBUTES):
+            continue
+        mark_items_changed([obj.id], session=session)
+        price = state.attrs.unit_price.history
+        if not price.has_changes():
+            continue
+        # السعر المنتهي بعد commit سابق لا يحمل القيمة القديمة - تُقرأ من القاعدة قبل الكتابة
+        if price.deleted:
+            old_price = price.deleted[0]
+        else:
+            items = Item.__table__
+            old_price = session.execute(select(items.c.unit_price).where(items.c.id == obj.id)).scalar()
+        if old_price:
+            session.info.setdefault('alert_prices', {}).setdefault(obj.id, old_price)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_new_items(session, flush_context):
+    """الأصناف الجديدة (المعرف يُولد عند الكتابة)"""
+    new_items = [obj.id for obj in session.new if isinstance(obj, Item)]
+    if new_items:
+        mark_items_changed(new_items, session=session)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_on_rollback(session, previous_transaction):
+    """التراجع عن المعاملة يلغي أصنافها وأسعارها السابقة (نقاط الحفظ لا تلغيها)"""
+    if previous_transaction.nested:
+        return
+    for key in ('alert_items', 'alert_issued', 'alert_prices'):
+        session.info.pop(key, None)
+
+
+@event.listens_for(Session, 'before_commit')
+def _evaluate_on_commit(session):
+    if session.info.get('alerts_running') or not has_app_context():
+        return
+    if session.new or session.dirty:
+        session.flush()
+    item_ids = session.info.pop('alert_items', None)
+    issued = session.info.pop('alert_issued', set())
+    old_prices = session.info.pop('alert_prices', {})
+    if not item_ids:
+        return
+
+    session.info['alerts_running'] = True
+    try:
+        with session.begin_nested():
+            evaluate_item_alerts(item_ids, issued, old_prices, session)
+    except Exception:
+        current_app.logger.exception('Inventory alert evaluation failed')
+    finally:
+        session.info.pop('alerts_running', None)
+
+
+def _open_alerts(session, item_ids, alert_types):
+    """{(item_id, alert_type): alert_id} للإنذارات المفتوحة"""
+    alerts = SmartInventoryAlert.__table__
+    return {
+        (item_id, alert_type): alert_id
+        for alert_id, item_id, alert_type in session.execute(
+            select(alerts.c.id, alerts.c.item_id, alerts.c.alert_type)
+            .where(alerts.c.item_id.in_(item_ids), alerts.c.is_resolved.is_(False),
+                   alerts.c.alert_type.in_(alert_types))
+        )
+    }
+
+
+def _raise_alerts(session, triggered):
+    """فتح الإنذارات أو تحديث المفتوح منها - triggered: {(item_id, type): قيم}"""
+    alerts = SmartInventoryAlert.__table__
+    now = datetime.utcnow()
+    for (item_id, alert_type), values in triggered.items():
+        key = _dedup_key(item_id, alert_type)
+        changes = dict(values, updated_at=now)
+        if session.execute(update(alerts).where(alerts.c.dedup_key == key).values(**changes)).rowcount:
+            continue
+        try:
+            with session.begin_nested():
+                session.execute(insert(SmartInventoryAlert).values(
+                    item_id=item_id, alert_type=alert_type, dedup_key=key, is_resolved=False,
+                    triggered_at=now, created_at=now, notification_channels='dashboard', **changes
+                ))
+        except IntegrityError:
+            # معاملة أخرى فتحت الإنذار نفسه للتو
+            session.execute(update(alerts).where(alerts.c.dedup_key == key).values(**changes))
+
+
+def _resolve_alerts(session, alert_ids, action):
+    if not alert_ids:
+        return
+    alerts = SmartInventoryAlert.__table__
+    now = datetime.utcnow()
+    session.execute(
+        update(alerts).where(alerts.c.id.in_(list(alert_ids)))
+        .values(is_resolved=True, resolved_at=now, dedup_key=None, action_taken=action, updated_at=now)
+    )
+
+
+def _stock_rules(row, config):
+    """الإنذارات الحالية لصنف حسب رصيده وحده الأدنى - {type: قيم}"""
+    quantity = row.quantity_in_stock or 0
+    minimum = row.minimum_quantity or 0
+    if minimum <= 0:
+        return {}
+    if quantity <= minimum:
+        severity = 'critical' if quantity <= 0 else 'high' if quantity <= minimum / 2 else 'normal'
+        return {'low_stock': {
+            'threshold_value': minimum, 'current_value': quantity, 'severity': severity,
+            'recommended_action': 'إعادة الطلب',
+            'notes': f'{row.name}: الرصيد {quantity:g} أقل من الحد الأدنى {minimum:g}',
+        }}
+    limit = minimum * config.get('ALERT_OVERSTOCK_MULTIPLIER', 5)
+    if quantity > limit:
+        return {'overstock': {
+            'threshold_value': limit, 'current_value': quantity, 'severity': 'low',
+            'recommended_action': 'إيقاف الطلب مؤقتاً',
+            'notes': f'{row.name}: الرصيد {quantity:g} أعلى من {limit:g}',
+        }}
+    return {}
+
+
+def evaluate_item_alerts(item_ids, issued=(), old_prices=None, session=None):
+    """تقييم القواعد الفورية للأصناف المحددة فقط"""
+    session = session or db.session
+    config = current_app.config
+    old_prices = old_prices or {}
+    items = Item.__table__
+    ids = sorted(item_ids)
+    for start in range(0, len(ids), _CHUNK):
+        chunk = ids[start:start + _CHUNK]
+        rows = session.execute(
+            select(items.c.id, items.c.name, items.c.quantity_in_stock, items.c.minimum_quantity, items.c.unit_price)
+            .where(items.c.id.in_(chunk))
+        ).all()
+        open_alerts = _open_alerts(session, chunk, STATE_RULES + ('slow_moving',))
+
+        triggered = {}
+        cleared = []
+        for row in rows:
+            current = _stock_rules(row, config)
+            for alert_type, values in current.items():
+                triggered[(row.id, alert_type)] = values
+            cleared.extend(
+                open_alerts[(row.id, alert_type)] for alert_type in STATE_RULES
+                if alert_type not in current and (row.id, alert_type) in open_alerts
+            )
+            if row.id in issued and (row.id, 'slow_moving') in open_alerts:
+                cleared.append(open_alerts[(row.id, 'slow_moving')])
+
+            old_price = old_prices.get(row.id)
+            if old_price and row.unit_price is not None:
+                change = (row.unit_price - old_price) / old_price * 100
+                threshold = config.get('ALERT_PRICE_CHANGE_PERCENT', 20)
+                if abs(change) >= threshold:
+                    triggered[(row.id, 'price_alert')] = {
+                        'threshold_value': threshold, 'current_value': round(change, 2),
+                        'severity': 'high' if abs(change) >= 2 * threshold else 'normal',
+                        'recommended_action': 'مراجعة سعر المورد',
+                        'notes': f'{row.name}: تغير السعر من {old_price:g} إلى {row.unit_price:g}',
+                    }
+
+        _resolve_alerts(session, cleared, 'auto')
+        _raise_alerts(session, triggered)
+
+
+def sweep_slow_moving(now=None, session=None):
+    """المسح الدوري لقاعدة الركود - يعيد (مفتوحة، محلولة)"""
+    session = session or db.session
+    now = now or datetime.utcnow()
+    days = current_app.config.get('ALERT_SLOW_MOVING_DAYS', 90)
+    cutoff = now - timedelta(days=days)
+
+    # الأصناف التي صُرف منها داخل النافذة فقط (نطاق على ix_transactions_type_date)
+    transactions = Transaction.__table__
+    moving = select(transactions.c.item_id).where(
+        transactions.c.transaction_type == 'issue', transactions.c.transaction_date > cutoff
+    ).distinct()
+    items = Item.__table__
+    stale = {
+        row.id: row for row in session.execute(
+            select(items.c.id, items.c.name, items.c.quantity_in_stock)
+            .where(items.c.quantity_in_stock > 0, items.c.is_active.is_(True),
+                   items.c.created_at <= cutoff, items.c.id.notin_(moving))
+        )
+    }
+
+    alerts = SmartInventoryAlert.__table__
+    open_ids = dict(session.execute(
+        select(alerts.c.item_id, alerts.c.id)
+        .where(alerts.c.is_resolved.is_(False), alerts.c.alert_type == 'slow_moving')
+    ).all())
+    _resolve_alerts(session, [alert_id for item_id, alert_id in open_ids.items() if item_id not in stale], 'auto')
+    _raise_alerts(session, {
+        (item_id, 'slow_moving'): {
+            'threshold_value': days, 'current_value': row.quantity_in_stock, 'severity': 'low',
+            'recommended_action': 'مراجعة الاحتياج أو التحويل',
+            'notes': f'{row.name}: لا صرف منذ {days} يوماً',
+        }
+        for item_id, row in stale.items()
+    })
+    return len(stale), len(set(open_ids) - set(stale))
+
+
+def adopt_open_alerts(session=None):
+    """
+    ربط الإنذارات المفتوحة السابقة (قبل dedup_key) بمفتاحها: الأحدث لكل (صنف،
+    نوع) يُحدث بدلاً من فتح إنذار جديد، والأقدم منه يُحل كمكرر - يعيد عدد المربوطة
+    """
+    session = session or db.session
+    alerts = SmartInventoryAlert.__table__
+    keyed = set(session.execute(
+        select(alerts.c.item_id, alerts.c.alert_type).where(alerts.c.dedup_key.isnot(None))
+    ).all())
+    adopted, duplicates = {}, []
+    for alert_id, item_id, alert_type in session.execute(
+        select(alerts.c.id, alerts.c.item_id, alerts.c.alert_type)
+        .where(alerts.c.is_resolved.is_(False), alerts.c.dedup_key.is_(None))
+        .order_by(alerts.c.triggered_at.desc(), alerts.c.id.desc())
+    ):
+        if (item_id, alert_type) in keyed or (item_id, alert_type) in adopted:
+            duplicates.append(alert_id)
+        else:
+            adopted[(item_id, alert_type)] = alert_id
+    if adopted:
+        session.execute(
+            update(alerts).where(alerts.c.id == bindparam('alert_id')).values(dedup_key=bindparam('key')),
+            [{'alert_id': alert_id, 'key': _dedup_key(*key)} for key, alert_id in adopted.items()],
+        )
+    _resolve_alerts(session, duplicates, 'duplicate')
+    return len(adopted)
+
+
+def rebuild_item_alerts():
+    """ربط الإنذارات السابقة ثم تقييم القواعد الفورية لجميع الأصناف - يعيد عدد الأصناف"""
+    adopt_open_alerts()
+    item_ids = [item_id for (item_id,) in db.session.execute(select(Item.__table__.c.id))]
+    evaluate_item_alerts(item_ids)
+    return len(item_ids)
+
+
+def init_inventory_alerts(app):
+    """تسجيل أمر المسح الدوري"""
+
+    @app.cli.command('inventory-alerts')
+    @click.option('--rebuild', is_flag=True, help='تقييم القواعد الفورية لجميع الأصناف أولاً')
+    def inventory_alerts_command(rebuild):
+        """مسح الأصناف الراكدة (وإعادة تقييم الكتالوج عند الطلب)"""
+        def run():
+            count = rebuild_item_alerts() if rebuild else None
+            return count, sweep_slow_moving()
+
+        results = for_each_center(run).values()
+        if rebuild:
+            click.echo(f'{sum(count for count, _ in results)} صنف')
+        opened = sum(swept[0] for _, swept in results)
+        resolved = sum(swept[1] for _, swept in results)
+        click.echo(f'slow_moving: {opened} مفتوح، {resolved} محلول')
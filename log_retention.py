@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+محرك الاحتفاظ بالسجلات وأرشفتها
+Log Retention - chunked purge of expired log rows with a compressed cold archive
+
+الجداول التالية تكبر باستمرار وتبطئ كل استعلام عليها:
+- security_logs، rate_limit_violations، login_attempts (SECURITY_LOG_RETENTION_DAYS)
+- integration_logs، realtime_events (EVENT_LOG_RETENTION_DAYS)
+
+لكل جدول يتم حذف الصفوف الأقدم من مدة الاحتفاظ على دفعات صغيرة
+(RETENTION_CHUNK_SIZE) كل دفعة في معاملة قصيرة مستقلة، مع استراحة قصيرة بين
+الدفعات حتى لا يبقى قفل الكتابة طويلاً.
+
+قبل الحذف تُكتب الدفعة في أرشيف JSONL مضغوط (gzip) مقسم حسب اليوم:
+    <archive>/<table>/<YYYY>/<MM>/<table>-<YYYYMMDD>-<run>-<n>.jsonl.gz
+ولكل جدول ملف فهرس صغير <archive>/<table>/index.jsonl (اليوم، الملف، عدد
+الصفوف، أول/آخر توقيت) للبحث لاحقاً بدون قاعدة البيانات. ملخص كل تشغيل
+(الصفوف والمدة لكل جدول) يُضاف إلى <archive>/runs.jsonl.
+
+الأوامر:
+    flask purge-expired-logs [--dry-run] [--table NAME]
+    flask search-log-archive TABLE [--since YYYY-MM-DD] [--until YYYY-MM-DD] [--contains TEXT]
+"""
+
+import os
+import json
+import gzip
+import time
+import click
+from collections import namedtuple, OrderedDict
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from sqlalchemy import select, func
+from flask import current_app
+from models import db
+
+
+RetentionTarget = namedtuple('RetentionTarget', ['name', 'table', 'timestamp_column', 'retention_key'])
+
+
+def get_retention_targets():
+    """الجداول الخاضعة للاحتفاظ مع عمود التوقيت ومفتاح مدة الاحتفاظ"""
+    from models import LoginAttempt, IntegrationLog, RealTimeEvent
+    from security_services import RateLimitViolation
+    from security_middleware import SecurityLog
+
+    return [
+        RetentionTarget('security_logs', SecurityLog.__table__, 'timestamp', 'SECURITY_LOG_RETENTION_DAYS'),
+        RetentionTarget('rate_limit_violations', RateLimitViolation.__table__, 'timestamp', 'SECURITY_LOG_RETENTION_DAYS'),
+        RetentionTarget('login_attempts', LoginAttempt.__table__, 'created_at', 'SECURITY_LOG_RETENTION_DAYS'),
+        RetentionTarget('integration_logs', IntegrationLog.__table__, 'created_at', 'EVENT_LOG_RETENTION_DAYS'),
+        RetentionTarget('realtime_events', RealTimeEvent.__table__, 'created_at', 'EVENT_LOG_RETENTION_DAYS'),
+    ]
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+class LogArchive:
+    """أرشيف JSONL مضغوط مقسم حسب الجدول واليوم مع فهرس لكل جدول"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _index_path(self, table_name):
+        return os.path.join(self.root, table_name, 'index.jsonl')
+
+    def write_segment(self, table_name, day, rows, timestamp_column, run_id, sequence):
+        """كتابة صفوف يوم واحد في ملف جديد ثم إضافته إلى الفهرس"""
+        relative = os.path.join(
+            table_name, f'{day:%Y}', f'{day:%m}',
+            f'{table_name}-{day:%Y%m%d}-{run_id}-{sequence}.jsonl.gz'
+        )
+        path = os.path.join(self.root, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # الكتابة في ملف مؤقت ثم إعادة التسمية حتى لا يظهر ملف ناقص في الفهرس
+        tmp_path = f'{path}.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(dict(row), default=_json_default, ensure_ascii=False))
+                f.write('\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        timestamps = [row[timestamp_column] for row in rows if row[timestamp_column] is not None]
+        entry = {
+            'date': day.isoformat(),
+            'segment': relative.replace(os.sep, '/'),
+            'rows': len(rows),
+            'first': min(timestamps).isoformat() if timestamps else None,
+            'last': max(timestamps).isoformat() if timestamps else None,
+            'bytes': os.path.getsize(path),
+        }
+        with open(self._index_path(table_name), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        return entry
+
+    def read_index(self, table_name):
+        """مدخلات فهرس جدول"""
+        try:
+            with open(self._index_path(table_name), encoding='utf-8') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except OSError:
+            return []
+
+    def iter_rows(self, table_name, since=None, until=None):
+        """قراءة الصفوف المؤرشفة بين يومين (شاملة) باستخدام الفهرس فقط لاختيار الملفات"""
+        for entry in self.read_index(table_name):
+            day = date.fromisoformat(entry['date'])
+            if (since and day < since) or (until and day > until):
+                continue
+            with gzip.open(os.path.join(self.root, entry['segment']), 'rt', encoding='utf-8') as f:
+                for line in f:
+                    yield json.loads(line)
+
+    def record_run(self, report):
+        """إضافة ملخص التشغيل إلى runs.jsonl"""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, 'runs.jsonl'), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(report, default=_json_default) + '\n')
+
+
+class RetentionEngine:
+    """حذف السجلات المنتهية على دفعات مع الأرشفة قبل الحذف"""
+
+    def __init__(self, retention_days, chunk_size=1000, pause_seconds=0.05, archive=None, progress=None):
+        self.retention_days = retention_days  # retention_key -> أيام
+        self.chunk_size = chunk_size
+        self.pause_seconds = pause_seconds
+        self.archive = archive
+        self.progress = progress
+
+    def _report_progress(self, table_name, deleted, started):
+        if self.progress is not None:
+            self.progress(table_name, deleted, time.perf_counter() - started)
+
+    def purge(self, target, cutoff, run_id, dry_run=False):
+        """حذف صفوف جدول واحد الأقدم من cutoff - إرجاع تقرير الجدول"""
+        table = target.table
+        column = table.c[target.timestamp_column]
+        primary_key = list(table.primary_key.columns)[0]
+        expired = column < cutoff
+        report = OrderedDict(table=target.name, cutoff=cutoff, archived=0, deleted=0, chunks=0, segments=0)
+        started = time.perf_counter()
+
+        try:
+            if dry_run:
+                with db.engine.connect() as conn:
+                    report['expired'] = conn.execute(select(func.count()).select_from(table).where(expired)).scalar()
+                return report
+
+            while True:
+                with db.engine.connect() as conn:
+                    rows = conn.execute(
+                        select(table).where(expired).order_by(column, primary_key).limit(self.chunk_size)
+                    ).mappings().all()
+                if not rows:
+                    break
+
+                if self.archive is not None:
+                    by_day = OrderedDict()
+                    for row in rows:
+                        by_day.setdefault(row[target.timestamp_column].date(), []).append(row)
+                    for day, day_rows in by_day.items():
+                        self.archive.write_segment(
+                            target.name, day, day_rows, target.timestamp_column, run_id, report['chunks']
+                        )
+                        report['segments'] += 1
+                    report['archived'] += len(rows)
+
+                # معاملة قصيرة لكل دفعة
+                with db.engine.begin() as conn:
+                    deleted = conn.execute(
+                        table.delete().where(primary_key.in_([row[primary_key.key] for row in rows]))
+                    ).rowcount
+                report['deleted'] += deleted
+                report['chunks'] += 1
+                self._report_progress(target.name, report['deleted'], started)
+                if not deleted or len(rows) < self.chunk_size:
+                    break
+                if self.pause_seconds:
+                    time.sleep(self.pause_seconds)
+        except Exception as e:
+            report['error'] = str(getattr(e, 'orig', e))
+            current_app.logger.warning(f'Error purging {target.name}: {str(e)}')
+        finally:
+            report['duration_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        return report
+
+    def run(self, targets, now=None, dry_run=False):
+        """تشغيل الاحتفاظ على جميع الجداول - إرجاع تقرير التشغيل"""
+        now = now or datetime.utcnow()
+        run_id = now.strftime('%Y%m%dT%H%M%S')
+        started = time.perf_counter()
+        tables = []
+        for target in targets:
+            cutoff = now - timedelta(days=self.retention_days[target.retention_key])
+            tables.append(self.purge(target, cutoff, run_id, dry_run=dry_run))
+
+        report = OrderedDict(
+            run_id=run_id,
+            dry_run=dry_run,
+            archived=sum(table['archived'] for table in tables),
+            deleted=sum(table['deleted'] for table in tables),
+            duration_ms=round((time.perf_counter() - started) * 1000, 3),
+            tables=tables,
+        )
+        if self.archive is not None and not dry_run:
+            self.archive.record_run(report)
+        current_app.logger.info(
+            f'Log retention run {run_id}: deleted {report["deleted"]} rows in {report["duration_ms"]} ms'
+        )
+        return report
+
+
+def get_log_archive(app=None):
+    """الأرشيف حسب الإعدادات (None إذا كانت الأرشفة معطلة)"""
+    app = app or current_app
+    if not app.config.get('RETENTION_ARCHIVE_ENABLED', True):
+        return None
+    return LogArchive(app.config.get('RETENTION_ARCHIVE_DIR') or os.path.join(app.instance_path, 'log_archive'))
+
+
+def purge_expired_logs(table_names=None, dry_run=False, progress=None, now=None):
+    """حذف السجلات المنتهية حسب إعدادات التطبيق"""
+    config = current_app.config
+    engine = RetentionEngine(
+        retention_days={
+            'SECURITY_LOG_RETENTION_DAYS': config.get('SECURITY_LOG_RETENTION_DAYS', 365),
+            'EVENT_LOG_RETENTION_DAYS': config.get('EVENT_LOG_RETENTION_DAYS', 90),
+        },
+        chunk_size=config.get('RETENTION_CHUNK_SIZE', 1000),
+        pause_seconds=config.get('RETENTION_PAUSE_SECONDS', 0.05),
+        archive=get_log_archive(),
+        progress=progress,
+    )
+    targets = [
+        target for target in get_retention_targets()
+        if not table_names or target.name in table_names
+    ]
+    return engine.run(targets, now=now, dry_run=dry_run)
+
+
+def init_log_retention(app):
+    """تسجيل أوامر الاحتفاظ والأرشفة"""
+
+    @app.cli.command('purge-expired-logs')
+    @click.option('--dry-run', is_flag=True, help='عرض عدد الصفوف المنتهية فقط')
+    @click.option('--table', 'tables', multiple=True, help='جدول محدد (يمكن تكراره)')
+    def purge_expired_logs_command(dry_run, tables):
+        """حذف السجلات الأقدم من مدة الاحتفاظ بعد أرشفتها"""
+        def progress(table_name, deleted, elapsed):
+            click.echo(f'  {table_name}: {deleted} صف ({elapsed:.1f} ث)')
+
+        report = purge_expired_logs(table_names=tables, dry_run=dry_run, progress=progress)
+        for table in report['tables']:
+            if dry_run:
+                click.echo(f'{table["table"]}: {table.get("expired", 0)} صف منتهي')
+                continue
+            line = (f'{table["table"]}: حذف {table["deleted"]}، أرشفة {table["archived"]} '
+                    f'في {table["segments"]} ملف ({table["duration_ms"]} ms)')
+            if 'error' in table:
+                line += f' - خطأ: {table["error"]}'
+            click.echo(line)
+        click.echo(f'المجموع: {report["deleted"]} صف في {report["duration_ms"]} ms')
+
+    @app.cli.command('search-log-archive')
+    @click.argument('table')
+    @click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), default=None)
+    @click.option('--until', type=click.DateTime(formats=['%Y-%m-%d']), default=None)
+    @click.option('--contains', default=None, help='نص يجب أن يظهر في الصف')
+    def search_log_archive_command(table, since, until, contains):
+        """البحث في السجلات المؤرشفة"""
+        archive = get_log_archive()
+        if archive is None:
+            click.echo('الأرشفة معطلة')
+            return
+        for row in archive.iter_rows(table, since and since.date(), until and until.date()):
+            line = json.dumps(row, ensure_ascii=False)
+            if contains is None or contains in line:
+                click.echo(line)
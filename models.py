@@ -1,11 +1,27 @@
+from flask import current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as _FlaskSession
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 from enum import Enum
 import uuid
 
-db = SQLAlchemy()
+
+class CenterRoutingSession(_FlaskSession):
+    """جلسة توجه جداول المراكز إلى قاعدة بيانات المركز عند تفعيل التقسيم (center_shards)"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            router = current_app.extensions.get('center_shards')
+            if router is not None:
+                engine = router.bind_for(mapper, clause)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={'class_': CenterRoutingSession})
 
 # Enums
 class UserRole(str, Enum):
@@ -175,6 +191,9 @@ class User(UserMixin, db.Model):
     is_active = db.Column(db.Boolean, default=True)
     is_verified = db.Column(db.Boolean, default=False)
     
+    # نسخة الصلاحيات - ترتفع عند كل تعديل لإبطال الذاكرة المؤقتة
+    permission_version = db.Column(db.Integer, nullable=False, default=0)
+    
     phone = db.Column(db.String(20), nullable=True)
     address = db.Column(db.Text, nullable=True)
     
@@ -197,20 +216,25 @@ class User(UserMixin, db.Model):
         return check_password_hash(self.password_hash, password)
     
     def has_granular_permission(self, permission_key):
-        """التحقق من صلاحية حبيبية محددة"""
-        return UserPermission.query.filter_by(
-            user_id=self.id,
-            permission_key=permission_key,
-            is_allowed=True
-        ).first() is not None
+        """التحقق من صلاحية حبيبية محددة (من مجموعة الصلاحيات المحملة للطلب)"""
+        return permission_key in self.get_permission_set()
+    
+    def get_permission_set(self):
+        """مجموعة الصلاحيات المسموحة (frozenset + قناع بت) - تحمل مرة واحدة لكل طلب"""
+        from permission_cache import get_user_permission_set
+        return get_user_permission_set(self.id, self.permission_version or 0)
     
     def get_all_permissions(self):
         """الحصول على جميع الصلاحيات المسموحة للمستخدم"""
-        permissions = UserPermission.query.filter_by(
-            user_id=self.id,
-            is_allowed=True
-        ).all()
-        return {p.permission_key for p in permissions}
+        return set(self.get_permission_set())
+    
+    def has_any_permission(self, *permission_keys):
+        """التحقق من وجود صلاحية واحدة على الأقل من القائمة (قناع بت)"""
+        return self.get_permission_set().has_any(*permission_keys)
+    
+    def has_all_permissions(self, *permission_keys):
+        """التحقق من وجود جميع الصلاحيات في القائمة (قناع بت)"""
+        return self.get_permission_set().has_all(*permission_keys)
     
     def has_permission(self, required_role):
         """التحقق من الصلاحيات"""
@@ -228,14 +252,6 @@ class User(UserMixin, db.Model):
         required_level = role_hierarchy.get(required_role, 0)
         return user_level >= required_level
     
-    def has_granular_permission(self, permission_key):
-        """التحقق من صلاحية حبيبية محددة"""
-        return UserPermission.query.filter_by(
-            user_id=self.id,
-            permission_key=permission_key,
-            is_allowed=True
-        ).first() is not None
-    
     def __repr__(self):
         return f'<User {self.username}>'
     
@@ -290,6 +306,7 @@ class ItemCategory_Model(db.Model):
 class Item(db.Model):
     """نموذج الأصناف (المواد)"""
     __tablename__ = 'items'
+    __table_args__ = (db.Index('ix_items_center_active', 'center_id', 'is_active'),)
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     code = db.Column(db.String(50), unique=True, nullable=False, index=True)
@@ -305,8 +322,10 @@ class Item(db.Model):
     unit = db.Column(db.String(50), nullable=False)  # قطعة، كغ، لتر، إلخ
     
     quantity_in_stock = db.Column(db.Float, default=0)
+    stock_version = db.Column(db.Integer, nullable=False, default=0)  # يزداد مع كل حركة مخزون (stock_ledger)
     minimum_quantity = db.Column(db.Float, default=0)  # الحد الأدنى للمخزون
     unit_price = db.Column(db.Float, nullable=True)
+    stock_value = db.Column(db.Float, nullable=False, default=0)  # قيمة الرصيد بالتكلفة (stock_costing)
     
     # معلومات إضافية للمعدات التدريبية
     is_consumable = db.Column(db.Boolean, default=False)  # هل قابلة للاستهلاك (مواد خام)
@@ -367,7 +386,10 @@ class Supplier(db.Model):
     # العلاقات
     purchase_orders = db.relationship('PurchaseOrder', backref='supplier', lazy=True)
     
-    __table_args__ = (db.UniqueConstraint('code', 'center_id', name='unique_supplier_code_per_center'),)
+    __table_args__ = (
+        db.UniqueConstraint('code', 'center_id', name='unique_supplier_code_per_center'),
+        db.Index('ix_suppliers_center_active', 'center_id', 'is_active'),
+    )
     
     def __repr__(self):
         return f'<Supplier {self.name}>'
@@ -398,7 +420,10 @@ class PurchaseOrder(db.Model):
     # العلاقات
     items = db.relationship('PurchaseOrderItem', backref='purchase_order', lazy=True, cascade='all, delete-orphan')
     
-    __table_args__ = (db.UniqueConstraint('po_number', 'center_id', name='unique_po_per_center'),)
+    __table_args__ = (
+        db.UniqueConstraint('po_number', 'center_id', name='unique_po_per_center'),
+        db.Index('ix_purchase_orders_center_date', 'center_id', 'order_date'),
+    )
     
     def __repr__(self):
         return f'<PurchaseOrder {self.po_number}>'
@@ -425,6 +450,13 @@ class PurchaseOrderItem(db.Model):
 class Transaction(db.Model):
     """نموذج العمليات (حركة المخزون)"""
     __tablename__ = 'transactions'
+    __table_args__ = (
+        db.Index('ix_transactions_center_date', 'center_id', 'transaction_date'),
+        db.Index('ix_transactions_item_date', 'item_id', 'transaction_date'),
+        db.Index('ix_transactions_type_date', 'transaction_type', 'transaction_date'),
+        db.Index('ix_transactions_date', 'transaction_date'),
+        db.Index('ix_transactions_created', 'created_at'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     reference_number = db.Column(db.String(50), unique=True, nullable=False)
@@ -486,7 +518,10 @@ class AssetRegistration(db.Model):
     assignments = db.relationship('ItemIssue', backref='asset', lazy=True)
     scan_logs = db.relationship('AssetScanLog', backref='asset', lazy=True, cascade='all, delete-orphan')
     
-    __table_args__ = (db.UniqueConstraint('asset_code', 'center_id', name='unique_asset_code_per_center'),)
+    __table_args__ = (
+        db.UniqueConstraint('asset_code', 'center_id', name='unique_asset_code_per_center'),
+        db.Index('ix_asset_registrations_center_status', 'center_id', 'status'),
+    )
     
     def __repr__(self):
         return f'<AssetRegistration {self.asset_code}>'
@@ -524,6 +559,7 @@ class AssetScanLog(db.Model):
 class ItemIssue(db.Model):
     """نموذج تسليم العتاد للموظفين"""
     __tablename__ = 'item_issues'
+    __table_args__ = (db.Index('ix_item_issues_asset_returned', 'asset_id', 'actual_return_date'),)
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     issue_number = db.Column(db.String(50), unique=True, nullable=False)
@@ -568,7 +604,10 @@ class Recipe(db.Model):
     # العلاقات
     ingredients = db.relationship('RecipeIngredient', backref='recipe', lazy=True, cascade='all, delete-orphan')
     
-    __table_args__ = (db.UniqueConstraint('code', 'center_id', name='unique_recipe_code_per_center'),)
+    __table_args__ = (
+        db.UniqueConstraint('code', 'center_id', name='unique_recipe_code_per_center'),
+        db.Index('ix_recipes_center_active', 'center_id', 'is_active'),
+    )
     
     def __repr__(self):
         return f'<Recipe {self.name}>'
@@ -594,6 +633,10 @@ class RecipeIngredient(db.Model):
 class MealRecord(db.Model):
     """نموذج سجل الوجبات اليومي"""
     __tablename__ = 'meal_records'
+    __table_args__ = (
+        db.Index('ix_meal_records_center_date', 'center_id', 'record_date'),
+        db.Index('ix_meal_records_date', 'record_date'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     record_date = db.Column(db.Date, nullable=False, default=datetime.utcnow)
@@ -618,6 +661,10 @@ class MealRecord(db.Model):
 class ActivityLog(db.Model):
     """نموذج سجل النشاطات"""
     __tablename__ = 'activity_logs'
+    __table_args__ = (
+        db.Index('ix_activity_logs_center_created', 'center_id', 'created_at'),
+        db.Index('ix_activity_logs_created', 'created_at'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     
@@ -650,6 +697,7 @@ class ActivityLog(db.Model):
 class Notification(db.Model):
     """نموذج الإشعارات والتنبيهات"""
     __tablename__ = 'notifications'
+    __table_args__ = (db.Index('ix_notifications_user_read_created', 'user_id', 'is_read', 'created_at'),)
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
@@ -789,7 +837,7 @@ class LoginAttempt(db.Model):
     success = db.Column(db.Boolean, default=False)
     reason = db.Column(db.String(255), nullable=True)
     
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
 
 # 5. ADVANCED REPORTING
@@ -1672,7 +1720,7 @@ class RealTimeEvent(db.Model):
     
     is_broadcasted = db.Column(db.Boolean, default=False)
     
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     triggered_by = db.relationship('User', backref='triggered_events')
     
@@ -1733,7 +1781,7 @@ class IntegrationLog(db.Model):
     
     execution_time_ms = db.Column(db.Integer, nullable=True)
     
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     integration = db.relationship('ExternalIntegration', backref='logs')
     
@@ -1826,6 +1874,49 @@ class FeatureFlag(db.Model):
         return f'<FeatureFlag {self.flag_name}>'
 
 
+class SecurityRollup(db.Model):
+    """ملخصات سجلات وتنبيهات الأمان (ساعية ويومية) للوحة تحكم الأمان"""
+    __tablename__ = 'security_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('period', 'bucket', 'source', 'kind', 'severity', 'status', name='unique_security_rollup_key'),
+        db.Index('ix_security_rollups_source_period_bucket', 'source', 'period', 'bucket'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    
+    period = db.Column(db.String(10), nullable=False)  # hour, day
+    bucket = db.Column(db.DateTime, nullable=False)  # بداية الساعة أو اليوم
+    source = db.Column(db.String(10), nullable=False)  # log, alert
+    kind = db.Column(db.String(50), nullable=False)  # action أو alert_type
+    severity = db.Column(db.String(20), nullable=False, default='')
+    status = db.Column(db.String(20), nullable=False, default='')  # success/failed أو open/acknowledged
+    
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<SecurityRollup {self.period} {self.bucket} {self.source}:{self.kind}={self.count}>'
+
+
+class DocumentSequence(db.Model):
+    """تسلسل أرقام المستندات لكل (مركز، نوع المستند، فترة) - تُحجز على شكل كتل (reference_numbers)"""
+    __tablename__ = 'document_sequences'
+    __table_args__ = (
+        db.UniqueConstraint('center_key', 'doc_type', 'period', name='unique_document_sequence_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    
+    center_key = db.Column(db.String(36), nullable=False, default='')  # '' = بدون مركز
+    doc_type = db.Column(db.String(20), nullable=False)  # MEAL, TRN, REQ, COUNT, ISS, PO
+    period = db.Column(db.String(6), nullable=False)  # YYYYMM
+    
+    next_value = db.Column(db.Integer, nullable=False, default=1)  # أول رقم غير محجوز
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DocumentSequence {self.doc_type} {self.center_key} {self.period}={self.next_value}>'
+
+
 # ==================== 16. EMPLOYEE STOCK REQUESTS ====================
 
 class StockRequest(db.Model):
@@ -1948,6 +2039,7 @@ class StockRequestItem(db.Model):
 class InventoryABCAnalysis(db.Model):
     """نموذج تحليل ABC للمخزون"""
     __tablename__ = 'inventory_abc_analysis'
+    __table_args__ = (db.Index('ix_inventory_abc_analysis_period_item', 'period', 'item_id'),)
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     item_id = db.Column(db.String(36), db.ForeignKey('items.id'), nullable=False)
@@ -1972,6 +2064,99 @@ class InventoryABCAnalysis(db.Model):
         return f'<InventoryABCAnalysis {self.item_id}:{self.abc_category}>'
 
 
+class ItemConsumptionDaily(db.Model):
+    """الاستهلاك اليومي لكل صنف - يُحدث تدريجياً من الحركات الجديدة (abc_analysis)"""
+    __tablename__ = 'item_consumption_daily'
+    __table_args__ = (
+        db.UniqueConstraint('item_id', 'day', name='unique_item_consumption_day'),
+        db.Index('ix_item_consumption_daily_day', 'day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.String(36), db.ForeignKey('items.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    
+    quantity = db.Column(db.Float, nullable=False, default=0)
+    value = db.Column(db.Float, nullable=False, default=0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    last_transaction_at = db.Column(db.DateTime, nullable=True, index=True)  # علامة المياه العالية
+    
+    def __repr__(self):
+        return f'<ItemConsumptionDaily {self.item_id} {self.day}>'
+
+
+class ItemCostLayer(db.Model):
+    """طبقة تكلفة FIFO - كمية مستلمة بتكلفة واحدة تُستهلك من الأقدم (stock_costing)"""
+    __tablename__ = 'item_cost_layers'
+    __table_args__ = (db.Index('ix_item_cost_layers_item_open', 'item_id', 'is_open', 'id'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.String(36), db.ForeignKey('items.id'), nullable=False)
+    
+    unit_cost = db.Column(db.Float, nullable=False, default=0)
+    original_quantity = db.Column(db.Float, nullable=False)
+    remaining_quantity = db.Column(db.Float, nullable=False)
+    is_open = db.Column(db.Boolean, nullable=False, default=True)
+    
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ItemCostLayer {self.item_id} {self.remaining_quantity}@{self.unit_cost}>'
+
+
+class StockValueTotal(db.Model):
+    """إجمالي قيمة المخزون بالتكلفة لكل مركز - يُحدث مع كل حركة (stock_costing)"""
+    __tablename__ = 'stock_value_totals'
+    
+    center_key = db.Column(db.String(36), primary_key=True)  # '' للأصناف بدون مركز
+    total_value = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<StockValueTotal {self.center_key}: {self.total_value}>'
+
+
+class StockSnapshotPeriod(db.Model):
+    """إقفال فترة مخزون - رأس اللقطة لكل تاريخ (stock_snapshots)"""
+    __tablename__ = 'stock_snapshot_periods'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    snapshot_date = db.Column(db.Date, unique=True, nullable=False)  # الرصيد في نهاية هذا اليوم
+    
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    total_value = db.Column(db.Float, nullable=False, default=0)
+    includes_warehouses = db.Column(db.Boolean, nullable=False, default=False)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<StockSnapshotPeriod {self.snapshot_date}>'
+
+
+class StockSnapshot(db.Model):
+    """رصيد صنف في نهاية يوم الإقفال - warehouse_id فارغ للرصيد الإجمالي للصنف"""
+    __tablename__ = 'stock_snapshots'
+    __table_args__ = (
+        db.Index('ix_stock_snapshots_date_item', 'snapshot_date', 'item_id'),
+        db.Index('ix_stock_snapshots_date_center', 'snapshot_date', 'center_id'),
+        db.Index('ix_stock_snapshots_date_warehouse', 'snapshot_date', 'warehouse_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    snapshot_date = db.Column(db.Date, nullable=False)
+    item_id = db.Column(db.String(36), db.ForeignKey('items.id'), nullable=False)
+    center_id = db.Column(db.String(36), db.ForeignKey('vocational_centers.id'), nullable=True)
+    warehouse_id = db.Column(db.String(36), db.ForeignKey('warehouses.id'), nullable=True)
+    
+    quantity = db.Column(db.Float, nullable=False, default=0)
+    unit_price = db.Column(db.Float, nullable=True)
+    value = db.Column(db.Float, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<StockSnapshot {self.snapshot_date} {self.item_id}>'
+
+
 # 2. عمليات الجرد الدورية
 class InventoryCount(db.Model):
     """نموذج عمليات الجرد الدورية"""
@@ -2080,6 +2265,7 @@ class WarehouseInventory(db.Model):
 class InventoryCostAnalysis(db.Model):
     """نموذج تحليل تكاليف المخزون"""
     __tablename__ = 'inventory_cost_analysis'
+    __table_args__ = (db.Index('ix_inventory_cost_analysis_period_item', 'period', 'item_id'),)
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     item_id = db.Column(db.String(36), db.ForeignKey('items.id'), nullable=False)
@@ -2108,6 +2294,32 @@ class InventoryCostAnalysis(db.Model):
         return f'<InventoryCostAnalysis {self.item_id}>'
 
 
+class BackgroundJobState(db.Model):
+    """حالة مهمة خلفية وقفلها المشترك بين العمليات - صف واحد لكل مهمة (cost_analysis_engine)"""
+    __tablename__ = 'background_job_states'
+    
+    job_name = db.Column(db.String(50), primary_key=True)
+    
+    # التشغيل يُحجز بـ UPDATE مشروط (الحالة ليست running أو توقفت نبضاتها)
+    owner = db.Column(db.String(36), nullable=True)  # معرف التشغيل الحالي
+    state = db.Column(db.String(20), nullable=False, default='idle')  # idle, running, done, failed
+    period = db.Column(db.String(50), nullable=True)
+    
+    # التقدم
+    stage = db.Column(db.String(50), nullable=True)
+    done = db.Column(db.Integer, default=0)
+    total = db.Column(db.Integer, default=0)
+    items = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text, nullable=True)
+    
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<BackgroundJobState {self.job_name}: {self.state}>'
+
+
 # 5. توصيات الطلب
 class RecommendedOrder(db.Model):
     """نموذج توصيات الطلب المثالي"""
@@ -2341,10 +2553,18 @@ class Notification(db.Model):
 class SmartInventoryAlert(db.Model):
     """نموذج إنذارات المخزون الذكية"""
     __tablename__ = 'smart_inventory_alerts'
+    __table_args__ = (
+        db.Index('ix_smart_alerts_open_type', 'is_resolved', 'alert_type', 'triggered_at'),
+        db.Index('ix_smart_alerts_item_open', 'item_id', 'is_resolved'),
+        db.Index('ux_smart_alerts_dedup', 'dedup_key', unique=True),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     item_id = db.Column(db.String(36), db.ForeignKey('items.id'), nullable=False)
     
+    # "item_id:alert_type" للإنذار المفتوح فقط (فارغ بعد الحل) - إنذار مفتوح واحد لكل نوع (inventory_alerts)
+    dedup_key = db.Column(db.String(100), nullable=True)
+    
     alert_type = db.Column(db.String(50), nullable=False)  # low_stock, slow_moving, overstock, price_alert, quality_alert
     
     threshold_value = db.Column(db.Float, nullable=False)  # قيمة الحد
@@ -2372,6 +2592,10 @@ class SmartInventoryAlert(db.Model):
     
     item = db.relationship('Item')
     
+    @property
+    def alert_message(self):
+        return self.notes
+    
     def __repr__(self):
         return f'<SmartInventoryAlert {self.item_id}:{self.alert_type}>'
 
@@ -2610,6 +2834,7 @@ class EmployeeMealSubsidy(db.Model):
 class EmployeeMealTransaction(db.Model):
     """نموذج عمليات استهلاك الموظفين للوجبات"""
     __tablename__ = 'employee_meal_transactions'
+    __table_args__ = (db.Index('ix_employee_meal_transactions_user_settled', 'user_id', 'is_settled'),)
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     
@@ -124,16 +124,24 @@ IntegrationLog = models_core.IntegrationLog
 AdvancedAuditLog = models_core.AdvancedAuditLog
 MobileAPIKey = models_core.MobileAPIKey
 FeatureFlag = models_core.FeatureFlag
+SecurityRollup = models_core.SecurityRollup
+DocumentSequence = models_core.DocumentSequence
 
 # Models - Stock & Inventory Analysis
 StockRequest = models_core.StockRequest
 StockRequestItem = models_core.StockRequestItem
 InventoryABCAnalysis = models_core.InventoryABCAnalysis
+ItemConsumptionDaily = models_core.ItemConsumptionDaily
+ItemCostLayer = models_core.ItemCostLayer
+StockValueTotal = models_core.StockValueTotal
+StockSnapshotPeriod = models_core.StockSnapshotPeriod
+StockSnapshot = models_core.StockSnapshot
 InventoryCount = models_core.InventoryCount
 InventoryCountItem = models_core.InventoryCountItem
 Warehouse = models_core.Warehouse
 WarehouseInventory = models_core.WarehouseInventory
 InventoryCostAnalysis = models_core.InventoryCostAnalysis
+BackgroundJobState = models_core.BackgroundJobState
 RecommendedOrder = models_core.RecommendedOrder
 InventoryForecast = models_core.InventoryForecast
 PriceHistory = models_core.PriceHistory
@@ -257,15 +265,23 @@ __all__ = [
     'AdvancedAuditLog',
     'MobileAPIKey',
     'FeatureFlag',
+    'SecurityRollup',
+    'DocumentSequence',
     # Stock & Inventory Analysis
     'StockRequest',
     'StockRequestItem',
     'InventoryABCAnalysis',
+    'ItemConsumptionDaily',
+    'ItemCostLayer',
+    'StockValueTotal',
+    'StockSnapshotPeriod',
+    'StockSnapshot',
     'InventoryCount',
     'InventoryCountItem',
     'Warehouse',
     'WarehouseInventory',
     'InventoryCostAnalysis',
+    'BackgroundJobState',
     'RecommendedOrder',
     'InventoryForecast',
     'PriceHistory',
@@ -116,7 +116,7 @@ class SecurityAlert(db.Model):
     is_acknowledged = db.Column(db.Boolean, default=False)
     acknowledged_at = db.Column(db.DateTime, nullable=True)
     acknowledged_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     user = db.relationship('User', foreign_keys=[user_id], backref='security_alerts')
     acknowledged_user = db.relationship('User', foreign_keys=[acknowledged_by])
@@ -223,7 +223,7 @@ class SecurityLog(db.Model):
     user_agent = db.Column(db.String(255), nullable=True)
     status = db.Column(db.String(20), default='success')  # success, failed
     error_message = db.Column(db.Text, nullable=True)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     user = db.relationship('User', backref='security_logs')
     
@@ -299,7 +299,7 @@ class RateLimitViolation(db.Model):
     ip_address = db.Column(db.String(45), nullable=False)
     endpoint = db.Column(db.String(255), nullable=False)
     request_count = db.Column(db.Integer, default=1)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     action_taken = db.Column(db.String(50), nullable=True)  # blocked, logged, etc.
     
     user = db.relationship('User', backref='rate_limit_violations')
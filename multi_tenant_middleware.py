@@ -6,7 +6,10 @@ Multi-Tenant Middleware
 
 from flask import current_app, request, abort, session
 from flask_login import current_user
-from models import User, UserRole, VocationalCenter
+from models import db, User, UserRole, VocationalCenter
+from identity_cache import is_center_active
+from tenant_scope import set_tenant_scope
+from center_shards import select_shard_center
 from functools import wraps
 
 def get_user_centers():
@@ -20,10 +23,8 @@ def get_user_centers():
         return VocationalCenter.query.filter_by(is_active=True).all()
     
     # موظفو المركز يمكنهم الوصول لمركزهم فقط
-    if current_user.center_id:
-        center = VocationalCenter.query.get(current_user.center_id)
-        if center and center.is_active:
-            return [center]
+    if is_center_active(current_user.center_id):
+        return [db.session.get(VocationalCenter, current_user.center_id)]
     
     return []
 
@@ -37,17 +38,13 @@ def get_current_center():
     if current_user.role in [UserRole.FOUNDER, UserRole.ADMIN]:
         # محاولة الحصول على المركز من session أو request
         center_id = session.get('current_center_id') or request.args.get('center_id')
-        if center_id:
-            center = VocationalCenter.query.get(center_id)
-            if center and center.is_active:
-                return center
+        if is_center_active(center_id):
+            return db.session.get(VocationalCenter, center_id)
         return None
     
-    # موظفو المركز لديهم مركز محدد
-    if current_user.center_id:
-        center = VocationalCenter.query.get(current_user.center_id)
-        if center and center.is_active:
-            return center
+    # موظفو المركز لديهم مركز محدد (حالة التفعيل من ذاكرة الهوية)
+    if is_center_active(current_user.center_id):
+        return db.session.get(VocationalCenter, current_user.center_id)
     
     return None
 
@@ -99,17 +96,24 @@ def ensure_center_isolation():
     يتم تطبيقه قبل كل طلب
     """
     
+    # نطاق الاستعلامات التلقائي (center_id) لهذا الطلب
+    set_tenant_scope(current_user)
+    
     if not current_user.is_authenticated:
+        select_shard_center(None)
         return
     
     # تعيين المركز الحالي في session
     if current_user.role in [UserRole.FOUNDER, UserRole.ADMIN]:
         center_id = request.args.get('center_id')
-        if center_id:
+        if center_id and session.get('current_center_id') != center_id:
             session['current_center_id'] = center_id
-    else:
-        # موظفو المركز لديهم مركز محدد
+    elif session.get('current_center_id') != current_user.center_id:
+        # موظفو المركز لديهم مركز محدد (الكتابة فقط عند التغيير حتى لا يعاد إرسال الكوكي)
         session['current_center_id'] = current_user.center_id
+    
+    # قاعدة بيانات المركز للجداول التشغيلية (عند تفعيل التقسيم)
+    select_shard_center(current_user)
 
 def is_founder():
     """التحقق من أن المستخدم مؤسس"""
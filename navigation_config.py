@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+قوائم التنقل (الشريط الجانبي ولوحة الموظفين)
+Navigation Configuration - sidebar and employee dashboard menus
+
+كل رابط مرتبط بصلاحية (أو أكثر) ويتم ترجمة الصلاحيات إلى أقنعة بت مرة واحدة
+عند الاستيراد، ثم يكون تحديد الأقسام والروابط الظاهرة عمليات AND فقط.
+"""
+
+from permissions_config import PERMISSION_CATALOGUE
+
+
+# === أقسام الشريط الجانبي ===
+SIDEBAR_SECTIONS = [
+    {
+        'key': 'inventory',
+        'title': 'إدارة المخزون',
+        'icon': 'fas fa-boxes',
+        'menu_id': 'inventoryMenu',
+        'links': [
+            {'permissions': ['inventory_view_items'], 'endpoint': 'inventory.items', 'icon': 'fas fa-list', 'label': 'الأصناف'},
+            {'permissions': ['inventory_view_categories'], 'endpoint': 'inventory.categories', 'icon': 'fas fa-tags', 'label': 'التصنيفات'},
+            {'permissions': ['inventory_view_transactions'], 'endpoint': 'inventory.transactions', 'icon': 'fas fa-exchange', 'label': 'العمليات'},
+            {'permissions': ['inventory_view_warehouses'], 'endpoint': 'inventory.warehouses', 'icon': 'fas fa-warehouse', 'label': 'المستودعات'},
+            {'permissions': ['inventory_view_counts'], 'endpoint': 'inventory.inventory_counts', 'icon': 'fas fa-tasks', 'label': 'عمليات الجرد'},
+            {'permissions': ['inventory_view_abc_analysis'], 'endpoint': 'inventory.abc_analysis', 'icon': 'fas fa-chart-bar', 'label': 'تحليل ABC'},
+            {'permissions': ['inventory_view_cost_analysis'], 'endpoint': 'inventory.cost_analysis', 'icon': 'fas fa-money-bill-wave', 'label': 'تحليل التكاليف'},
+            {'permissions': ['inventory_view_recommendations'], 'endpoint': 'inventory.recommendations', 'icon': 'fas fa-lightbulb', 'label': 'التوصيات'},
+            {'permissions': ['inventory_view_forecasts'], 'endpoint': 'inventory.forecasts', 'icon': 'fas fa-crystal-ball', 'label': 'التنبؤات'},
+            {'permissions': ['inventory_view_price_history'], 'endpoint': 'inventory.price_history', 'icon': 'fas fa-history', 'label': 'سجل الأسعار'},
+            {'permissions': ['inventory_view_supplier_performance'], 'endpoint': 'inventory.supplier_performance', 'icon': 'fas fa-star', 'label': 'أداء الموردين'},
+            {'permissions': ['inventory_view_qrbarcode'], 'endpoint': 'inventory.qrbarcode_config', 'icon': 'fas fa-qrcode', 'label': 'QR/الباركود'},
+            {'permissions': ['inventory_view_smart_alerts'], 'endpoint': 'inventory.smart_alerts', 'icon': 'fas fa-bell', 'label': 'الإنذارات الذكية'},
+        ]
+    },
+    {
+        'key': 'suppliers',
+        'title': 'الموردين',
+        'icon': 'fas fa-truck',
+        'menu_id': 'suppliersMenu',
+        'links': [
+            {'permissions': ['suppliers_view'], 'endpoint': 'suppliers.suppliers', 'icon': 'fas fa-users', 'label': 'الموردين'},
+            {'permissions': ['suppliers_view_orders'], 'endpoint': 'suppliers.orders', 'icon': 'fas fa-receipt', 'label': 'أوامر الشراء'},
+        ]
+    },
+    {
+        'key': 'equipment',
+        'title': 'إدارة المعدات',
+        'icon': 'fas fa-laptop',
+        'menu_id': 'equipmentMenu',
+        'links': [
+            {'permissions': ['equipment_view_assets'], 'endpoint': 'equipment.assets', 'icon': 'fas fa-cube', 'label': 'الأصول'},
+            {'permissions': ['equipment_view_issues'], 'endpoint': 'equipment.issues', 'icon': 'fas fa-hand-paper', 'label': 'التسليمات'},
+        ]
+    },
+    {
+        'key': 'restaurant',
+        'title': 'المطعم',
+        'icon': 'fas fa-utensils',
+        'menu_id': 'restaurantMenu',
+        'links': [
+            {'permissions': ['restaurant_view_recipes'], 'endpoint': 'restaurant.recipes', 'icon': 'fas fa-book', 'label': 'الوصفات'},
+            {'permissions': ['restaurant_view_meals'], 'endpoint': 'restaurant.meals', 'icon': 'fas fa-pizza-slice', 'label': 'الوجبات'},
+            {'permissions': ['restaurant_view_meals'], 'endpoint': 'restaurant.daily_report', 'icon': 'fas fa-file-alt', 'label': 'التقرير اليومي'},
+            {'permissions': ['restaurant_view_waste'], 'endpoint': 'restaurant_advanced.waste_list', 'icon': 'fas fa-trash', 'label': 'إدارة الفاقد والهدر'},
+            {'permissions': ['restaurant_view_forecast'], 'endpoint': 'restaurant_advanced.forecast_list', 'icon': 'fas fa-chart-line', 'label': 'توقعات الطلب'},
+            {'permissions': ['restaurant_view_subsidy'], 'endpoint': 'restaurant_advanced.subsidy_list', 'icon': 'fas fa-gift', 'label': 'دعم الموظفين'},
+            {'permissions': ['restaurant_view_employee_meals'], 'endpoint': 'employee_meals.daily_registration', 'icon': 'fas fa-utensils', 'label': 'وجبات الموظفين'},
+            {'permissions': ['restaurant_view_employee_meals'], 'endpoint': 'employee_meals.meals_list', 'icon': 'fas fa-list', 'label': 'قائمة الوجبات'},
+            {'permissions': ['restaurant_view_employee_meals'], 'endpoint': 'employee_meals.alerts_list', 'icon': 'fas fa-bell', 'label': 'التنبيهات'},
+            {'permissions': ['restaurant_view_employee_payments'], 'endpoint': 'employee_meals.payments_list', 'icon': 'fas fa-credit-card', 'label': 'إدارة دفعات الموظفين'},
+        ]
+    },
+    {
+        'key': 'reports',
+        'title': 'التقارير',
+        'icon': 'fas fa-file-pdf',
+        'menu_id': 'reportsMenu',
+        'links': [
+            {'permissions': ['reports_inventory_movement'], 'endpoint': 'reports.inventory_movement', 'icon': 'fas fa-chart-bar', 'label': 'حركة المخزون'},
+            {'permissions': ['reports_low_stock'], 'endpoint': 'reports.low_stock', 'icon': 'fas fa-exclamation-triangle', 'label': 'منخفضة المخزون'},
+            {'permissions': ['reports_asset_inventory'], 'endpoint': 'reports.asset_inventory', 'icon': 'fas fa-list-check', 'label': 'جرد الأصول'},
+            {'permissions': ['reports_meal_consumption'], 'endpoint': 'reports.meal_consumption', 'icon': 'fas fa-chart-pie', 'label': 'استهلاك المطعم'},
+        ]
+    },
+    {
+        'key': 'admin',
+        'title': 'الإدارة',
+        'icon': 'fas fa-cog',
+        'menu_id': 'adminMenu',
+        'links': [
+            {'permissions': ['admin_manage_organization_settings'], 'endpoint': 'admin.organization_settings', 'icon': 'fas fa-hospital', 'label': 'إعدادات المؤسسة'},
+            {'permissions': ['admin_view_users', 'admin_add_user', 'admin_edit_user', 'admin_delete_user', 'admin_manage_permissions'], 'endpoint': 'admin.users', 'icon': 'fas fa-users-cog', 'label': 'إدارة المستخدمين'},
+            {'permissions': ['admin_view_activity_logs'], 'endpoint': 'admin.activity_logs', 'icon': 'fas fa-history', 'label': 'سجل النشاطات'},
+        ]
+    },
+]
+
+
+# === وحدات لوحة تحكم الموظفين ===
+EMPLOYEE_DASHBOARD_MODULES = [
+    {
+        'key': 'inventory',
+        'name': 'إدارة المخزون',
+        'icon': 'fas fa-warehouse',
+        'color': 'info',
+        'permissions': ['inventory_view_items', 'inventory_add_transaction'],
+        'links': [
+            {'title': 'عرض الأصناف', 'url': 'inventory.items', 'permission': 'inventory_view_items', 'icon': 'fas fa-list'},
+            {'title': 'إضافة عملية', 'url': 'inventory.add_transaction', 'permission': 'inventory_add_transaction', 'icon': 'fas fa-plus'},
+        ]
+    },
+    {
+        'key': 'equipment',
+        'name': 'إدارة الأصول',
+        'icon': 'fas fa-tools',
+        'color': 'warning',
+        'permissions': ['equipment_view_assets', 'equipment_add_issue'],
+        'links': [
+            {'title': 'عرض الأصول', 'url': 'equipment.assets', 'permission': 'equipment_view_assets', 'icon': 'fas fa-list'},
+            {'title': 'تسليم أصل', 'url': 'equipment.add_issue', 'permission': 'equipment_add_issue', 'icon': 'fas fa-plus'},
+        ]
+    },
+    {
+        'key': 'restaurant',
+        'name': 'إدارة المطعم',
+        'icon': 'fas fa-utensils',
+        'color': 'danger',
+        'permissions': ['restaurant_view_recipes', 'restaurant_add_meal'],
+        'links': [
+            {'title': 'عرض الوصفات', 'url': 'restaurant.recipes', 'permission': 'restaurant_view_recipes', 'icon': 'fas fa-list'},
+            {'title': 'تسجيل وجبة', 'url': 'restaurant.add_meal', 'permission': 'restaurant_add_meal', 'icon': 'fas fa-plus'},
+        ]
+    },
+    {
+        'key': 'suppliers',
+        'name': 'إدارة الموردين',
+        'icon': 'fas fa-handshake',
+        'color': 'success',
+        'permissions': ['suppliers_view_orders', 'suppliers_add_order'],
+        'links': [
+            {'title': 'عرض الأوامر', 'url': 'suppliers.orders', 'permission': 'suppliers_view_orders', 'icon': 'fas fa-list'},
+            {'title': 'إنشاء أمر شراء', 'url': 'suppliers.add_order', 'permission': 'suppliers_add_order', 'icon': 'fas fa-plus'},
+        ]
+    },
+    {
+        'key': 'employee_requests',
+        'name': 'طلباتي الشخصية',
+        'icon': 'fas fa-clipboard-list',
+        'color': 'primary',
+        'permissions': ['requests_create', 'requests_view_own'],
+        'links': [
+            {'title': 'عرض طلباتي', 'url': 'employee_requests.list_requests', 'permission': 'requests_view_own', 'icon': 'fas fa-list'},
+            {'title': 'إنشاء طلب جديد', 'url': 'employee_requests.create_request', 'permission': 'requests_create', 'icon': 'fas fa-plus'},
+        ]
+    },
+    {
+        'key': 'reports',
+        'name': 'التقارير',
+        'icon': 'fas fa-chart-bar',
+        'color': 'secondary',
+        'permissions': ['reports_inventory_movement', 'reports_low_stock'],
+        'links': [
+            {'title': 'تقرير حركة المخزون', 'url': 'reports.inventory_movement', 'permission': 'reports_inventory_movement', 'icon': 'fas fa-chart-line'},
+            {'title': 'تقرير الأصناف منخفضة', 'url': 'reports.low_stock', 'permission': 'reports_low_stock', 'icon': 'fas fa-exclamation'},
+        ]
+    },
+]
+
+
+def _compile_sidebar(sections):
+    """ترجمة صلاحيات الشريط الجانبي إلى أقنعة بت"""
+    for section in sections:
+        section_mask = 0
+        for link in section['links']:
+            link['mask'] = PERMISSION_CATALOGUE.mask(*link['permissions'])
+            section_mask |= link['mask']
+        section['mask'] = section_mask
+    return sections
+
+
+def _compile_modules(modules):
+    """ترجمة صلاحيات وحدات لوحة الموظفين إلى أقنعة بت"""
+    for module in modules:
+        module['mask'] = PERMISSION_CATALOGUE.mask(*module['permissions'])
+        for link in module['links']:
+            link['mask'] = PERMISSION_CATALOGUE.bit(link['permission'])
+    return modules
+
+
+_compile_sidebar(SIDEBAR_SECTIONS)
+_compile_modules(EMPLOYEE_DASHBOARD_MODULES)
+
+
+def get_sidebar_sections(permission_mask):
+    """الأقسام والروابط الظاهرة في الشريط الجانبي لقناع صلاحيات معين"""
+    visible_sections = []
+    for section in SIDEBAR_SECTIONS:
+        if not section['mask'] & permission_mask:
+            continue
+        visible_sections.append({
+            'key': section['key'],
+            'title': section['title'],
+            'icon': section['icon'],
+            'menu_id': section['menu_id'],
+            'links': [link for link in section['links'] if link['mask'] & permission_mask],
+        })
+    return visible_sections
+
+
+def get_employee_modules(permission_mask):
+    """وحدات لوحة الموظفين المسموح بها لقناع صلاحيات معين"""
+    allowed_modules = []
+    for module in EMPLOYEE_DASHBOARD_MODULES:
+        # التحقق من وجود صلاحية واحدة على الأقل في هذه الوحدة
+        if not module['mask'] & permission_mask:
+            continue
+
+        filtered_links = [link for link in module['links'] if link['mask'] & permission_mask]
+        if filtered_links:
+            allowed_modules.append({
+                'key': module['key'],
+                'name': module['name'],
+                'icon': module['icon'],
+                'color': module['color'],
+                'links': filtered_links,
+                'link_count': len(filtered_links)
+            })
+    return allowed_modules
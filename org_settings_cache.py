@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+نسخة إعدادات المؤسسة في الذاكرة
+Organization Settings Snapshot - one immutable in-memory copy per worker
+
+إعدادات المؤسسة نادراً ما تتغير لكنها تُقرأ في كل قالب وفي أغلب التقارير،
+لذلك يتم تحميلها مرة واحدة في نسخة غير قابلة للتعديل وتُقرأ من الذاكرة.
+
+يتم التحديث فقط عند حفظ صفحة admin.organization_settings عبر
+refresh_org_settings(). لإعلام باقي العمليات (workers) يتم تحديث ملف إشارة
+في مجلد instance؛ كل عملية تقرأ قيمة هذا الملف (بدون قاعدة بيانات) مرة كل
+ORG_SETTINGS_CHECK_INTERVAL ثانية وتعيد التحميل عند تغيره (signal_cache).
+"""
+
+import os
+from types import MappingProxyType
+from flask import current_app
+from models import OrganizationSettings
+from signal_cache import SignalledSnapshotCache
+
+
+class OrganizationSettingsSnapshot:
+    """نسخة للقراءة فقط من صف إعدادات المؤسسة"""
+
+    __slots__ = ('_values',)
+
+    def __init__(self, values):
+        object.__setattr__(self, '_values', MappingProxyType(dict(values)))
+
+    @classmethod
+    def from_model(cls, org_settings):
+        """إنشاء نسخة من صف OrganizationSettings"""
+        return cls({
+            column.key: getattr(org_settings, column.key)
+            for column in OrganizationSettings.__table__.columns
+        })
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('إعدادات المؤسسة للقراءة فقط - استخدم admin.organization_settings')
+
+    def __repr__(self):
+        return f'<OrganizationSettingsSnapshot {self.institution_name}>'
+
+    def get_header_text(self):
+        """الحصول على نص رأس الوثيقة"""
+        return f"{self.ministry_name}\n{self.directorate_name}\n{self.institution_name}"
+
+
+class OrgSettingsCache(SignalledSnapshotCache):
+    """ذاكرة نسخة الإعدادات لتطبيق واحد"""
+
+    signal_label = 'إعدادات المؤسسة'
+
+    def _build(self):
+        """تحميل الإعدادات من قاعدة البيانات (استعلام واحد) - None إذا لم تُنشأ بعد"""
+        org_settings = OrganizationSettings.query.first()
+        return OrganizationSettingsSnapshot.from_model(org_settings) if org_settings else None
+
+    def stats(self):
+        """عدادات الأداء"""
+        with self._lock:
+            return {
+                'reads': self.reads,
+                'loads': self.loads,
+                'loaded': self._loaded,
+            }
+
+
+def _get_cache(app=None):
+    app = app or current_app
+    return app.extensions['org_settings_cache']
+
+
+def get_org_settings():
+    """نسخة إعدادات المؤسسة الحالية (للقراءة فقط) أو None"""
+    return _get_cache().get()
+
+
+def refresh_org_settings():
+    """يجب استدعاؤها بعد commit لأي تعديل على إعدادات المؤسسة"""
+    _get_cache().refresh()
+
+
+def get_org_settings_cache_stats():
+    """عدادات ذاكرة إعدادات المؤسسة"""
+    return _get_cache().stats()
+
+
+def init_org_settings_cache(app):
+    """تهيئة ذاكرة إعدادات المؤسسة"""
+    signal_path = app.config.get('ORG_SETTINGS_SIGNAL_FILE') or os.path.join(
+        app.instance_path, 'org_settings.signal'
+    )
+    app.extensions['org_settings_cache'] = OrgSettingsCache(
+        signal_path,
+        check_interval=app.config.get('ORG_SETTINGS_CHECK_INTERVAL', 2.0),
+    )
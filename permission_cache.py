@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+ذاكرة الصلاحيات المؤقتة
+Permission Cache - compiled permission sets per request and per process
+
+يتم تحميل جميع صلاحيات المستخدم المسموحة مرة واحدة لكل طلب (استعلام واحد)
+ثم تتم جميع عمليات التحقق من الذاكرة.
+
+بالإضافة إلى ذلك، تحتفظ كل عملية (worker) بذاكرة LRU مشتركة بين الطلبات
+مفتاحها (user_id, permission_version). أي تعديل على صلاحيات المستخدم يرفع
+العمود users.permission_version، فتصبح النسخة القديمة غير صالحة في جميع
+العمليات. load_user يأخذ permission_version من لقطة identity_cache: العملية
+التي عدّلت الصلاحيات تبطل لقطتها فوراً، أما العمليات الأخرى فقد تستمر في
+الصلاحيات القديمة (بما فيها الصلاحيات المسحوبة) حتى IDENTITY_CACHE_TTL ثانية.
+
+كل مجموعة صلاحيات تحمل أيضاً قناع بت (bitmask) مترجم من PERMISSION_CATALOGUE
+حتى يكون التحقق من "أي صلاحية من هذه الصلاحيات" عملية AND واحدة.
+"""
+
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from flask import g, has_request_context
+from models import db, User, UserPermission
+from permissions_config import PERMISSION_CATALOGUE
+from identity_cache import invalidate_user_identity
+
+
+class CompiledPermissionSet(frozenset):
+    """مجموعة صلاحيات غير قابلة للتعديل مع قناع البت المقابل"""
+
+    def __new__(cls, perm_keys=()):
+        self = super().__new__(cls, perm_keys)
+        self.mask = PERMISSION_CATALOGUE.mask_of(self)
+        return self
+
+    def has_any(self, *perm_keys):
+        """التحقق من وجود صلاحية واحدة على الأقل (عملية AND واحدة)"""
+        mask, unknown_keys = _compile_keys(perm_keys)
+        if self.mask & mask:
+            return True
+        return any(perm_key in self for perm_key in unknown_keys)
+
+    def has_all(self, *perm_keys):
+        """التحقق من وجود جميع الصلاحيات"""
+        mask, unknown_keys = _compile_keys(perm_keys)
+        if self.mask & mask != mask:
+            return False
+        return all(perm_key in self for perm_key in unknown_keys)
+
+    def has_mask(self, mask):
+        """التحقق من تقاطع قناع مترجم مسبقاً مع صلاحيات المستخدم"""
+        return bool(self.mask & mask)
+
+
+@lru_cache(maxsize=512)
+def _compile_keys(perm_keys):
+    """ترجمة قائمة مفاتيح إلى قناع + المفاتيح غير الموجودة في الفهرس"""
+    mask = PERMISSION_CATALOGUE.mask_of(perm_keys)
+    unknown_keys = tuple(k for k in perm_keys if k not in PERMISSION_CATALOGUE)
+    return mask, unknown_keys
+
+
+EMPTY_PERMISSION_SET = CompiledPermissionSet()
+
+
+class PermissionLRUCache:
+    """ذاكرة LRU لمجموعات الصلاحيات - نسخة واحدة لكل مستخدم"""
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self._entries = OrderedDict()  # user_id -> (permission_version, frozenset)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id, version):
+        """البحث عن مجموعة الصلاحيات لنسخة معينة"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+
+            # نسخة قديمة - يتم حذفها مباشرة
+            if entry is not None:
+                del self._entries[user_id]
+                self.evictions += 1
+            self.misses += 1
+            return None
+
+    def put(self, user_id, version, permissions):
+        """تخزين مجموعة الصلاحيات"""
+        with self._lock:
+            self._entries[user_id] = (version, permissions)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def evict(self, user_id=None):
+        """حذف مستخدم معين أو تفريغ الذاكرة بالكامل"""
+        with self._lock:
+            if user_id is None:
+                self.evictions += len(self._entries)
+                self._entries.clear()
+            elif self._entries.pop(user_id, None) is not None:
+                self.evictions += 1
+
+    def stats(self):
+        """عدادات الأداء"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'capacity': self.capacity,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_permission_cache = PermissionLRUCache()
+
+
+def _load_permission_set(user_id):
+    """تحميل الصلاحيات المسموحة من قاعدة البيانات (استعلام واحد)"""
+    rows = db.session.query(UserPermission.permission_key).filter_by(
+        user_id=user_id,
+        is_allowed=True
+    ).all()
+
+    # عداد الاستعلامات لكل طلب
+    if has_request_context():
+        g.permission_query_count = getattr(g, 'permission_query_count', 0) + 1
+
+    return CompiledPermissionSet(row[0] for row in rows)
+
+
+def get_user_permission_set(user_id, version=None):
+    """الحصول على مجموعة الصلاحيات المسموحة (غير قابلة للتعديل) للمستخدم
+
+    Args:
+        user_id: معرّف المستخدم
+        version: قيمة users.permission_version (None = بدون ذاكرة مشتركة)
+    """
+    if user_id is None:
+        return EMPTY_PERMISSION_SET
+
+    # خارج سياق الطلب (السكريبتات) لا يوجد تخزين مؤقت
+    if not has_request_context():
+        return _load_permission_set(user_id)
+
+    permission_sets = g.setdefault('permission_sets', {})
+    if user_id in permission_sets:
+        return permission_sets[user_id]
+
+    permissions = None
+    if version is not None:
+        permissions = _permission_cache.get(user_id, version)
+
+    if permissions is None:
+        permissions = _load_permission_set(user_id)
+        if version is not None:
+            _permission_cache.put(user_id, version, permissions)
+
+    permission_sets[user_id] = permissions
+    return permissions
+
+
+def invalidate_user_permissions(user_id=None):
+    """إلغاء الصلاحيات المحملة في الطلب الحالي وفي ذاكرة العملية"""
+    _permission_cache.evict(user_id)
+
+    if not has_request_context():
+        return
+
+    permission_sets = g.get('permission_sets')
+    if not permission_sets:
+        return
+
+    if user_id is None:
+        permission_sets.clear()
+    else:
+        permission_sets.pop(user_id, None)
+
+
+def bump_permission_version(user_id):
+    """رفع نسخة صلاحيات المستخدم (يجب استدعاؤها قبل commit لأي تعديل)
+
+    يتم التحديث بعبارة UPDATE واحدة حتى لا تضيع الزيادات المتزامنة.
+    """
+    User.query.filter_by(id=user_id).update(
+        {User.permission_version: db.func.coalesce(User.permission_version, 0) + 1},
+        synchronize_session='fetch'
+    )
+    invalidate_user_permissions(user_id)
+    invalidate_user_identity(user_id)
+
+
+def get_permission_query_count():
+    """عدد استعلامات الصلاحيات المنفذة في الطلب الحالي"""
+    if not has_request_context():
+        return 0
+    return g.get('permission_query_count', 0)
+
+
+def get_permission_cache_stats():
+    """عدادات ذاكرة الصلاحيات (إصابات، إخفاقات، حذف)"""
+    return _permission_cache.stats()
+
+
+def init_permission_cache(app):
+    """تهيئة ذاكرة الصلاحيات من إعدادات التطبيق"""
+    _permission_cache.capacity = app.config.get('PERMISSION_CACHE_SIZE', 1024)
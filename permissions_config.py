@@ -541,4 +541,54 @@ def get_permissions_by_category():
 
 def get_category_permissions(category):
     """الحصول على صلاحيات فئة معينة"""
-    return PERMISSIONS.get(category, {}).get('permissions', {})
\ No newline at end of file
+    return PERMISSIONS.get(category, {}).get('permissions', {})
+
+class PermissionCatalogue:
+    """فهرس الصلاحيات المترجم - رقم بت ثابت لكل مفتاح صلاحية
+
+    يتم ترقيم المفاتيح حسب ترتيب ظهورها الأول في PERMISSIONS، لذلك يجب إضافة
+    الصلاحيات الجديدة في نهاية فئاتها للحفاظ على ثبات الأرقام.
+    """
+
+    def __init__(self, permissions):
+        self.bits = {}
+        for data in permissions.values():
+            for perm_key in data['permissions']:
+                if perm_key not in self.bits:
+                    self.bits[perm_key] = len(self.bits)
+        self.keys = tuple(self.bits)
+        self.full_mask = (1 << len(self.keys)) - 1
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, perm_key):
+        return perm_key in self.bits
+
+    def bit(self, perm_key):
+        """قيمة البت لمفتاح صلاحية (KeyError إذا كان المفتاح غير معروف)"""
+        return 1 << self.bits[perm_key]
+
+    def mask(self, *perm_keys):
+        """قناع يجمع عدة صلاحيات (KeyError إذا كان أحد المفاتيح غير معروف)"""
+        result = 0
+        for perm_key in perm_keys:
+            result |= 1 << self.bits[perm_key]
+        return result
+
+    def mask_of(self, perm_keys):
+        """قناع مجموعة صلاحيات المستخدم (المفاتيح غير المعروفة يتم تجاهلها)"""
+        bits = self.bits
+        result = 0
+        for perm_key in perm_keys:
+            index = bits.get(perm_key)
+            if index is not None:
+                result |= 1 << index
+        return result
+
+    def keys_of(self, mask):
+        """المفاتيح المقابلة لقناع معين"""
+        return [perm_key for index, perm_key in enumerate(self.keys) if mask >> index & 1]
+
+
+PERMISSION_CATALOGUE = PermissionCatalogue(PERMISSIONS)
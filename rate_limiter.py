@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""
+محدد معدل الطلبات بنافذة منزلقة
+Rate Limiter - bounded sliding-window counters with pluggable backends
+
+كل مفتاح (IP، أو قاعدة + IP) يحتفظ بعدادين فقط: النافذة الحالية والسابقة.
+التقدير = العدد الحالي + العدد السابق × (الجزء المتبقي من النافذة السابقة)،
+لذلك تكلفة كل فحص O(1) والذاكرة ثابتة لكل مفتاح.
+
+الخلفيات (RATE_LIMIT_BACKEND):
+- memory: ذاكرة العملية الحالية (افتراضي) مع حذف المفاتيح الخاملة وسقف للعدد
+- sqlite: ملف SQLite مشترك (RATE_LIMIT_SQLITE_PATH) حتى تطبق جميع عمليات
+  الخادم المحلي حداً واحداً مشتركاً
+
+قواعد RateLimitRule تُقرأ من نسخة إعدادات الأمان (security_config) وتتم
+مطابقتها حسب بادئة المسار والطريقة بدون استعلام لكل طلب. الانتهاكات الفعلية
+فقط تُكتب في rate_limit_violations، على دفعات (حسب الحجم أو العمر) بعد انتهاء الطلب.
+"""
+
+import os
+import time
+import atexit
+import sqlite3
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from flask import current_app
+
+
+class MemoryBackend:
+    """عدادات النافذة المنزلقة في ذاكرة العملية"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._counters = OrderedDict()  # key -> [window_index, previous, current, window_seconds]
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def hit(self, key, window_seconds, now):
+        """تسجيل طلب وإرجاع العدد المقدر في آخر نافذة"""
+        window_index = int(now // window_seconds)
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = [window_index, 0, 0, window_seconds]
+                self._counters[key] = counter
+            else:
+                self._counters.move_to_end(key)
+                _roll_window(counter, window_index)
+
+            counter[2] += 1
+            estimate = _estimate(counter, now, window_seconds)
+            self._evict(now)
+            return estimate
+
+    def _evict(self, now):
+        """حذف المفاتيح الخاملة (الأقدم أولاً) ثم احترام سقف الذاكرة"""
+        while self._counters:
+            key, counter = next(iter(self._counters.items()))
+            # المفتاح خامل إذا انتهت نافذتان كاملتان دون طلبات
+            if int(now // counter[3]) - counter[0] < 2 and len(self._counters) <= self.max_keys:
+                break
+            del self._counters[key]
+            self.evictions += 1
+
+    def stats(self):
+        """عدادات الذاكرة"""
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'keys': len(self._counters),
+                'max_keys': self.max_keys,
+                'evictions': self.evictions,
+            }
+
+
+class SQLiteBackend:
+    """عدادات النافذة المنزلقة في ملف SQLite مشترك بين العمليات المحلية"""
+
+    PRUNE_INTERVAL = 60
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._next_prune = 0.0
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS rate_limit_counters ('
+            ' key TEXT PRIMARY KEY, window_index INTEGER NOT NULL,'
+            ' previous INTEGER NOT NULL, current INTEGER NOT NULL,'
+            ' window_seconds INTEGER NOT NULL)'
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key, window_seconds, now):
+        """تسجيل طلب وإرجاع العدد المقدر (معاملة واحدة مقفلة للكتابة)"""
+        window_index = int(now // window_seconds)
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT window_index, previous, current FROM rate_limit_counters WHERE key = ?',
+                (key,)
+            ).fetchone()
+            counter = [window_index, 0, 0, window_seconds] if row is None else [*row, window_seconds]
+            _roll_window(counter, window_index)
+            counter[2] += 1
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_limit_counters '
+                '(key, window_index, previous, current, window_seconds) VALUES (?, ?, ?, ?, ?)',
+                (key, counter[0], counter[1], counter[2], window_seconds)
+            )
+            if now >= self._next_prune:
+                self._next_prune = now + self.PRUNE_INTERVAL
+                # حذف المفاتيح الخاملة (نافذتان كاملتان بدون طلبات)
+                conn.execute(
+                    'DELETE FROM rate_limit_counters '
+                    'WHERE window_index < CAST(? / window_seconds AS INTEGER) - 1',
+                    (now,)
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return _estimate(counter, now, window_seconds)
+
+    def stats(self):
+        """عدادات الملف المشترك"""
+        keys = self._connection().execute('SELECT COUNT(*) FROM rate_limit_counters').fetchone()[0]
+        return {
+            'backend': 'sqlite',
+            'path': self.path,
+            'keys': keys,
+        }
+
+
+def _roll_window(counter, window_index):
+    """نقل العداد إلى النافذة الحالية"""
+    if counter[0] == window_index:
+        return
+    counter[1] = counter[2] if counter[0] == window_index - 1 else 0
+    counter[2] = 0
+    counter[0] = window_index
+
+
+def _estimate(counter, now, window_seconds):
+    """العدد المقدر في آخر window_seconds ثانية"""
+    elapsed = (now % window_seconds) / window_seconds
+    return counter[2] + counter[1] * (1 - elapsed)
+
+
+CompiledRule = namedtuple('CompiledRule', [
+    'id', 'endpoint', 'method', 'requests_per_minute', 'requests_per_hour', 'bypass_roles'
+])
+
+
+class RateLimitRuleSet:
+    """قواعد RateLimitRule المفعلة مترجمة للمطابقة السريعة (غير قابلة للتعديل)"""
+
+    def __init__(self, rules=()):
+        rules = tuple(rules)
+        self._exact = {(rule.endpoint, rule.method): rule for rule in rules}
+        self._by_endpoint = {}
+        for rule in rules:
+            self._by_endpoint.setdefault(rule.endpoint, rule)
+        # أطول بادئة أولاً
+        self._prefixes = tuple(sorted(rules, key=lambda rule: len(rule.endpoint), reverse=True))
+
+    def __len__(self):
+        return len(self._prefixes)
+
+    def get(self, endpoint, method=None):
+        """القاعدة المطابقة تماماً لـ endpoint (لـ RateLimiter.check_rate_limit)"""
+        if method:
+            rule = self._exact.get((endpoint, method.upper()))
+            if rule is not None:
+                return rule
+        return self._by_endpoint.get(endpoint)
+
+    def match(self, path, method):
+        """القاعدة ذات أطول بادئة مطابقة للمسار والطريقة"""
+        method = method.upper()
+        for rule in self._prefixes:
+            if rule.method in (method, '*') and path.startswith(rule.endpoint):
+                return rule
+        return None
+
+
+class SlidingWindowLimiter:
+    """واجهة التحقق من الحدود فوق الخلفية المختارة"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.allowed = 0
+        self.blocked = 0
+
+    def hit(self, key, limit, window_seconds=60):
+        """تسجيل طلب - إرجاع (مسموح، العدد المقدر)"""
+        count = self.backend.hit(key, window_seconds, time.time())
+        if count > limit:
+            self.blocked += 1
+            return False, int(count)
+        self.allowed += 1
+        return True, int(count)
+
+    def stats(self):
+        stats = self.backend.stats()
+        stats.update({'allowed': self.allowed, 'blocked': self.blocked})
+        return stats
+
+
+class ViolationBuffer:
+    """تجميع انتهاكات معدل الطلبات وكتابتها دفعة واحدة"""
+
+    def __init__(self, batch_size=50, flush_seconds=5):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._rows = []
+        self._first_at = None
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.written = 0
+        self.failed = 0
+        self.app = None
+        self.exit_hook_registered = False
+
+    def record(self, ip_address, endpoint, request_count, user_id=None, action_taken='blocked'):
+        """إضافة انتهاك إلى الدفعة الحالية"""
+        with self._lock:
+            if not self._rows:
+                self._first_at = time.monotonic()
+            self._rows.append({
+                'user_id': user_id,
+                'ip_address': ip_address,
+                'endpoint': endpoint or '',
+                'request_count': request_count,
+                'timestamp': datetime.utcnow(),
+                'action_taken': action_taken,
+            })
+            self.recorded += 1
+
+    def is_due(self):
+        """هل حان وقت الكتابة (الحجم أو العمر)"""
+        rows = self._rows
+        return bool(rows) and (
+            len(rows) >= self.batch_size
+            or time.monotonic() - self._first_at >= self.flush_seconds
+        )
+
+    def flush(self):
+        """كتابة الدفعة بعبارة INSERT واحدة في اتصال مستقل عن جلسة الطلب"""
+        from models import db
+        from security_services import RateLimitViolation
+
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(RateLimitViolation.__table__.insert(), rows)
+            self.written += len(rows)
+        except Exception as e:
+            self.failed += len(rows)
+            current_app.logger.error(f'Error writing rate limit violations: {str(e)}')
+        return len(rows)
+
+    def flush_on_exit(self):
+        """كتابة الانتهاكات المتبقية عند إيقاف العملية"""
+        if self.app is None or not self._rows:
+            return
+        with self.app.app_context():
+            self.flush()
+
+    def stats(self):
+        """عدادات الدفعات"""
+        with self._lock:
+            return {
+                'pending': len(self._rows),
+                'recorded': self.recorded,
+                'written': self.written,
+                'failed': self.failed,
+            }
+
+
+_limiter = SlidingWindowLimiter(MemoryBackend())
+_violations = ViolationBuffer()
+
+
+def get_rate_limiter():
+    """المحدد المشترك للعملية الحالية"""
+    return _limiter
+
+
+def get_rate_limit_rules():
+    """قواعد RateLimitRule من نسخة إعدادات الأمان الحالية"""
+    from security_config import get_security_config
+    return get_security_config().rate_limits
+
+
+def record_rate_limit_violation(ip_address, endpoint, request_count, user_id=None):
+    """تسجيل انتهاك (يكتب لاحقاً ضمن دفعة)"""
+    _violations.record(ip_address, endpoint, request_count, user_id=user_id)
+
+
+def get_rate_limiter_stats():
+    """عدادات المحدد والانتهاكات (عدد القواعد في security_config)"""
+    stats = _limiter.stats()
+    stats['violations'] = _violations.stats()
+    return stats
+
+
+def init_rate_limiter(app):
+    """تهيئة المحدد من إعدادات التطبيق"""
+    global _limiter
+
+    backend_name = app.config.get('RATE_LIMIT_BACKEND', 'memory')
+    if backend_name == 'sqlite':
+        path = app.config.get('RATE_LIMIT_SQLITE_PATH') or os.path.join(
+            app.instance_path, 'rate_limits.sqlite'
+        )
+        backend = SQLiteBackend(path)
+    else:
+        backend = MemoryBackend(max_keys=app.config.get('RATE_LIMIT_MAX_KEYS', 100000))
+
+    _limiter = SlidingWindowLimiter(backend)
+    _violations.batch_size = app.config.get('RATE_LIMIT_VIOLATION_BATCH_SIZE', 50)
+    _violations.flush_seconds = app.config.get('RATE_LIMIT_VIOLATION_FLUSH_SECONDS', 5)
+
+    @app.teardown_request
+    def flush_rate_limit_violations(exc=None):
+        if _violations.is_due():
+            _violations.flush()
+
+    # كتابة ما تبقى عند إيقاف العملية
+    _violations.app = app
+    if not _violations.exit_hook_registered:
+        atexit.register(_violations.flush_on_exit)
+        _violations.exit_hook_registered = True
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+أرقام المستندات المرجعية
+Reference Numbers - collision-free document numbers from pre-reserved sequence blocks
+
+الأرقام المبنية من الوقت (MEAL-20250101120000) تتكرر داخل الثانية نفسها:
+add_meal كانت تعطي الرقم نفسه لجميع حركات مكونات الوصفة. بدلاً من ذلك لكل
+(مركز، نوع المستند، شهر) تسلسل في جدول document_sequences، ويحجز كل عامل
+كتلة من REFERENCE_BLOCK_SIZE رقماً دفعة واحدة (UPDATE next_value = next_value
++ block) ثم يوزعها من الذاكرة بدون أي استعلام إضافي لكل مستند:
+    MEAL-C01-202501-000123
+
+- الحجز يتم في اتصال ومعاملة مستقلين ويُثبت فوراً، فلا يمكن لعاملين الحصول
+  على الكتلة نفسها حتى لو أُلغيت معاملة الطلب
+- الأرقام غير المستخدمة من كتلة (إعادة تشغيل العامل، إلغاء الطلب) تبقى فجوات
+  مقبولة - الأرقام فريدة ومتزايدة لكل عامل لكنها ليست متتالية بالضرورة
+- يُفضل طلب الأرقام قبل أول flush في الطلب (SQLite يقفل قاعدة البيانات
+  للكتابة حتى نهاية المعاملة)
+"""
+
+import re
+import threading
+from datetime import datetime
+from flask import current_app, has_request_context, session
+from sqlalchemy import and_, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from models import db, DocumentSequence, VocationalCenter
+
+
+class SequenceAllocator:
+    """توزيع أرقام التسلسل من كتل محجوزة في الذاكرة"""
+
+    def __init__(self, block_size=50):
+        self.block_size = block_size
+        self._blocks = {}  # (center_key, doc_type, period) -> [next, end)
+        self._center_codes = {}
+        self._lock = threading.Lock()
+        self.blocks_reserved = 0
+        self.numbers_issued = 0
+
+    def allocate(self, engine, key, count=1):
+        """قائمة بـ count رقماً للمفتاح (تُحجز كتلة جديدة عند نفاد الحالية)"""
+        numbers = []
+        with self._lock:
+            while len(numbers) < count:
+                block = self._blocks.get(key)
+                if block is None or block[0] >= block[1]:
+                    size = max(self.block_size, count - len(numbers))
+                    block = list(self._reserve_block(engine, key, size))
+                    self._blocks[key] = block
+                    self.blocks_reserved += 1
+                take = min(count - len(numbers), block[1] - block[0])
+                numbers.extend(range(block[0], block[0] + take))
+                block[0] += take
+            self.numbers_issued += count
+        return numbers
+
+    def _reserve_block(self, engine, key, size):
+        """حجز [start, end) في معاملة مستقلة"""
+        table = DocumentSequence.__table__
+        center_key, doc_type, period = key
+        condition = and_(table.c.center_key == center_key, table.c.doc_type == doc_type, table.c.period == period)
+        with engine.begin() as conn:
+            for _ in range(3):
+                updated = conn.execute(
+                    update(table).where(condition)
+                    .values(next_value=table.c.next_value + size, updated_at=datetime.utcnow())
+                ).rowcount
+                if updated:
+                    end = conn.execute(select(table.c.next_value).where(condition)).scalar_one()
+                    return end - size, end
+                try:
+                    with conn.begin_nested():
+                        conn.execute(insert(table).values(
+                            center_key=center_key, doc_type=doc_type, period=period,
+                            next_value=1 + size, updated_at=datetime.utcnow(),
+                        ))
+                    return 1, 1 + size
+                except IntegrityError:
+                    # عامل آخر أنشأ التسلسل للتو - التحديث سينجح الآن
+                    continue
+        raise RuntimeError(f'تعذر حجز أرقام {doc_type} للفترة {period}')
+
+    def center_code(self, center_id):
+        """رمز المركز في الرقم المرجعي (يُقرأ مرة واحدة لكل مركز)"""
+        if not center_id:
+            return ''
+        code = self._center_codes.get(center_id)
+        if code is None:
+            center = db.session.get(VocationalCenter, center_id)
+            raw = center.code if center is not None and center.code else str(center_id)[:8]
+            code = re.sub(r'[^0-9A-Za-z]', '', raw).upper()
+            self._center_codes[center_id] = code
+        return code
+
+    def discard(self):
+        """التخلي عن الكتل المحجوزة في الذاكرة (تبقى فجوات)"""
+        with self._lock:
+            self._blocks.clear()
+            self._center_codes.clear()
+
+    def stats(self):
+        """عدادات الأداء"""
+        with self._lock:
+            return {
+                'block_size': self.block_size,
+                'blocks_reserved': self.blocks_reserved,
+                'numbers_issued': self.numbers_issued,
+                'open_sequences': len(self._blocks),
+            }
+
+
+_allocator = SequenceAllocator()
+
+
+def _request_center_id():
+    if has_request_context():
+        return session.get('current_center_id')
+    return None
+
+
+def next_references(doc_type, count, center_id=None, when=None):
+    """count رقماً مرجعياً فريداً لنوع المستند (مثلاً لجميع حركات وجبة واحدة)"""
+    center_id = center_id or _request_center_id()
+    period = (when or datetime.utcnow()).strftime('%Y%m')
+    _allocator.block_size = current_app.config.get('REFERENCE_BLOCK_SIZE', 50)
+    numbers = _allocator.allocate(db.engine, (center_id or '', doc_type, period), count)
+    code = _allocator.center_code(center_id)
+    prefix = f'{doc_type}-{code}' if code else doc_type
+    return [f'{prefix}-{period}-{number:06d}' for number in numbers]
+
+
+def next_reference(doc_type, center_id=None, when=None):
+    """رقم مرجعي فريد واحد"""
+    return next_references(doc_type, 1, center_id, when)[0]
+
+
+def get_reference_allocator_stats():
+    return _allocator.stats()
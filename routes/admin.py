@@ -1,6 +1,6 @@
 from flask import (
     Blueprint, render_template, request, redirect, url_for, 
-    flash, current_app
+    flash, current_app, jsonify
 )
 from flask_login import login_required, current_user
 from models import (
@@ -8,6 +8,16 @@ from models import (
     UserPermission, ActivityLog
 )
 from permissions_config import get_permissions_by_category, get_all_permissions_flat
+from permission_cache import bump_permission_version, get_permission_cache_stats
+from fragment_cache import get_fragment_cache_stats
+from org_settings_cache import refresh_org_settings, get_org_settings_cache_stats
+from identity_cache import get_identity_cache_stats
+from rate_limiter import get_rate_limiter_stats
+from audit_writer import get_audit_writer_stats
+from session_cache import get_session_cache_stats
+from security_config import get_security_config_stats
+from center_stats import get_center_stats_cache_stats
+from reference_numbers import get_reference_allocator_stats
 from datetime import datetime
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
@@ -27,6 +37,7 @@ def organization_settings():
         org_settings = OrganizationSettings()
         db.session.add(org_settings)
         db.session.commit()
+        refresh_org_settings()
     
     if request.method == 'POST':
         old_ministry = org_settings.ministry_name
@@ -80,6 +91,9 @@ def organization_settings():
         db.session.add(activity_log)
         db.session.commit()
         
+        # تحديث النسخة المخزنة في هذه العملية وإعلام باقي العمليات
+        refresh_org_settings()
+        
         flash('تم تحديث إعدادات المؤسسة بنجاح', 'success')
         return redirect(url_for('admin.organization_settings'))
     
@@ -270,6 +284,28 @@ def activity_logs():
     return render_template('admin/activity_logs.html', logs=logs)
 
 
+@admin_bp.route('/cache-stats')
+@login_required
+def cache_stats():
+    """عدادات الذاكرة المؤقتة (لضبط الأداء)"""
+    if not current_user.has_granular_permission('admin_manage_permissions'):
+        return jsonify({'success': False}), 403
+    
+    return jsonify({
+        'success': True,
+        'permissions': get_permission_cache_stats(),
+        'sidebar': get_fragment_cache_stats(),
+        'org_settings': get_org_settings_cache_stats(),
+        'identity': get_identity_cache_stats(),
+        'rate_limiter': get_rate_limiter_stats(),
+        'audit_writer': get_audit_writer_stats(),
+        'sessions': get_session_cache_stats(),
+        'security_config': get_security_config_stats(),
+        'center_stats': get_center_stats_cache_stats(),
+        'reference_numbers': get_reference_allocator_stats(),
+    })
+
+
 # ==================== Helper Functions ====================
 
 def _update_user_permissions(user_id, form_data):
@@ -293,4 +329,7 @@ def _update_user_permissions(user_id, form_data):
         )
         db.session.add(permission)
     
+    # رفع نسخة الصلاحيات لإبطال الذاكرة المؤقتة في جميع العمليات
+    bump_permission_version(user_id)
+    
     db.session.commit()
\ No newline at end of file
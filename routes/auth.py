@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_user, logout_user, current_user
 from models import db, User, UserRole, VocationalCenter
 from datetime import datetime
+from permission_cache import bump_permission_version
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -60,6 +61,7 @@ def login():
         # إذا كان المستخدم مسؤول نظام ولم يكن له مؤسسة محددة
         if user.role == UserRole.ADMIN and not user.center_id:
             user.center_id = center_id
+            bump_permission_version(user.id)
         
         # تحديث آخر دخول
         user.last_login = datetime.utcnow()
@@ -2,11 +2,14 @@ from flask import Blueprint, render_template, redirect, url_for
 from flask_login import login_required, current_user
 from models import (
     db, Item, User, PurchaseOrder, Transaction, 
-    OrganizationSettings, AssetRegistration, MealRecord, ItemCategory_Model
+    AssetRegistration, MealRecord, ItemCategory_Model, SmartInventoryAlert
 )
+from org_settings_cache import get_org_settings
+from stock_costing import get_stock_value
 from datetime import datetime, timedelta
 from sqlalchemy import func, and_
 from permissions_config import PERMISSIONS
+from navigation_config import get_employee_modules
 
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
 
@@ -35,20 +38,23 @@ def admin_dashboard():
     total_users = User.query.count()
     total_suppliers = PurchaseOrder.query.distinct(PurchaseOrder.supplier_id).count()
     
-    # الأصناف منخفضة المخزون
-    low_stock_items = Item.query.filter(
-        Item.quantity_in_stock <= Item.minimum_quantity
-    ).all()
+    # الأصناف منخفضة المخزون (إنذارات low_stock المفتوحة بدلاً من فحص جميع الأصناف)
+    low_stock_query = Item.query.join(
+        SmartInventoryAlert, SmartInventoryAlert.item_id == Item.id
+    ).filter(
+        SmartInventoryAlert.alert_type == 'low_stock',
+        SmartInventoryAlert.is_resolved == False
+    )
+    low_stock_count = low_stock_query.count()
+    low_stock_items = low_stock_query.order_by(SmartInventoryAlert.triggered_at.desc()).limit(10).all()
     
     # آخر العمليات
     recent_transactions = Transaction.query.order_by(
         Transaction.transaction_date.desc()
     ).limit(10).all()
     
-    # إحصائيات المخزون
-    total_stock_value = db.session.query(
-        func.sum(Item.quantity_in_stock * Item.unit_price)
-    ).scalar() or 0
+    # إحصائيات المخزون (إجمالي محدث مع كل حركة بدلاً من جمع جميع الأصناف)
+    total_stock_value = get_stock_value()
     
     # آخر أوامر الشراء
     pending_orders = PurchaseOrder.query.filter_by(
@@ -60,13 +66,13 @@ def admin_dashboard():
     today_meals = MealRecord.query.filter_by(record_date=today).all()
     
     # معلومات المؤسسة
-    org_settings = OrganizationSettings.query.first()
+    org_settings = get_org_settings()
     
     stats = {
         'total_items': total_items,
         'total_users': total_users,
         'total_suppliers': total_suppliers,
-        'low_stock_items': len(low_stock_items),
+        'low_stock_items': low_stock_count,
         'total_stock_value': total_stock_value,
         'pending_orders': len(pending_orders),
     }
@@ -87,105 +93,17 @@ def employee_dashboard():
     """لوحة تحكم الموظفين - تعرض فقط الصلاحيات المسموح بها"""
     
     # التحقق من صلاحية عرض لوحة التحكم الخاصة بالموظفين
-    if not current_user.has_granular_permission('employee_dashboard_view') and not current_user.has_granular_permission('dashboard_view'):
+    if not current_user.has_any_permission('employee_dashboard_view', 'dashboard_view'):
         return render_template('403.html'), 403
     
-    # الحصول على جميع صلاحيات المستخدم
-    user_permissions = current_user.get_all_permissions()
-    
-    # بناء قائمة الوحدات المسموح بها
-    allowed_modules = []
-    
-    # تنظيم الوحدات حسب الصلاحيات
-    module_config = {
-        'inventory': {
-            'name': 'إدارة المخزون',
-            'icon': 'fas fa-warehouse',
-            'color': 'info',
-            'permissions': ['inventory_view_items', 'inventory_add_transaction'],
-            'links': [
-                {'title': 'عرض الأصناف', 'url': 'inventory.items', 'permission': 'inventory_view_items', 'icon': 'fas fa-list'},
-                {'title': 'إضافة عملية', 'url': 'inventory.add_transaction', 'permission': 'inventory_add_transaction', 'icon': 'fas fa-plus'},
-            ]
-        },
-        'equipment': {
-            'name': 'إدارة الأصول',
-            'icon': 'fas fa-tools',
-            'color': 'warning',
-            'permissions': ['equipment_view_assets', 'equipment_add_issue'],
-            'links': [
-                {'title': 'عرض الأصول', 'url': 'equipment.assets', 'permission': 'equipment_view_assets', 'icon': 'fas fa-list'},
-                {'title': 'تسليم أصل', 'url': 'equipment.add_issue', 'permission': 'equipment_add_issue', 'icon': 'fas fa-plus'},
-            ]
-        },
-        'restaurant': {
-            'name': 'إدارة المطعم',
-            'icon': 'fas fa-utensils',
-            'color': 'danger',
-            'permissions': ['restaurant_view_recipes', 'restaurant_add_meal'],
-            'links': [
-                {'title': 'عرض الوصفات', 'url': 'restaurant.recipes', 'permission': 'restaurant_view_recipes', 'icon': 'fas fa-list'},
-                {'title': 'تسجيل وجبة', 'url': 'restaurant.add_meal', 'permission': 'restaurant_add_meal', 'icon': 'fas fa-plus'},
-            ]
-        },
-        'suppliers': {
-            'name': 'إدارة الموردين',
-            'icon': 'fas fa-handshake',
-            'color': 'success',
-            'permissions': ['suppliers_view_orders', 'suppliers_add_order'],
-            'links': [
-                {'title': 'عرض الأوامر', 'url': 'suppliers.orders', 'permission': 'suppliers_view_orders', 'icon': 'fas fa-list'},
-                {'title': 'إنشاء أمر شراء', 'url': 'suppliers.add_order', 'permission': 'suppliers_add_order', 'icon': 'fas fa-plus'},
-            ]
-        },
-        'employee_requests': {
-            'name': 'طلباتي الشخصية',
-            'icon': 'fas fa-clipboard-list',
-            'color': 'primary',
-            'permissions': ['requests_create', 'requests_view_own'],
-            'links': [
-                {'title': 'عرض طلباتي', 'url': 'employee_requests.list_requests', 'permission': 'requests_view_own', 'icon': 'fas fa-list'},
-                {'title': 'إنشاء طلب جديد', 'url': 'employee_requests.create_request', 'permission': 'requests_create', 'icon': 'fas fa-plus'},
-            ]
-        },
-        'reports': {
-            'name': 'التقارير',
-            'icon': 'fas fa-chart-bar',
-            'color': 'secondary',
-            'permissions': ['reports_inventory_movement', 'reports_low_stock'],
-            'links': [
-                {'title': 'تقرير حركة المخزون', 'url': 'reports.inventory_movement', 'permission': 'reports_inventory_movement', 'icon': 'fas fa-chart-line'},
-                {'title': 'تقرير الأصناف منخفضة', 'url': 'reports.low_stock', 'permission': 'reports_low_stock', 'icon': 'fas fa-exclamation'},
-            ]
-        },
-    }
+    # الحصول على جميع صلاحيات المستخدم (مع قناع البت)
+    user_permissions = current_user.get_permission_set()
     
-    # تصفية الوحدات حسب الصلاحيات
-    for module_key, module_data in module_config.items():
-        # التحقق من وجود صلاحية واحدة على الأقل في هذه الوحدة
-        has_any_permission = any(
-            perm in user_permissions for perm in module_data['permissions']
-        )
-        
-        if has_any_permission:
-            # تصفية الروابط حسب الصلاحيات
-            filtered_links = [
-                link for link in module_data['links']
-                if link['permission'] in user_permissions
-            ]
-            
-            if filtered_links:
-                allowed_modules.append({
-                    'key': module_key,
-                    'name': module_data['name'],
-                    'icon': module_data['icon'],
-                    'color': module_data['color'],
-                    'links': filtered_links,
-                    'link_count': len(filtered_links)
-                })
+    # تصفية الوحدات حسب الصلاحيات (عمليات AND على أقنعة مترجمة مسبقاً)
+    allowed_modules = get_employee_modules(user_permissions.mask)
     
     # معلومات المؤسسة
-    org_settings = OrganizationSettings.query.first()
+    org_settings = get_org_settings()
     
     # إحصائيات بسيطة
     stats = {
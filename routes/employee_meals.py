@@ -11,8 +11,9 @@ from flask import (
 from flask_login import login_required, current_user
 from models import (
     db, User, EmployeeMealTransaction, MealPayrollIntegration, 
-    EmployeeMealAlert, ActivityLog, UserRole, MealRecord, Recipe, OrganizationSettings
+    EmployeeMealAlert, ActivityLog, UserRole, MealRecord, Recipe
 )
+from org_settings_cache import get_org_settings
 from datetime import datetime, date, timedelta
 from calendar import monthrange
 from auth_helpers import require_granular_permission
@@ -25,15 +26,15 @@ employee_meals_bp = Blueprint('employee_meals', __name__, url_prefix='/employee-
 # ==================== Helper Functions ====================
 
 def get_meal_cost_per_unit():
-    """الحصول على سعر الوجبة من إعدادات النظام"""
-    org_settings = OrganizationSettings.query.first()
+    """الحصول على سعر الوجبة من إعدادات النظام (النسخة المخزنة في الذاكرة)"""
+    org_settings = get_org_settings()
     if org_settings and org_settings.meal_cost_per_unit:
         return org_settings.meal_cost_per_unit
     return Config.MEAL_COST_PER_UNIT  # القيمة الافتراضية من الإعدادات
 
 def get_meal_alert_threshold():
-    """الحصول على عتبة التنبيه من إعدادات النظام"""
-    org_settings = OrganizationSettings.query.first()
+    """الحصول على عتبة التنبيه من إعدادات النظام (النسخة المخزنة في الذاكرة)"""
+    org_settings = get_org_settings()
     if org_settings and org_settings.meal_alert_threshold:
         return org_settings.meal_alert_threshold
     return Config.MEAL_ALERT_THRESHOLD  # القيمة الافتراضية من الإعدادات
@@ -404,6 +405,7 @@ def monthly_report():
     ).order_by(EmployeeMealTransaction.transaction_date).all()
     
     # تجميع البيانات حسب الموظف
+    meal_cost_unit = get_meal_cost_per_unit()
     employee_stats = {}
     for trans in transactions:
         emp_id = trans.user_id
@@ -418,11 +420,11 @@ def monthly_report():
             }
         
         employee_stats[emp_id]['transactions'].append(trans)
-        employee_stats[emp_id]['total_meals'] += int(trans.meal_cost / get_meal_cost_per_unit())
+        employee_stats[emp_id]['total_meals'] += int(trans.meal_cost / meal_cost_unit)
         employee_stats[emp_id]['total_cost'] += trans.final_cost
         
         if trans.is_settled:
-            employee_stats[emp_id]['settled_count'] += int(trans.meal_cost / get_meal_cost_per_unit())
+            employee_stats[emp_id]['settled_count'] += int(trans.meal_cost / meal_cost_unit)
             employee_stats[emp_id]['settled_cost'] += trans.final_cost
     
     # حساب الإجماليات
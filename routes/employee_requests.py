@@ -8,13 +8,14 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from datetime import datetime as dt
 from functools import wraps
-import uuid
 
 from models import (
     db, User, Item, ItemCategory_Model, StockRequest, StockRequestItem,
     Notification, ActivityLog, Transaction, TransactionType, UserRole
 )
 from auth_helpers import require_granular_permission
+from reference_numbers import next_reference
+from stock_ledger import apply_stock_movements, InsufficientStockError, StockConflictError
 
 # إنشاء blueprint
 employee_requests_bp = Blueprint('employee_requests', __name__, url_prefix='/employee-requests')
@@ -40,9 +41,7 @@ def can_approve_requests(f):
 
 def generate_request_number():
     """توليد رقم فريد للطلب"""
-    prefix = dt.now().strftime("%Y%m%d")
-    random_suffix = str(uuid.uuid4())[:8].upper()
-    return f"REQ-{prefix}-{random_suffix}"
+    return next_reference('REQ')
 
 
 @employee_requests_bp.route('/', methods=['GET'])
@@ -269,10 +268,11 @@ def approve_request(request_id):
         stock_request.approver_signature_date = dt.utcnow()
         
         # خصم المخزون
+        movements = []
         for idx, item in enumerate(stock_request.items):
             if item.quantity > 0:
-                # تحديث رصيد المخزون
-                item.item.quantity_in_stock -= item.quantity
+                # تحديث رصيد المخزون (يُطبق ذرياً بعد الحلقة)
+                movements.append((item.item_id, -item.quantity))
                 
                 # إنشاء معاملة بمرجع فريد لكل عنصر
                 unique_ref = f"{stock_request.request_number}-{idx+1}"
@@ -290,6 +290,8 @@ def approve_request(request_id):
                 item.item_status = 'delivered'
                 item.delivered_quantity = item.quantity
         
+        apply_stock_movements(movements)
+        
         # تسجيل النشاط
         activity = ActivityLog(
             user_id=current_user.id,
@@ -317,6 +319,16 @@ def approve_request(request_id):
         flash('تمت الموافقة على الطلب وخصم المخزون', 'success')
         return redirect(url_for('employee_requests.view_request', request_id=request_id))
     
+    except InsufficientStockError as e:
+        db.session.rollback()
+        flash(f'لا يكفي المخزون للموافقة على الطلب: {e}', 'danger')
+        return redirect(url_for('employee_requests.view_request', request_id=request_id))
+    
+    except StockConflictError:
+        db.session.rollback()
+        flash('تم تعديل المخزون من عملية أخرى في نفس الوقت، يرجى إعادة المحاولة', 'warning')
+        return redirect(url_for('employee_requests.view_request', request_id=request_id))
+    
     except Exception as e:
         db.session.rollback()
         flash(f'خطأ في الموافقة على الطلب: {str(e)}', 'danger')
@@ -394,8 +406,8 @@ def print_receipt(request_id):
         flash('ليس لديك صلاحية لطباعة هذا الوصل', 'danger')
         return redirect(url_for('employee_requests.list_requests'))
     
-    from models import OrganizationSettings
-    org_settings = OrganizationSettings.query.first()
+    from org_settings_cache import get_org_settings
+    org_settings = get_org_settings()
     
     return render_template(
         'employee_requests/receipt.html',
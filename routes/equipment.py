@@ -8,8 +8,8 @@ from models import (
     ActivityLog, ItemStatus
 )
 from datetime import datetime
-import uuid
 from auth_helpers import require_granular_permission
+from reference_numbers import next_reference
 
 equipment_bp = Blueprint('equipment', __name__, url_prefix='/equipment')
 
@@ -247,7 +247,7 @@ def add_issue():
             expected_return_date = None
         
         issue = ItemIssue(
-            issue_number=f"ISS-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{str(uuid.uuid4())[:6].upper()}",
+            issue_number=next_reference('ISS'),
             user_id=user_id,
             asset_id=asset_id,
             expected_return_date=expected_return_date,
@@ -14,9 +14,15 @@ from models import (
     SmartInventoryAlert, Supplier
 )
 from datetime import datetime, timedelta, date
-import uuid
 from auth_helpers import require_granular_permission
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, insert
+from reference_numbers import next_reference
+from abc_analysis import run_abc_analysis_for_centers, PERIOD_DAYS
+from cost_analysis_engine import start_cost_analysis, get_cost_analysis_status
+from stock_snapshots import stock_as_of, end_of_day
+from stock_ledger import (
+    adjust_stock, retry_stock_conflicts, InsufficientStockError, StockConflictError, STOCK_DIRECTION
+)
 
 inventory_bp = Blueprint('inventory', __name__, url_prefix='/inventory')
 
@@ -303,12 +309,20 @@ def edit_transaction(transaction_id):
         new_quantity = float(request.form.get('quantity', transaction.quantity))
         quantity_diff = new_quantity - old_quantity
         
-        # تحديث كمية المخزون
-        if transaction.transaction_type in ['adjustment', 'issue', 'return']:
-            if transaction.transaction_type == 'issue':
-                transaction.item.quantity_in_stock -= quantity_diff
-            elif transaction.transaction_type in ['adjustment', 'return']:
-                transaction.item.quantity_in_stock += quantity_diff
+        # تحديث كمية المخزون (تحديث ذري مشروط بعدم نزول الرصيد تحت الصفر)
+        # بنفس اتجاه add_transaction: التسوية لا تحرك الرصيد فتعديلها لا يغيره
+        stock_delta = STOCK_DIRECTION.get(transaction.transaction_type, 0) * quantity_diff
+        if stock_delta:
+            try:
+                # الكمية المعادة للمخزون تُقيّم بسعر العملية الأصلي
+                retry_stock_conflicts(lambda: adjust_stock(transaction.item_id, stock_delta, unit_cost=transaction.unit_price))
+            except InsufficientStockError as e:
+                db.session.rollback()
+                flash(f'لا يمكن تعديل العملية: {e}', 'danger')
+                return redirect(url_for('inventory.edit_transaction', transaction_id=transaction_id))
+            except StockConflictError:
+                flash('تم تعديل المخزون من عملية أخرى في نفس الوقت، يرجى إعادة المحاولة', 'warning')
+                return redirect(url_for('inventory.edit_transaction', transaction_id=transaction_id))
         
         transaction.quantity = new_quantity
         transaction.unit_price = float(request.form.get('unit_price', transaction.unit_price or 0)) or None
@@ -346,16 +360,8 @@ def add_transaction():
         
         item = Item.query.get_or_404(item_id)
         
-        # التحقق من وجود كمية كافية للإخراج
-        if transaction_type == 'issue' and item.quantity_in_stock < quantity:
-            flash(f'الكمية الموجودة ({item.quantity_in_stock}) أقل من المطلوبة', 'danger')
-            return redirect(url_for('inventory.add_transaction'))
-        
-        # تحديث المخزون
-        if transaction_type in ['purchase', 'return']:
-            item.quantity_in_stock += quantity
-        elif transaction_type == 'issue':
-            item.quantity_in_stock -= quantity
+        # الرقم المرجعي قبل أي كتابة في المعاملة
+        reference_number = next_reference('TRN')
         
         # معالجة سعر الوحدة
         unit_price_str = request.form.get('unit_price', '').strip()
@@ -367,8 +373,29 @@ def add_transaction():
         # حساب القيمة الإجمالية
         total_value = quantity * unit_price if unit_price else None
         
+        # تحديث المخزون ذرياً - التحقق من كفاية الكمية للإخراج داخل عبارة التحديث نفسها
+        stock_delta = {'purchase': quantity, 'return': quantity, 'issue': -quantity}.get(transaction_type, 0)
+        if stock_delta:
+            try:
+                value_change = retry_stock_conflicts(
+                    lambda: adjust_stock(item.id, stock_delta, unit_cost=unit_price if stock_delta > 0 else None)
+                )
+            except InsufficientStockError as e:
+                db.session.rollback()
+                flash(f'الكمية الموجودة ({e.available}) أقل من المطلوبة', 'danger')
+                return redirect(url_for('inventory.add_transaction'))
+            except StockConflictError:
+                flash('تم تعديل المخزون من عملية أخرى في نفس الوقت، يرجى إعادة المحاولة', 'warning')
+                return redirect(url_for('inventory.add_transaction'))
+            
+            # الإخراج يُسجل بتكلفته الفعلية (المتوسط المرجح أو طبقات FIFO)
+            # إلا إذا لم تتوفر تكلفة للرصيد فيبقى السعر المدخل
+            if stock_delta < 0 and value_change:
+                total_value = -value_change
+                unit_price = total_value / quantity
+        
         transaction = Transaction(
-            reference_number=f"TRN-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{str(uuid.uuid4())[:8].upper()}",
+            reference_number=reference_number,
             transaction_type=transaction_type,
             item_id=item_id,
             quantity=quantity,
@@ -411,23 +438,24 @@ def abc_analysis():
     period = request.args.get('period', 'yearly')
     category_filter = request.args.get('category', '')
     
-    # جلب جميع الأصناف مع معلومات ABC
-    items = Item.query.all()
+    # جلب جميع الأصناف مع معلومات ABC (ربط واحد بدلاً من استعلام لكل صنف)
+    query = db.session.query(
+        Item, InventoryABCAnalysis.abc_category, InventoryABCAnalysis.percentage_of_total
+    ).outerjoin(
+        InventoryABCAnalysis,
+        and_(InventoryABCAnalysis.item_id == Item.id, InventoryABCAnalysis.period == period)
+    )
     if category_filter:
-        items = Item.query.filter_by(category_id=int(category_filter)).all()
+        query = query.filter(Item.category_id == int(category_filter))
     
-    # حساب القيم
-    total_value = sum(item.quantity_in_stock * (item.unit_price or 0) for item in items)
+    items = []
+    for item, abc_category, percentage_of_total in query.all():
+        item.abc_classification = abc_category or 'C'
+        item.percentage_of_total = percentage_of_total or 0
+        items.append(item)
     
-    # إضافة معلومات ABC لكل صنف
-    for item in items:
-        analysis = InventoryABCAnalysis.query.filter_by(item_id=item.id, period=period).first()
-        if analysis:
-            item.abc_classification = analysis.abc_category
-            item.percentage_of_total = analysis.percentage_of_total
-        else:
-            item.abc_classification = 'C'
-            item.percentage_of_total = 0
+    # حساب القيم
+    total_value = sum((item.quantity_in_stock or 0) * (item.unit_price or 0) for item in items)
     
     # جلب الفئات
     categories = ItemCategory_Model.query.all()
@@ -455,59 +483,12 @@ def regenerate_abc_analysis():
         return redirect(url_for('inventory.abc_analysis'))
     
     period = request.form.get('period', 'yearly')
+    if period not in PERIOD_DAYS:
+        period = 'yearly'
     
-    # حذف التحليلات السابقة
-    InventoryABCAnalysis.query.filter_by(period=period).delete()
-    
-    # حساب الاستهلاك والقيمة لكل صنف
-    items = Item.query.all()
-    analyses_data = []
-    
-    for item in items:
-        transactions = Transaction.query.filter_by(item_id=item.id).all()
-        
-        annual_consumption = sum(t.quantity for t in transactions)
-        annual_value = sum(t.total_value or 0 for t in transactions)
-        
-        if annual_value > 0:
-            analyses_data.append({
-                'item': item,
-                'annual_consumption': annual_consumption,
-                'annual_value': annual_value
-            })
-    
-    # ترتيب حسب القيمة السنوية
-    analyses_data.sort(key=lambda x: x['annual_value'], reverse=True)
-    
-    total_value = sum(a['annual_value'] for a in analyses_data)
-    cumulative_percentage = 0
-    
-    for data in analyses_data:
-        percentage = (data['annual_value'] / total_value * 100) if total_value > 0 else 0
-        cumulative_percentage += percentage
-        
-        # تحديد الفئة
-        if cumulative_percentage <= 80:
-            abc_category = 'A'
-        elif cumulative_percentage <= 95:
-            abc_category = 'B'
-        else:
-            abc_category = 'C'
-        
-        analysis = InventoryABCAnalysis(
-            item_id=data['item'].id,
-            analysis_date=date.today(),
-            period=period,
-            abc_category=abc_category,
-            annual_consumption=data['annual_consumption'],
-            annual_value=data['annual_value'],
-            consumption_rate=data['annual_consumption'] / 12 if period == 'yearly' else data['annual_consumption'],
-            percentage_of_total=percentage
-        )
-        db.session.add(analysis)
-    
-    db.session.commit()
-    flash(f'تم تحديث تحليل ABC بنجاح - {len(analyses_data)} صنف', 'success')
+    # الحركات الجديدة فقط ثم تصنيف الفترة من الاستهلاك اليومي داخل نافذتها
+    _, classified = run_abc_analysis_for_centers([period])
+    flash(f'تم تحديث تحليل ABC بنجاح - {classified[period]} صنف', 'success')
     return redirect(url_for('inventory.abc_analysis'))
 
 
@@ -539,10 +520,31 @@ def new_inventory_count():
         count_type = request.form.get('count_type', 'full')
         warehouse_location = request.form.get('warehouse_location', '')
         
+        # تاريخ الجرد (يمكن تسجيل جرد تم في يوم سابق)
+        count_date = datetime.utcnow()
+        past_date = None
+        if request.form.get('count_date'):
+            try:
+                submitted = end_of_day(datetime.strptime(request.form['count_date'], '%Y-%m-%d').date())
+            except ValueError:
+                submitted = None
+            if submitted is not None and submitted < count_date:
+                count_date = past_date = submitted
+        
+        count_number = next_reference('COUNT')
+        
+        # كمية النظام: الرصيد الحي لجرد اليوم، ولجرد يوم سابق الرصيد في ذلك اليوم
+        # (لقطة + حركات) حتى يُحسب الفرق مقابل الرصيد الصحيح
+        items = db.session.query(Item.id, Item.quantity_in_stock).filter(Item.is_active == True).all()
+        if past_date is None:
+            balances = {item_id: quantity or 0 for item_id, quantity in items}
+        else:
+            balances = stock_as_of(past_date)
+        
         count = InventoryCount(
-            count_number=f"COUNT-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}",
+            count_number=count_number,
             count_type=count_type,
-            count_date=datetime.utcnow(),
+            count_date=count_date,
             warehouse_location=warehouse_location,
             started_by_id=current_user.id
         )
@@ -550,15 +552,12 @@ def new_inventory_count():
         db.session.add(count)
         db.session.flush()
         
-        # إضافة الأصناف
-        items = Item.query.filter_by(is_active=True).all()
-        for item in items:
-            count_item = InventoryCountItem(
-                count_id=count.id,
-                item_id=item.id,
-                system_quantity=item.quantity_in_stock
-            )
-            db.session.add(count_item)
+        # إضافة الأصناف دفعة واحدة
+        if items:
+            db.session.execute(insert(InventoryCountItem), [
+                {'count_id': count.id, 'item_id': item_id, 'system_quantity': balances.get(item_id, 0)}
+                for item_id, _ in items
+            ])
         
         db.session.commit()
         flash(f'تم إنشاء عملية جرد جديدة: {count.count_number}', 'success')
@@ -680,16 +679,33 @@ def cost_analysis():
     
     period = request.args.get('period', 'monthly')
     
+    # تقييم نهاية فترة سابقة: الكميات من أقرب لقطة مع الحركات بعدها
+    as_of = request.args.get('as_of', '')
+    try:
+        as_of_date = datetime.strptime(as_of, '%Y-%m-%d').date() if as_of else None
+    except ValueError:
+        as_of_date = None
+    
     # جلب جميع الأصناف
     items = Item.query.all()
+    balances = stock_as_of(as_of_date) if as_of_date else None
+    for item in items:
+        if balances is not None:
+            item.valuation_quantity = balances.get(item.id, 0)
+            item.valuation_value = item.valuation_quantity * (item.unit_price or 0)
+        else:
+            # القيمة الحالية بالتكلفة (المتوسط المرجح أو FIFO)
+            item.valuation_quantity = item.quantity_in_stock or 0
+            item.valuation_value = item.stock_value or 0
     
     # حساب الإحصائيات
-    total_inventory_value = sum(item.quantity_in_stock * (item.unit_price or 0) for item in items)
+    total_inventory_value = sum(item.valuation_value for item in items)
     average_unit_price = (sum(item.unit_price or 0 for item in items) / len(items)) if items else 0
-    max_item_value = max((item.quantity_in_stock * (item.unit_price or 0) for item in items), default=0)
+    max_item_value = max((item.valuation_value for item in items), default=0)
     
     return render_template('inventory/cost_analysis.html', 
                           items=items, period=period,
+                          as_of=as_of_date.isoformat() if as_of_date else '',
                           total_inventory_value=total_inventory_value,
                           average_unit_price=average_unit_price,
                           max_item_value=max_item_value)
@@ -698,43 +714,30 @@ def cost_analysis():
 @inventory_bp.route('/cost-analysis/recalculate', methods=['POST'])
 @login_required
 def recalculate_cost_analysis():
-    """إعادة حساب تكاليف المخزون"""
+    """إعادة حساب تكاليف المخزون (في الخلفية)"""
     if not current_user.has_granular_permission('inventory_edit_cost_analysis'):
         flash('ليس لديك صلاحية', 'danger')
         return redirect(url_for('inventory.cost_analysis'))
     
     period = request.form.get('period', 'monthly')
+    if period not in PERIOD_DAYS:
+        period = 'monthly'
     
-    # حذف التحليلات السابقة
-    InventoryCostAnalysis.query.filter_by(period=period).delete()
-    
-    items = Item.query.all()
-    
-    for item in items:
-        transactions = Transaction.query.filter_by(item_id=item.id).all()
-        
-        total_value = sum(t.total_value or 0 for t in transactions)
-        avg_inventory = item.quantity_in_stock
-        
-        # حساب التكاليف
-        holding_cost = (total_value * 20) / 100  # افترض 20% تكلفة احتفاظ
-        ordering_cost = len(transactions) * 50  # افترض 50 لكل عملية طلب
-        
-        analysis = InventoryCostAnalysis(
-            item_id=item.id,
-            analysis_date=date.today(),
-            period=period,
-            holding_cost=holding_cost,
-            ordering_cost=ordering_cost,
-            total_inventory_value=total_value,
-            average_inventory=avg_inventory,
-            profitability=total_value - holding_cost
-        )
-        db.session.add(analysis)
+    if start_cost_analysis(period):
+        flash('بدأ حساب تحليل التكاليف في الخلفية', 'info')
+    else:
+        flash('حساب تحليل التكاليف قيد التنفيذ بالفعل', 'warning')
+    return redirect(url_for('inventory.cost_analysis', period=period))
+
+
+@inventory_bp.route('/cost-analysis/status')
+@login_required
+def cost_analysis_status():
+    """تقدم حساب تحليل التكاليف"""
+    if not current_user.has_granular_permission('inventory_view_cost_analysis'):
+        return jsonify({'success': False}), 403
     
-    db.session.commit()
-    flash('تم تحديث تحليل التكاليف', 'success')
-    return redirect(url_for('inventory.cost_analysis'))
+    return jsonify({'success': True, 'job': get_cost_analysis_status()})
 
 
 # ==================== 5. التوصيات والطلبات ====================
@@ -913,16 +916,18 @@ def smart_alerts():
     
     alert_type = request.args.get('type', 'all')
     
-    if alert_type == 'all':
-        alerts = SmartInventoryAlert.query.filter_by(is_resolved=False).all()
-    else:
-        alerts = SmartInventoryAlert.query.filter_by(
-            alert_type=alert_type,
-            is_resolved=False
-        ).all()
+    # الإنذارات تُنشأ عند الحركات نفسها (inventory_alerts) - العرض قراءة مفهرسة فقط
+    query = SmartInventoryAlert.query.filter_by(is_resolved=False)
+    if alert_type != 'all':
+        query = query.filter_by(alert_type=alert_type)
+    
+    total_alerts = query.count()
+    alerts = query.order_by(SmartInventoryAlert.triggered_at.desc()).limit(
+        current_app.config.get('ALERT_LIST_LIMIT', 200)
+    ).all()
     
     return render_template('inventory/smart_alerts.html', 
-                          alerts=alerts, alert_type=alert_type)
+                          alerts=alerts, alert_type=alert_type, total_alerts=total_alerts)
 
 
 @inventory_bp.route('/smart-alert/<alert_id>/resolve', methods=['POST'])
@@ -934,6 +939,8 @@ def resolve_smart_alert(alert_id):
     
     alert = SmartInventoryAlert.query.get_or_404(alert_id)
     alert.is_resolved = True
+    alert.resolved_at = datetime.utcnow()
+    alert.dedup_key = None
     alert.action_taken = request.form.get('action_taken', '')
     db.session.commit()
     
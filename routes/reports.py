@@ -5,9 +5,11 @@ from flask import (
 from flask_login import login_required, current_user
 from models import (
     db, Item, Transaction, User, MealRecord, 
-    AssetRegistration, PurchaseOrder, OrganizationSettings, ItemCategory_Model
+    AssetRegistration, PurchaseOrder, ItemCategory_Model
 )
+from org_settings_cache import get_org_settings
 from auth_helpers import require_granular_permission
+from stock_snapshots import stock_value_as_of
 from datetime import datetime, timedelta, date
 from sqlalchemy import func, and_
 import io
@@ -70,10 +72,14 @@ def inventory_movement():
     
     net_balance = purchase_total - issue_total
     
+    # قيمة المخزون في بداية الفترة ونهايتها (أقرب لقطة + حركات ما بعدها)
+    opening_value, _ = stock_value_as_of(from_date - timedelta(microseconds=1))
+    closing_value, _ = stock_value_as_of(to_date)
+    
     # احصل على جميع الفئات للفلتر
     categories = ItemCategory_Model.query.filter_by(is_active=True).all()
     
-    org_settings = OrganizationSettings.query.first()
+    org_settings = get_org_settings()
     
     return render_template(
         'reports/inventory_movement.html',
@@ -85,6 +91,8 @@ def inventory_movement():
         transfer_total=transfer_total,
         transfer_count=transfer_count,
         net_balance=net_balance,
+        opening_value=opening_value,
+        closing_value=closing_value,
         categories=categories,
         from_date=from_date.date().isoformat(),
         to_date=to_date.date().isoformat(),
@@ -113,7 +121,7 @@ def low_stock():
     # احصل على الفئات
     categories = ItemCategory_Model.query.filter_by(is_active=True).all()
     
-    org_settings = OrganizationSettings.query.first()
+    org_settings = get_org_settings()
     
     return render_template(
         'reports/low_stock_report.html',
@@ -163,7 +171,7 @@ def asset_inventory():
         })
     
     users = User.query.all()
-    org_settings = OrganizationSettings.query.first()
+    org_settings = get_org_settings()
     
     return render_template(
         'reports/asset_inventory.html',
@@ -248,7 +256,7 @@ def meal_consumption():
     
     top_recipes = sorted(recipe_stats.values(), key=lambda x: x['count'], reverse=True)[:5]
     
-    org_settings = OrganizationSettings.query.first()
+    org_settings = get_org_settings()
     
     return render_template(
         'reports/meal_consumption.html',
@@ -286,7 +294,7 @@ def export_inventory_movement_pdf():
         Transaction.transaction_date.between(from_date_dt, to_date_dt)
     ).order_by(Transaction.transaction_date).all()
     
-    org_settings = OrganizationSettings.query.first()
+    org_settings = get_org_settings()
     
     # إنشاء PDF
     buffer = io.BytesIO()
@@ -361,7 +369,7 @@ def export_low_stock_excel():
         Item.is_active == True
     ).all()
     
-    org_settings = OrganizationSettings.query.first()
+    org_settings = get_org_settings()
     
     # إنشاء Excel
     wb = openpyxl.Workbook()
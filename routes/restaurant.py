@@ -9,6 +9,8 @@ from models import (
 )
 from datetime import datetime, date, timedelta
 from auth_helpers import require_granular_permission
+from reference_numbers import next_references
+from stock_ledger import apply_stock_movements, InsufficientStockError, StockConflictError
 
 restaurant_bp = Blueprint('restaurant', __name__, url_prefix='/restaurant')
 
@@ -243,6 +245,9 @@ def add_meal():
             ingredient_cost = quantity_needed * (ingredient.item.unit_price or 0)
             expected_cost += ingredient_cost
         
+        # رقم مرجعي مستقل لحركة كل مكون (محجوزة قبل أي كتابة)
+        reference_numbers = next_references('MEAL', len(recipe.ingredients))
+        
         meal = MealRecord(
             record_date=meal_date_obj,
             meal_type=meal_type,
@@ -256,12 +261,13 @@ def add_meal():
         db.session.flush()
         
         # تحديث المخزون بناءً على الوصفة
-        for ingredient in recipe.ingredients:
+        movements = []
+        for ingredient, reference_number in zip(recipe.ingredients, reference_numbers):
             quantity_needed = ingredient.quantity * servings / recipe.servings
             
             # تسجيل عملية استخراج
             transaction = Transaction(
-                reference_number=f"MEAL-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}",
+                reference_number=reference_number,
                 transaction_type='issue',
                 item_id=ingredient.item_id,
                 quantity=quantity_needed,
@@ -271,11 +277,23 @@ def add_meal():
                 description=f"استهلاك - وجبة: {recipe.name}"
             )
             
-            # تحديث المخزون
-            ingredient.item.quantity_in_stock -= quantity_needed
+            movements.append((ingredient.item_id, -quantity_needed))
             
             db.session.add(transaction)
         
+        # خصم جميع المكونات ذرياً في نفس المعاملة
+        try:
+            apply_stock_movements(movements)
+        except InsufficientStockError as e:
+            db.session.rollback()
+            item = Item.query.get(e.item_id)
+            flash(f'لا يكفي المخزون لـ {item.name if item else e.item_id}: {e}', 'danger')
+            return redirect(url_for('restaurant.add_meal'))
+        except StockConflictError:
+            db.session.rollback()
+            flash('تم تعديل المخزون من عملية أخرى في نفس الوقت، يرجى إعادة المحاولة', 'warning')
+            return redirect(url_for('restaurant.add_meal'))
+        
         db.session.commit()
         
         activity_log = ActivityLog(
@@ -32,6 +32,10 @@ from security_services import (
     PasswordValidator, SessionManager, SecurityAlertService,
     IPSecurityManager, AccessKeyManager, RateLimiter
 )
+# خدمة التسجيل (اسم SecurityLog هنا للنموذج)
+from security_services import SecurityLog as SecurityLogService
+from security_config import invalidate_security_config
+from security_rollups import get_security_dashboard_stats
 from functools import wraps
 from datetime import datetime, timedelta
 import json
@@ -60,6 +64,7 @@ def password_policy():
     policy = PasswordValidator.get_policy()
     
     if request.method == 'POST':
+        policy = PasswordValidator.get_policy_for_update()
         policy.min_length = int(request.form.get('min_length', 12))
         policy.require_uppercase = request.form.get('require_uppercase') is not None
         policy.require_lowercase = request.form.get('require_lowercase') is not None
@@ -72,10 +77,11 @@ def password_policy():
         policy.updated_at = datetime.utcnow()
         
         db.session.commit()
+        invalidate_security_config()
         flash('تم تحديث سياسة كلمات المرور بنجاح', 'success')
         
         # تسجيل الإجراء
-        SecurityLog.log_action(
+        SecurityLogService.log_action(
             user_id=current_user.id,
             action='password_policy_updated',
             resource_type='security',
@@ -84,6 +90,7 @@ def password_policy():
                 'expiry_days': policy.expiry_days
             }
         )
+        return redirect(url_for('security.password_policy'))
     
     return render_template('security/password_policy.html', policy=policy)
 
@@ -245,6 +252,7 @@ def remove_trusted_ip(ip_id):
     
     whitelist.is_active = False
     db.session.commit()
+    invalidate_security_config()
     
     flash('تم إزالة عنوان IP الموثوق', 'success')
     return redirect(url_for('security.trusted_ips'))
@@ -309,6 +317,7 @@ def create_rate_limit():
         )
         db.session.add(rule)
         db.session.commit()
+        invalidate_security_config()
         
         flash('تم إنشاء قاعدة معدل الطلبات بنجاح', 'success')
         return redirect(url_for('security.rate_limits'))
@@ -332,6 +341,7 @@ def edit_rate_limit(rule_id):
         rule.updated_at = datetime.utcnow()
         
         db.session.commit()
+        invalidate_security_config()
         flash('تم تحديث قاعدة معدل الطلبات بنجاح', 'success')
         return redirect(url_for('security.rate_limits'))
     
@@ -346,45 +356,30 @@ def edit_rate_limit(rule_id):
 def security_dashboard():
     """لوحة تحكم الأمان"""
     
-    # الإحصائيات العامة
+    # الإحصائيات العامة (من جدول الملخصات security_rollups فقط)
+    rollups = get_security_dashboard_stats()
     stats = {
         'total_users': User.query.count(),
-        'active_sessions': db.session.query(db.func.count(SecurityLog.query.filter_by(action='login'))).scalar(),
-        'failed_logins_today': SecurityLog.query.filter(
-            SecurityLog.action == 'login',
-            SecurityLog.status == 'failed',
-            SecurityLog.timestamp >= datetime.utcnow() - timedelta(hours=24)
-        ).count(),
-        'alerts_today': SecurityAlert.query.filter(
-            SecurityAlert.created_at >= datetime.utcnow() - timedelta(hours=24)
-        ).count(),
-        'critical_alerts': SecurityAlert.query.filter_by(
-            severity='critical',
-            is_acknowledged=False
-        ).count(),
+        'active_sessions': rollups['logins'],
+        'failed_logins_today': rollups['failed_logins_today'],
+        'alerts_today': rollups['alerts_today'],
+        'critical_alerts': rollups['critical_alerts'],
     }
     
-    # آخر التنبيهات
-    recent_alerts = SecurityAlert.query.order_by(
+    # آخر التنبيهات (آخر 10 صفوف فقط)
+    recent_alerts = db.session.query(SecurityAlert).order_by(
         SecurityAlert.created_at.desc()
     ).limit(10).all()
     
     # آخر محاولات الدخول الفاشلة
-    failed_logins = SecurityLog.query.filter(
+    failed_logins = db.session.query(SecurityLog).filter(
         SecurityLog.action == 'login',
         SecurityLog.status == 'failed',
         SecurityLog.timestamp >= datetime.utcnow() - timedelta(hours=24)
     ).order_by(SecurityLog.timestamp.desc()).limit(10).all()
     
-    # توزيع التنبيهات حسب النوع
-    alert_types = db.session.query(
-        SecurityAlert.alert_type,
-        db.func.count(SecurityAlert.id)
-    ).filter(
-        SecurityAlert.created_at >= datetime.utcnow() - timedelta(days=7)
-    ).group_by(SecurityAlert.alert_type).all()
-    
-    alert_stats = {alert_type: count for alert_type, count in alert_types}
+    # توزيع التنبيهات حسب النوع (آخر 7 أيام)
+    alert_stats = rollups['alert_types']
     
     return render_template(
         'security/dashboard.html',
@@ -8,8 +8,8 @@ from models import (
     Item, ActivityLog, UserRole
 )
 from datetime import datetime
-import uuid
 from auth_helpers import require_granular_permission
+from reference_numbers import next_reference
 
 suppliers_bp = Blueprint('suppliers', __name__, url_prefix='/suppliers')
 
@@ -190,7 +190,7 @@ def add_order():
             expected_delivery = None
         
         purchase_order = PurchaseOrder(
-            po_number=f"PO-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{str(uuid.uuid4())[:6].upper()}",
+            po_number=next_reference('PO'),
             supplier_id=supplier_id,
             expected_delivery=expected_delivery,
             notes=request.form.get('notes', '')
@@ -341,8 +341,8 @@ def invoice(order_id):
     order = PurchaseOrder.query.get_or_404(order_id)
     
     # الحصول على معلومات المؤسسة
-    from models import OrganizationSettings
-    org_settings = OrganizationSettings.query.first()
+    from org_settings_cache import get_org_settings
+    org_settings = get_org_settings()
     
     # تنسيق التاريخ والوقت الحالي
     print_datetime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -12,6 +12,9 @@ from models import (
     ActivityLog, Item, Recipe, MealRecord, 
     Transaction, Supplier, PurchaseOrder, AssetRegistration
 )
+from sqlalchemy.orm import joinedload
+from center_shards import using_center
+from center_stats import get_center_stats, get_center_counters
 from datetime import datetime
 import uuid
 
@@ -80,7 +83,10 @@ def list_centers():
             is_active=True
         ).paginate(page=page, per_page=per_page)
         
-        return render_template('vocational_centers/list.html', centers=centers)
+        # عدادات جميع مراكز الصفحة باستعلام مجمع واحد (مع ذاكرة قصيرة المدة)
+        center_stats = get_center_stats([center.id for center in centers.items])
+        
+        return render_template('vocational_centers/list.html', centers=centers, center_stats=center_stats)
     
     # مدير المركز يرى مركزه فقط
     elif current_user.role == UserRole.CENTER_MANAGER:
@@ -175,15 +181,11 @@ def view_center(center_id):
         return redirect(url_for('dashboard.index'))
     
     # احصائيات المركز
-    stats = {
-        'employees': User.query.filter_by(center_id=center_id, is_active=True).count(),
-        'inventory_items': Item.query.filter_by(center_id=center_id, is_active=True).count(),
-        'suppliers': Supplier.query.filter_by(center_id=center_id, is_active=True).count(),
-        'recipes': Recipe.query.filter_by(center_id=center_id, is_active=True).count(),
-        'recent_activity': ActivityLog.query.filter_by(center_id=center_id).order_by(
+    stats = get_center_counters(center_id)
+    with using_center(center_id):
+        stats['recent_activity'] = ActivityLog.query.filter_by(center_id=center_id).order_by(
             ActivityLog.created_at.desc()
         ).limit(10).all()
-    }
     
     return render_template('vocational_centers/detail.html', center=center, stats=stats)
 
@@ -400,15 +402,12 @@ def center_statistics(center_id):
         flash('لا توجد صلاحية للوصول لهذا المركز', 'danger')
         return redirect(url_for('dashboard.index'))
     
-    stats = {
-        'total_employees': User.query.filter_by(center_id=center_id, is_active=True).count(),
-        'inventory_items': Item.query.filter_by(center_id=center_id, is_active=True).count(),
-        'suppliers': Supplier.query.filter_by(center_id=center_id, is_active=True).count(),
-        'recipes': Recipe.query.filter_by(center_id=center_id, is_active=True).count(),
-        'total_transactions': Transaction.query.filter_by(center_id=center_id).count(),
-        'recent_transactions': Transaction.query.filter_by(center_id=center_id).order_by(
-            Transaction.created_at.desc()
-        ).limit(5).all()
-    }
+    stats = get_center_counters(center_id)
+    stats['total_employees'] = stats['employees']
+    with using_center(center_id):
+        # الصنف يُحمل مع الحركة من قاعدة المركز نفسها
+        stats['recent_transactions'] = Transaction.query.filter_by(center_id=center_id).options(
+            joinedload(Transaction.item)
+        ).order_by(Transaction.created_at.desc()).limit(5).all()
     
     return render_template('vocational_centers/statistics.html', center=center, stats=stats)
\ No newline at end of file
@@ -4,6 +4,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from app import create_app
 from models import db, UserPermission, User
 from permissions_config import get_all_permissions_flat
+from permission_cache import bump_permission_version
 
 
 def grant_all_to_username(username: str):
@@ -36,6 +37,7 @@ def grant_all_to_username(username: str):
                 db.session.add(new)
                 added += 1
 
+        bump_permission_version(user.id)
         db.session.commit()
         total = len(perms)
         print(f"تم منح جميع الصلاحيات للمستخدم '{username}' (مجموع الصلاحيات: {total} — مضافة: {added}, محدثة: {updated})")
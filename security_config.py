@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+نسخة إعدادات الأمان في الذاكرة
+Security Config Snapshot - one versioned, immutable copy of all security settings
+
+المسارات الساخنة (كل طلب، كل تسجيل دخول) تقرأ سياسة كلمات المرور وقواعد
+معدل الطلبات وعناوين IP الموثوقة وعلامات الميزات. بدلاً من استعلام لكل قراءة
+يتم تحميل الجداول الأربعة مرة واحدة في نسخة غير قابلة للتعديل:
+- PasswordPolicy: قيم السياسة (أو القيم الافتراضية للأعمدة - بدون إدراج صف)
+- RateLimitRule: القواعد المفعلة مترجمة (RateLimitRuleSet)
+- IPWhitelist: شجرة بادئات CIDR لكل مستخدم - البحث O(طول البادئة)
+- FeatureFlag: العلامات حسب الاسم
+
+النسخة الجديدة تُبنى بالكامل ثم تستبدل المرجع القديم دفعة واحدة، لذلك لا يرى
+أي طلب نسخة نصف محدثة. بعد أي تعديل (routes/security_advanced.py) يتم
+استدعاء invalidate_security_config() التي تعيد البناء في هذه العملية وتحدّث
+ملف إشارة في مجلد instance؛ باقي العمليات تقارن قيمته مرة كل
+SECURITY_CONFIG_CHECK_INTERVAL ثانية وتعيد البناء عند تغيره (signal_cache).
+"""
+
+import os
+import time
+import ipaddress
+from datetime import datetime
+from types import MappingProxyType
+from flask import current_app
+from models import db, FeatureFlag
+from rate_limiter import CompiledRule, RateLimitRuleSet
+from signal_cache import SignalledSnapshotCache
+
+
+PASSWORD_POLICY_FIELDS = (
+    'id', 'min_length', 'require_uppercase', 'require_lowercase', 'require_numbers',
+    'require_special_chars', 'expiry_days', 'history_count', 'lockout_threshold',
+    'lockout_duration_minutes', 'created_at', 'updated_at'
+)
+
+
+class PasswordPolicySnapshot:
+    """نسخة للقراءة فقط من سياسة كلمات المرور"""
+
+    __slots__ = PASSWORD_POLICY_FIELDS
+
+    def __init__(self, values):
+        for field in PASSWORD_POLICY_FIELDS:
+            object.__setattr__(self, field, values.get(field))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('سياسة كلمات المرور للقراءة فقط - استخدم PasswordValidator.get_policy_for_update()')
+
+    def __repr__(self):
+        return f'<PasswordPolicySnapshot min_length={self.min_length}>'
+
+
+class WhitelistEntry:
+    """عنوان أو شبكة موثوقة لمستخدم"""
+
+    __slots__ = ('id', 'network', 'expires_at')
+
+    def __init__(self, entry_id, network, expires_at):
+        self.id = entry_id
+        self.network = network
+        self.expires_at = expires_at
+
+    def is_valid(self, now=None):
+        return self.expires_at is None or self.expires_at > (now or datetime.utcnow())
+
+
+class CIDRTrie:
+    """شجرة بادئات ثنائية لعناوين IPv4 و IPv6
+
+    كل عقدة قائمة [ابن 0، ابن 1، مدخلات]. البحث يتبع بتات العنوان من الأعلى
+    ويحتفظ بآخر مدخل صالح، فتكون النتيجة أكثر الشبكات تحديداً.
+    """
+
+    def __init__(self):
+        self._roots = {4: [None, None, None], 6: [None, None, None]}
+        self.size = 0
+
+    def insert(self, network, entry):
+        node = self._roots[network.version]
+        bits = int(network.network_address)
+        width = network.max_prefixlen
+        for depth in range(network.prefixlen):
+            bit = (bits >> (width - 1 - depth)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, None]
+            node = node[bit]
+        if node[2] is None:
+            node[2] = []
+        node[2].append(entry)
+        self.size += 1
+
+    def lookup(self, address, now=None):
+        """أكثر مدخل صالح تحديداً يحتوي العنوان (أو None)"""
+        now = now or datetime.utcnow()
+        node = self._roots[address.version]
+        bits = int(address)
+        width = address.max_prefixlen
+        best = None
+        depth = 0
+        while node is not None:
+            if node[2]:
+                for entry in node[2]:
+                    if entry.is_valid(now):
+                        best = entry
+                        break
+            if depth == width:
+                break
+            node = node[(bits >> (width - 1 - depth)) & 1]
+            depth += 1
+        return best
+
+
+class FeatureFlagSnapshot:
+    """نسخة خفيفة من علامة ميزة"""
+
+    __slots__ = ('flag_name', 'is_enabled', 'feature_type', 'config', 'roles', 'users')
+
+    def __init__(self, flag):
+        self.flag_name = flag['flag_name']
+        self.is_enabled = bool(flag['is_enabled'])
+        self.feature_type = flag['feature_type']
+        self.config = MappingProxyType(dict(flag['config_data'] or {}))
+        self.roles = frozenset(flag['enabled_for_roles'] or ())
+        self.users = frozenset(str(user_id) for user_id in flag['enabled_for_users'] or ())
+
+    def enabled_for(self, user=None):
+        """هل الميزة مفعلة (للمستخدم إن وُجدت قيود أدوار أو مستخدمين)"""
+        if not self.is_enabled:
+            return False
+        if not self.roles and not self.users:
+            return True
+        if user is None:
+            return False
+        return getattr(user, 'role', None) in self.roles or str(getattr(user, 'id', '')) in self.users
+
+
+class SecurityConfigSnapshot:
+    """نسخة واحدة مرقمة من جميع إعدادات الأمان"""
+
+    __slots__ = ('version', 'loaded_at', 'password_policy', 'rate_limits', 'whitelists', 'feature_flags')
+
+    def __init__(self, version, password_policy, rate_limits, whitelists, feature_flags):
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'loaded_at', datetime.utcnow())
+        object.__setattr__(self, 'password_policy', password_policy)
+        object.__setattr__(self, 'rate_limits', rate_limits)
+        object.__setattr__(self, 'whitelists', MappingProxyType(whitelists))
+        object.__setattr__(self, 'feature_flags', MappingProxyType(feature_flags))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('نسخة إعدادات الأمان للقراءة فقط')
+
+    def find_whitelist_entry(self, user_id, ip_address):
+        """مدخل IPWhitelist الصالح الذي يطابق العنوان (أو None)"""
+        trie = self.whitelists.get(user_id)
+        if trie is None:
+            return None
+        try:
+            address = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return None
+        return trie.lookup(address)
+
+
+# ---------------------- التحميل ----------------------
+
+def _security_models():
+    """نماذج الأمان المتقدمة (نفس الاستيراد المستخدم في security_services)"""
+    from security_services import PasswordPolicy, RateLimitRule, IPWhitelist
+    return PasswordPolicy, RateLimitRule, IPWhitelist
+
+
+def _column_defaults(model):
+    """القيم الافتراضية الثابتة لأعمدة النموذج"""
+    values = {}
+    for column in model.__table__.columns:
+        default = column.default
+        values[column.key] = default.arg if default is not None and default.is_scalar else None
+    return values
+
+
+def _load_password_policy(conn, model):
+    values = _column_defaults(model)
+    row = conn.execute(model.__table__.select().order_by(model.__table__.c.id).limit(1)).mappings().first()
+    if row is not None:
+        values.update(row)
+    return PasswordPolicySnapshot(values)
+
+
+def _load_rate_limits(conn, model):
+    table = model.__table__
+    rows = conn.execute(table.select().where(table.c.is_enabled.is_(True))).mappings()
+    return RateLimitRuleSet(
+        CompiledRule(
+            row['id'], row['endpoint'], (row['method'] or '*').upper(),
+            row['requests_per_minute'], row['requests_per_hour'],
+            frozenset(row['bypass_roles'] or ())
+        )
+        for row in rows
+    )
+
+
+def _load_whitelists(conn, model):
+    table = model.__table__
+    rows = conn.execute(table.select().where(table.c.is_active.is_(True))).mappings()
+    whitelists = {}
+    for row in rows:
+        try:
+            network = ipaddress.ip_network(row['ip_address'].strip(), strict=False)
+        except (ValueError, AttributeError):
+            continue
+        trie = whitelists.get(row['user_id'])
+        if trie is None:
+            trie = whitelists[row['user_id']] = CIDRTrie()
+        trie.insert(network, WhitelistEntry(row['id'], network, row['expires_at']))
+    return whitelists
+
+
+def _load_feature_flags(conn):
+    rows = conn.execute(FeatureFlag.__table__.select()).mappings()
+    return {row['flag_name']: FeatureFlagSnapshot(row) for row in rows}
+
+
+class SecurityConfigCache(SignalledSnapshotCache):
+    """ذاكرة نسخة إعدادات الأمان لتطبيق واحد"""
+
+    signal_label = 'إعدادات الأمان'
+
+    def __init__(self, signal_path, check_interval=2.0):
+        super().__init__(signal_path, check_interval)
+        self.version = 0
+        self.load_errors = 0
+        self.last_load_ms = 0.0
+
+    def _load_section(self, name, loader, default):
+        """تحميل جدول واحد - الجداول غير الموجودة تُستبدل بالقيمة الافتراضية"""
+        try:
+            with db.engine.connect() as conn:
+                return loader(conn)
+        except Exception as e:
+            self.load_errors += 1
+            current_app.logger.warning(f'تعذر تحميل إعدادات الأمان ({name}): {e}')
+            return default()
+
+    def _build(self):
+        """بناء نسخة جديدة كاملة من قاعدة البيانات"""
+        PasswordPolicy, RateLimitRule, IPWhitelist = _security_models()
+        started = time.perf_counter()
+        snapshot = SecurityConfigSnapshot(
+            self.version + 1,
+            password_policy=self._load_section(
+                'password_policy', lambda conn: _load_password_policy(conn, PasswordPolicy),
+                lambda: PasswordPolicySnapshot(_column_defaults(PasswordPolicy))
+            ),
+            rate_limits=self._load_section(
+                'rate_limits', lambda conn: _load_rate_limits(conn, RateLimitRule), RateLimitRuleSet
+            ),
+            whitelists=self._load_section(
+                'ip_whitelist', lambda conn: _load_whitelists(conn, IPWhitelist), dict
+            ),
+            feature_flags=self._load_section('feature_flags', _load_feature_flags, dict),
+        )
+        self.last_load_ms = (time.perf_counter() - started) * 1000
+        self.version = snapshot.version
+        return snapshot
+
+    def stats(self):
+        """عدادات الأداء"""
+        with self._lock:
+            snapshot = self._snapshot
+            return {
+                'version': self.version,
+                'reads': self.reads,
+                'loads': self.loads,
+                'load_errors': self.load_errors,
+                'last_load_ms': round(self.last_load_ms, 3),
+                'rate_limit_rules': len(snapshot.rate_limits) if snapshot else 0,
+                'whitelisted_users': len(snapshot.whitelists) if snapshot else 0,
+                'feature_flags': len(snapshot.feature_flags) if snapshot else 0,
+            }
+
+
+def _get_cache(app=None):
+    app = app or current_app
+    return app.extensions['security_config']
+
+
+def get_security_config():
+    """نسخة إعدادات الأمان الحالية (للقراءة فقط)"""
+    return _get_cache().get()
+
+
+def invalidate_security_config():
+    """يجب استدعاؤها بعد commit لأي تعديل على جداول إعدادات الأمان"""
+    _get_cache().refresh()
+
+
+def is_feature_enabled(flag_name, user=None):
+    """هل علامة الميزة مفعلة (False إذا لم توجد)"""
+    flag = get_security_config().feature_flags.get(flag_name)
+    return flag is not None and flag.enabled_for(user)
+
+
+def get_security_config_stats():
+    """عدادات ذاكرة إعدادات الأمان"""
+    return _get_cache().stats()
+
+
+def init_security_config(app):
+    """تهيئة ذاكرة إعدادات الأمان"""
+    signal_path = app.config.get('SECURITY_CONFIG_SIGNAL_FILE') or os.path.join(
+        app.instance_path, 'security_config.signal'
+    )
+    app.extensions['security_config'] = SecurityConfigCache(
+        signal_path,
+        check_interval=app.config.get('SECURITY_CONFIG_CHECK_INTERVAL', 2.0),
+    )
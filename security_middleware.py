@@ -3,12 +3,21 @@ Middleware الأمان - الحماية من الهجمات والتحقق من
 Security Middleware - Attack Prevention & Rate Limiting
 """
 
-from flask import request, abort, jsonify, current_app
+from flask import request, abort, jsonify, current_app, g, Request
+from werkzeug.utils import cached_property
 from functools import wraps
 from datetime import datetime, timedelta
 from models import db
+from audit_writer import get_audit_writer, init_audit_writer
+from session_cache import init_session_cache
+from security_config import init_security_config
+from security_rollups import init_security_rollups
+from rate_limiter import (
+    get_rate_limiter, get_rate_limit_rules, record_rate_limit_violation, init_rate_limiter
+)
 import hashlib
 import re
+import time
 from urllib.parse import urlparse
 import os
 import importlib.util
@@ -70,45 +79,39 @@ class SecurityHeaders:
 class RateLimitMiddleware:
     """Middleware لتحديد معدل الطلبات"""
     
-    # تخزين مؤقت للطلبات (في الإنتاج يجب استخدام Redis)
-    _request_cache = {}
-    
     @staticmethod
     def check_rate_limit():
-        """فحص معدل الطلبات"""
+        """فحص معدل الطلبات (نافذة منزلقة - بدون استعلامات)"""
         if not current_app.config.get('RATE_LIMIT_ENABLED', True):
             return True
         
         # الحصول على معرف فريد (IP أو User)
         client_id = request.remote_addr
+        limiter = get_rate_limiter()
         
-        # الحصول على الفترة الزمنية الحالية (دقيقة)
-        current_minute = datetime.utcnow().replace(second=0, microsecond=0)
-        
-        # مفتاح الذاكرة المؤقتة
-        cache_key = f"{client_id}:{current_minute.isoformat()}"
-        
-        # زيادة عدد الطلبات
-        if cache_key not in RateLimitMiddleware._request_cache:
-            RateLimitMiddleware._request_cache[cache_key] = 0
+        # الحد العام لكل IP في الدقيقة
+        limit = current_app.config.get('RATE_LIMIT_DEFAULT_PER_MINUTE', 60)
+        allowed, count = limiter.hit(f'ip:{client_id}', limit, 60)
+        if not allowed:
+            record_rate_limit_violation(client_id, request.endpoint, count)
+            return False
         
-        RateLimitMiddleware._request_cache[cache_key] += 1
+        # قاعدة المسار (RateLimitRule) من الذاكرة
+        rule = get_rate_limit_rules().match(request.path, request.method)
+        if rule is None:
+            return True
         
-        # التحقق من الحد
-        limit = current_app.config.get('RATE_LIMIT_DEFAULT_PER_MINUTE', 60)
+        from flask_login import current_user
+        if rule.bypass_roles and current_user.is_authenticated and current_user.role in rule.bypass_roles:
+            return True
         
-        if RateLimitMiddleware._request_cache[cache_key] > limit:
-            # تسجيل الانتهاك
-            violation = RateLimitViolation(
-                ip_address=client_id,
-                endpoint=request.endpoint,
-                request_count=RateLimitMiddleware._request_cache[cache_key],
-                action_taken='blocked'
-            )
-            db.session.add(violation)
-            db.session.commit()
-            
-            return False
+        for window_seconds, rule_limit in ((60, rule.requests_per_minute), (3600, rule.requests_per_hour)):
+            if not rule_limit:
+                continue
+            allowed, count = limiter.hit(f'rule:{rule.id}:{window_seconds}:{client_id}', rule_limit, window_seconds)
+            if not allowed:
+                record_rate_limit_violation(client_id, request.endpoint, count)
+                return False
         
         return True
 
@@ -116,23 +119,26 @@ class RateLimitMiddleware:
 class InputSanitizer:
     """تنظيف وتحقق من المدخلات"""
     
+    # أنماط السكريبتات الضارة - مترجمة مرة واحدة
+    DANGEROUS_PATTERNS = [
+        r'<script[^>]*>.*?</script>',
+        r'javascript:',
+        r'on\w+\s*=',
+        r'<iframe[^>]*>',
+        r'<embed[^>]*>',
+        r'<object[^>]*>',
+    ]
+    
+    # مرور مستقل لكل نمط وبالترتيب: حذف نمط قد يكشف نمطاً لاحقاً
+    # (مثل '<ifrjavascript:ame>')، فلا يصح دمجها في تعبير واحد
+    _patterns = tuple(re.compile(pattern, re.IGNORECASE | re.DOTALL) for pattern in DANGEROUS_PATTERNS)
+    
     @staticmethod
     def sanitize_input(data):
         """تنظيف المدخلات من الهجمات XSS"""
         if isinstance(data, str):
-            # إزالة السكريبتات الضارة
-            dangerous_patterns = [
-                r'<script[^>]*>.*?</script>',
-                r'javascript:',
-                r'on\w+\s*=',
-                r'<iframe[^>]*>',
-                r'<embed[^>]*>',
-                r'<object[^>]*>',
-            ]
-            
-            for pattern in dangerous_patterns:
-                data = re.sub(pattern, '', data, flags=re.IGNORECASE | re.DOTALL)
-            
+            for pattern in InputSanitizer._patterns:
+                data = pattern.sub('', data)
             return data
         elif isinstance(data, dict):
             return {key: InputSanitizer.sanitize_input(value) for key, value in data.items()}
@@ -161,14 +167,16 @@ class SQLInjectionProtection:
         'xp_', 'sp_'
     ]
     
+    # جميع الكلمات في تعبير واحد (الأطول أولاً) - مرور واحد على النص
+    _pattern = re.compile('|'.join(
+        re.escape(keyword) for keyword in sorted(DANGEROUS_KEYWORDS, key=len, reverse=True)
+    ))
+    
     @staticmethod
     def check_sql_injection(data):
         """فحص للعثور على محاولات SQL Injection"""
         if isinstance(data, str):
-            data_upper = data.upper()
-            for keyword in SQLInjectionProtection.DANGEROUS_KEYWORDS:
-                if keyword in data_upper:
-                    return True
+            return SQLInjectionProtection._pattern.search(data.upper()) is not None
         elif isinstance(data, dict):
             for value in data.values():
                 if SQLInjectionProtection.check_sql_injection(value):
@@ -177,6 +185,27 @@ class SQLInjectionProtection:
         return False
 
 
+class SanitizedRequest(Request):
+    """طلب يتم تنظيف بياناته فقط عند قراءة sanitized_data"""
+    
+    @cached_property
+    def sanitized_data(self):
+        started = time.perf_counter()
+        data = InputSanitizer.sanitize_input(self.form.to_dict())
+        _add_inspection_time(time.perf_counter() - started)
+        return data
+
+
+def _add_inspection_time(seconds):
+    """تجميع وقت فحص الطلب الحالي (بالمللي ثانية)"""
+    g.security_inspection_ms = g.get('security_inspection_ms', 0.0) + seconds * 1000
+
+
+def get_inspection_time_ms():
+    """وقت فحص الحقن والتنظيف في الطلب الحالي"""
+    return g.get('security_inspection_ms', 0.0)
+
+
 class AuditTrailMiddleware:
     """تسجيل مسار التدقيق الكامل"""
     
@@ -193,19 +222,21 @@ class AuditTrailMiddleware:
         try:
             from flask_login import current_user
             
-            # تسجيل الطلبات المهمة فقط
+            # تسجيل الطلبات المهمة فقط (يكتب لاحقاً بالدفعات من الخيط الخلفي)
             if request.method in ['POST', 'PUT', 'DELETE', 'PATCH']:
-                SecurityLog.log_action(
-                    user_id=current_user.id if current_user.is_authenticated else None,
-                    action='request',
-                    details={
+                get_audit_writer().enqueue({
+                    'user_id': current_user.id if current_user.is_authenticated else None,
+                    'action': 'request',
+                    'new_values': {
                         'method': request.method,
                         'endpoint': request.endpoint,
                         'path': request.path,
                     },
-                    ip_address=request.remote_addr,
-                    status='success'
-                )
+                    'ip_address': request.remote_addr,
+                    'user_agent': request.user_agent.string[:255],
+                    'status': 'success' if response.status_code < 400 else 'failed',
+                    'timestamp': datetime.utcnow(),
+                })
         except Exception as e:
             current_app.logger.error(f'Error logging request: {str(e)}')
         
@@ -255,6 +286,24 @@ class CSRFProtection:
 def init_security_middleware(app):
     """تهيئة middleware الأمان"""
     
+    # نسخة إعدادات الأمان في الذاكرة (السياسة، القواعد، عناوين IP، علامات الميزات)
+    init_security_config(app)
+    
+    # محدد معدل الطلبات (الخلفية حسب RATE_LIMIT_BACKEND)
+    init_rate_limiter(app)
+    
+    # تنظيف المدخلات عند الحاجة فقط (request.sanitized_data)
+    app.request_class = SanitizedRequest
+    
+    # كاتب سجل التدقيق (طابور + خيط خلفي)
+    init_audit_writer(app)
+    
+    # ذاكرة جلسات الأمان (SessionManager.validate_session)
+    init_session_cache(app)
+    
+    # ملخصات لوحة تحكم الأمان (تُحدّث مع كتابة السجلات)
+    init_security_rollups(app)
+    
     # تطبيق رؤوس الأمان
     @app.after_request
     def apply_security_headers(response):
@@ -270,18 +319,34 @@ def init_security_middleware(app):
     @app.before_request
     def check_injection_attacks():
         # فحص SQL Injection
-        if SQLInjectionProtection.check_sql_injection(request.args):
-            SecurityAlert.create_alert(
-                alert_type='suspicious_activity',
-                severity='high',
-                title='محاولة هجوم SQL Injection محتملة',
-                description=f'تم اكتشاف محاولة SQL Injection من {request.remote_addr}',
-                ip_address=request.remote_addr
-            )
-            abort(400)
+        if not request.args:
+            return
+        
+        started = time.perf_counter()
+        detected = SQLInjectionProtection.check_sql_injection(request.args)
+        _add_inspection_time(time.perf_counter() - started)
         
-        # تنظيف المدخلات
-        request.sanitized_data = InputSanitizer.sanitize_input(request.form.to_dict())
+        if detected:
+            try:
+                SecurityAlert.create_alert(
+                    alert_type='suspicious_activity',
+                    severity='high',
+                    title='محاولة هجوم SQL Injection محتملة',
+                    description=f'تم اكتشاف محاولة SQL Injection من {request.remote_addr}',
+                    ip_address=request.remote_addr
+                )
+            except Exception as e:
+                current_app.logger.error(f'Error creating security alert: {str(e)}')
+            abort(400)
+    
+    # وقت الفحص في رأس Server-Timing
+    if app.config.get('SECURITY_SERVER_TIMING', False):
+        @app.after_request
+        def add_inspection_timing(response):
+            response.headers.add(
+                'Server-Timing', f'security-inspection;dur={get_inspection_time_ms():.3f}'
+            )
+            return response
     
     # تسجيل سجل التدقيق
     @app.after_request
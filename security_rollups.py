@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+ملخصات لوحة تحكم الأمان
+Security Rollups - hourly/daily counters maintained as security logs are written
+
+لوحة تحكم الأمان كانت تنفذ COUNT و GROUP BY على security_logs و
+security_alerts في كل عرض. بدلاً من ذلك يتم الاحتفاظ بعدادات في جدول
+security_rollups بالمفتاح (الفترة، بداية الفترة، المصدر، النوع، الخطورة، الحالة):
+- سجلات الأمان: النوع = action، الحالة = status (success/failed)
+- التنبيهات: النوع = alert_type، الخطورة = severity، الحالة = open/acknowledged
+
+العدادات تُحدّث في نفس المعاملة التي تكتب السجل:
+- الكتابة عبر ORM (SecurityLog.log_action، create_alert، الإقرار بتنبيه):
+  مستمع after_flush على الجلسة
+- الكتابة بالدفعات من AuditWriter: apply_rollup_deltas في نفس الاتصال
+
+اللوحة تقرأ بضعة صفوف من الملخصات فقط، لذلك زمنها ثابت مهما كبر حجم السجلات.
+لإعادة بناء الملخصات من الجداول الأصلية: flask rebuild-security-rollups
+(تعتمد مع حذف السجلات القديمة على فهرسي security_logs.timestamp و
+security_alerts.created_at؛ على قاعدة قائمة ينشئهما add_performance_indexes.py)
+"""
+
+import click
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from flask import current_app
+from models import db, SecurityRollup
+
+SECURITY_LOGS_TABLE = 'security_logs'
+SECURITY_ALERTS_TABLE = 'security_alerts'
+
+
+def _buckets(timestamp):
+    """بداية الساعة وبداية اليوم للتوقيت"""
+    timestamp = timestamp or datetime.utcnow()
+    hour = timestamp.replace(minute=0, second=0, microsecond=0)
+    return (('hour', hour), ('day', hour.replace(hour=0)))
+
+
+def _alert_status(is_acknowledged):
+    return 'acknowledged' if is_acknowledged else 'open'
+
+
+def log_deltas(rows, deltas=None):
+    """عدادات سجلات الأمان (قواميس أو كائنات بها action/status/timestamp)"""
+    deltas = Counter() if deltas is None else deltas
+    for row in rows:
+        get = row.get if hasattr(row, 'get') else lambda key: getattr(row, key, None)
+        for period, bucket in _buckets(get('timestamp')):
+            deltas[(period, bucket, 'log', get('action') or '', '', get('status') or 'success')] += 1
+    return deltas
+
+
+def alert_deltas(alerts, deltas=None):
+    """عدادات التنبيهات الجديدة"""
+    deltas = Counter() if deltas is None else deltas
+    for alert in alerts:
+        for period, bucket in _buckets(alert.created_at):
+            deltas[(period, bucket, 'alert', alert.alert_type or '', alert.severity or 'low',
+                    _alert_status(alert.is_acknowledged))] += 1
+    return deltas
+
+
+def _acknowledgement_deltas(alert, deltas):
+    """نقل تنبيه من open إلى acknowledged (أو العكس) في فترة إنشائه"""
+    history = db.inspect(alert).attrs.is_acknowledged.history
+    if not history.has_changes():
+        return
+    old = bool(history.deleted[0]) if history.deleted else False
+    new = bool(alert.is_acknowledged)
+    if old == new:
+        return
+    for period, bucket in _buckets(alert.created_at):
+        base = (period, bucket, 'alert', alert.alert_type or '', alert.severity or 'low')
+        deltas[base + (_alert_status(old),)] -= 1
+        deltas[base + (_alert_status(new),)] += 1
+
+
+def apply_rollup_deltas(conn, deltas):
+    """إضافة العدادات إلى security_rollups داخل معاملة الاتصال الحالية"""
+    table = SecurityRollup.__table__
+    for key, count in deltas.items():
+        if not count:
+            continue
+        period, bucket, source, kind, severity, status = key
+        condition = (
+            (table.c.period == period) & (table.c.bucket == bucket) & (table.c.source == source) &
+            (table.c.kind == kind) & (table.c.severity == severity) & (table.c.status == status)
+        )
+        update = table.update().where(condition).values(count=table.c.count + count)
+        if conn.execute(update).rowcount:
+            continue
+        try:
+            with conn.begin_nested():
+                conn.execute(table.insert().values(
+                    period=period, bucket=bucket, source=source, kind=kind,
+                    severity=severity, status=status, count=count
+                ))
+        except IntegrityError:
+            # أنشأت عملية أخرى الصف في نفس اللحظة
+            conn.execute(update)
+
+
+# ---------------------- مستمعات الجلسة ----------------------
+
+@event.listens_for(Session, 'after_flush')
+def _rollup_after_flush(session, flush_context):
+    logs, alerts, deltas = [], [], Counter()
+    for obj in session.new:
+        table_name = getattr(obj, '__tablename__', None)
+        if table_name == SECURITY_LOGS_TABLE:
+            logs.append(obj)
+        elif table_name == SECURITY_ALERTS_TABLE:
+            alerts.append(obj)
+    for obj in session.dirty:
+        if getattr(obj, '__tablename__', None) == SECURITY_ALERTS_TABLE:
+            _acknowledgement_deltas(obj, deltas)
+    if not (logs or alerts or deltas):
+        return
+
+    log_deltas(logs, deltas)
+    alert_deltas(alerts, deltas)
+    # نقطة حفظ: فشل العدادات يتراجع عنها وحدها ولا يلغي كتابة السجل نفسه، لكن
+    # الملخصات تنحرف عن السجلات حتى flask rebuild-security-rollups
+    conn = session.connection()
+    try:
+        with conn.begin_nested():
+            apply_rollup_deltas(conn, deltas)
+    except Exception as e:
+        current_app.logger.error(
+            f'Error updating security rollups ({sum(deltas.values())} counts lost, '
+            f'run flask rebuild-security-rollups): {str(e)}'
+        )
+
+
+# ---------------------- القراءة ----------------------
+
+def _sum(source, period, since=None, **filters):
+    table = SecurityRollup.__table__
+    query = select(func.coalesce(func.sum(table.c.count), 0)).where(
+        table.c.source == source, table.c.period == period
+    )
+    if since is not None:
+        query = query.where(table.c.bucket >= since)
+    for column, value in filters.items():
+        query = query.where(table.c[column] == value)
+    return int(db.session.execute(query).scalar())
+
+
+def get_security_dashboard_stats(now=None):
+    """إحصائيات لوحة تحكم الأمان من الملخصات فقط"""
+    now = now or datetime.utcnow()
+    last_24_hours = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=23)
+    last_7_days = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=6)
+
+    table = SecurityRollup.__table__
+    alert_types = db.session.execute(
+        select(table.c.kind, func.sum(table.c.count)).where(
+            table.c.source == 'alert', table.c.period == 'day', table.c.bucket >= last_7_days
+        ).group_by(table.c.kind)
+    ).all()
+
+    return {
+        'logins': _sum('log', 'day', kind='login', status='success'),
+        'failed_logins_today': _sum('log', 'hour', last_24_hours, kind='login', status='failed'),
+        'alerts_today': _sum('alert', 'hour', last_24_hours),
+        'critical_alerts': _sum('alert', 'day', severity='critical', status='open'),
+        'alert_types': {kind: int(count) for kind, count in alert_types if count},
+    }
+
+
+# ---------------------- إعادة البناء ----------------------
+
+def rebuild_security_rollups(chunk_size=5000):
+    """إعادة حساب الملخصات بالكامل من security_logs و security_alerts"""
+    from security_services import SecurityAlert
+    from security_middleware import SecurityLog
+
+    logs = SecurityLog.__table__
+    alerts = SecurityAlert.__table__
+    deltas = Counter()
+    with db.engine.begin() as conn:
+        rows = conn.execution_options(yield_per=chunk_size).execute(
+            select(logs.c.action, logs.c.status, logs.c.timestamp)
+        ).mappings()
+        log_deltas(rows, deltas)
+
+        alert_deltas(conn.execution_options(yield_per=chunk_size).execute(
+            select(alerts.c.alert_type, alerts.c.severity, alerts.c.is_acknowledged, alerts.c.created_at)
+        ), deltas)
+
+        table = SecurityRollup.__table__
+        conn.execute(table.delete())
+        rows = [
+            dict(zip(('period', 'bucket', 'source', 'kind', 'severity', 'status'), key), count=count)
+            for key, count in deltas.items() if count
+        ]
+        if rows:
+            conn.execute(table.insert(), rows)
+    return len(rows)
+
+
+def init_security_rollups(app):
+    """تسجيل أمر إعادة بناء الملخصات"""
+
+    @app.cli.command('rebuild-security-rollups')
+    def rebuild_security_rollups_command():
+        """إعادة بناء ملخصات لوحة تحكم الأمان من السجلات"""
+        count = rebuild_security_rollups()
+        click.echo(f'تم إعادة بناء {count} صف من ملخصات الأمان')
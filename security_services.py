@@ -12,6 +12,9 @@ from flask import request, abort, current_app, session, jsonify
 from flask_login import current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import db, User
+from session_cache import SessionSnapshot, get_session_cache
+from identity_cache import TTLCache
+from security_config import get_security_config, invalidate_security_config
 import sys
 import os
 import importlib.util
@@ -47,12 +50,18 @@ class PasswordValidator:
     
     @staticmethod
     def get_policy():
-        """الحصول على سياسة كلمات المرور الحالية"""
-        policy = PasswordPolicy.query.first()
+        """الحصول على سياسة كلمات المرور الحالية (نسخة للقراءة فقط من الذاكرة)"""
+        return get_security_config().password_policy
+    
+    @staticmethod
+    def get_policy_for_update():
+        """صف سياسة كلمات المرور للتعديل (يُنشأ إذا لم يوجد)"""
+        # مثل SessionToken: النموذج خارج db المسجل في التطبيق فلا يعمل PasswordPolicy.query
+        policy = db.session.query(PasswordPolicy).order_by(PasswordPolicy.id).first()
         if not policy:
             policy = PasswordPolicy()
             db.session.add(policy)
-            db.session.commit()
+            db.session.flush()
         return policy
     
     @staticmethod
@@ -131,6 +140,9 @@ class PasswordValidator:
 class SessionManager:
     """مدير الجلسات"""
     
+    # نماذج security_enhanced مسجلة في نسخة SQLAlchemy منفصلة غير مهيأة مع
+    # التطبيق، لذلك تُستعلم عبر db.session بدلاً من SessionToken.query
+    
     @staticmethod
     def create_session(user_id, ip_address=None, user_agent=None, device_fingerprint=None):
         """إنشاء جلسة جديدة"""
@@ -139,11 +151,13 @@ class SessionManager:
         if user_agent is None:
             user_agent = request.user_agent.string
         
-        # إلغاء الجلسات القديمة
-        old_sessions = SessionToken.query.filter_by(user_id=user_id, is_active=True).all()
-        for old_session in old_sessions:
-            if (datetime.utcnow() - old_session.last_activity).seconds > 3600:  # أكثر من ساعة
-                old_session.is_active = False
+        # إلغاء الجلسات القديمة (أكثر من ساعة بدون نشاط) بعبارة UPDATE واحدة
+        db.session.query(SessionToken).filter(
+            SessionToken.user_id == user_id,
+            SessionToken.is_active == True,
+            SessionToken.last_activity < datetime.utcnow() - timedelta(hours=1)
+        ).update({SessionToken.is_active: False}, synchronize_session=False)
+        get_session_cache().invalidate(user_id=user_id)
         
         # إنشاء جلسة جديدة
         token = secrets.token_urlsafe(32)
@@ -165,14 +179,22 @@ class SessionManager:
     
     @staticmethod
     def validate_session(token_hash, ip_address=None):
-        """التحقق من صحة الجلسة"""
-        session_token = SessionToken.query.filter_by(token_hash=token_hash).first()
-        
-        if not session_token or not session_token.is_valid():
+        """التحقق من صحة الجلسة (من ذاكرة LRU - النشاط يكتب على دفعات)"""
+        cache = get_session_cache()
+        session_token = cache.get(token_hash)
+        if session_token is None:
+            row = db.session.query(SessionToken).filter_by(token_hash=token_hash).first()
+            if not row:
+                return None
+            session_token = SessionSnapshot(row)
+            cache.put(session_token)
+        
+        if not session_token.is_valid():
             return None
         
-        # التحقق من عنوان IP إذا كان مختلفاً
-        if ip_address and ip_address != session_token.ip_address:
+        # التحقق من عنوان IP إذا كان مختلفاً (تنبيه واحد لكل عنوان جديد)
+        if ip_address and ip_address != session_token.ip_address and ip_address not in session_token.alerted_ips:
+            session_token.alerted_ips.add(ip_address)
             # إنشاء تنبيه أمان
             alert = SecurityAlert(
                 user_id=session_token.user_id,
@@ -185,16 +207,16 @@ class SessionManager:
             db.session.add(alert)
             db.session.commit()
         
-        # تحديث آخر نشاط
-        session_token.last_activity = datetime.utcnow()
-        db.session.commit()
+        # تحديث آخر نشاط (في الذاكرة - يكتب عندما يصبح قديماً)
+        cache.touch(session_token)
         
         return session_token
     
     @staticmethod
     def revoke_session(token_hash):
         """إلغاء جلسة"""
-        session_token = SessionToken.query.filter_by(token_hash=token_hash).first()
+        get_session_cache().invalidate(token_hash=token_hash)
+        session_token = db.session.query(SessionToken).filter_by(token_hash=token_hash).first()
         if session_token:
             session_token.is_active = False
             session_token.revoked_at = datetime.utcnow()
@@ -205,12 +227,13 @@ class SessionManager:
     @staticmethod
     def revoke_all_sessions(user_id):
         """إلغاء جميع جلسات المستخدم"""
-        sessions = SessionToken.query.filter_by(user_id=user_id, is_active=True).all()
-        for session_token in sessions:
-            session_token.is_active = False
-            session_token.revoked_at = datetime.utcnow()
+        get_session_cache().invalidate(user_id=user_id)
+        revoked = db.session.query(SessionToken).filter_by(user_id=user_id, is_active=True).update({
+            SessionToken.is_active: False,
+            SessionToken.revoked_at: datetime.utcnow(),
+        }, synchronize_session=False)
         db.session.commit()
-        return len(sessions)
+        return revoked
 
 
 class SecurityAlertService:
@@ -269,21 +292,30 @@ class SecurityAlertService:
 class IPSecurityManager:
     """مدير أمان عناوين IP"""
     
+    # المدخلات التي كُتب لها last_used_at في هذه العملية خلال آخر LAST_USED_WRITE_INTERVAL
+    # ثانية (محدودة الحجم - المدخل المحذوف منها يُكتب مرة إضافية فقط)
+    LAST_USED_WRITE_INTERVAL = 3600
+    _last_used_writes = TTLCache(ttl=LAST_USED_WRITE_INTERVAL, capacity=4096)
+    
     @staticmethod
     def is_ip_whitelisted(user_id, ip_address, device_fingerprint=None):
-        """التحقق من أن عنوان IP موثوق"""
-        whitelist = IPWhitelist.query.filter_by(
-            user_id=user_id,
-            ip_address=ip_address,
-            is_active=True
-        ).first()
-        
-        if whitelist and whitelist.is_valid():
-            whitelist.last_used_at = datetime.utcnow()
-            db.session.commit()
-            return True
-        
-        return False
+        """التحقق من أن عنوان IP موثوق (شجرة CIDR من نسخة إعدادات الأمان)"""
+        entry = get_security_config().find_whitelist_entry(user_id, ip_address)
+        if entry is None:
+            return False
+        
+        # last_used_at يُكتب مرة كل LAST_USED_WRITE_INTERVAL ثانية على الأكثر
+        if IPSecurityManager._last_used_writes.get(entry.id) is None:
+            IPSecurityManager._last_used_writes.put(entry.id, True)
+            table = IPWhitelist.__table__
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(
+                        table.update().where(table.c.id == entry.id).values(last_used_at=datetime.utcnow())
+                    )
+            except Exception as e:
+                current_app.logger.warning(f'Error updating whitelist last_used_at: {str(e)}')
+        return True
     
     @staticmethod
     def add_to_whitelist(user_id, ip_address, device_name=None, device_fingerprint=None, expires_days=90):
@@ -297,6 +329,7 @@ class IPSecurityManager:
         )
         db.session.add(whitelist)
         db.session.commit()
+        invalidate_security_config()
         return whitelist
     
     @staticmethod
@@ -411,11 +444,13 @@ class RateLimiter:
     
     @staticmethod
     def check_rate_limit(endpoint, user_id=None, ip_address=None):
-        """التحقق من معدل الطلبات"""
+        """التحقق من معدل الطلبات (قواعد وعدادات من الذاكرة - بدون استعلامات)"""
+        from rate_limiter import get_rate_limiter, get_rate_limit_rules, record_rate_limit_violation
+        
         if ip_address is None:
             ip_address = request.remote_addr
         
-        rule = RateLimitRule.query.filter_by(endpoint=endpoint, is_enabled=True).first()
+        rule = get_rate_limit_rules().get(endpoint, request.method)
         if not rule:
             return True, None
         
@@ -423,27 +458,18 @@ class RateLimiter:
         if current_user.is_authenticated and current_user.role in rule.bypass_roles:
             return True, None
         
-        # حساب عدد الطلبات في آخر دقيقة
-        one_minute_ago = datetime.utcnow() - timedelta(minutes=1)
-        recent_requests = RateLimitViolation.query.filter(
-            RateLimitViolation.ip_address == ip_address,
-            RateLimitViolation.endpoint == endpoint,
-            RateLimitViolation.timestamp >= one_minute_ago
-        ).count()
-        
-        if recent_requests >= rule.requests_per_minute:
-            # تسجيل الانتهاك
-            violation = RateLimitViolation(
-                user_id=user_id,
-                ip_address=ip_address,
-                endpoint=endpoint,
-                request_count=recent_requests + 1,
-                action_taken='blocked'
+        # عدد الطلبات في آخر دقيقة / ساعة (نافذة منزلقة)
+        limiter = get_rate_limiter()
+        for window_seconds, limit in ((60, rule.requests_per_minute), (3600, rule.requests_per_hour)):
+            if not limit:
+                continue
+            allowed, request_count = limiter.hit(
+                f'endpoint:{endpoint}:{window_seconds}:{ip_address}', limit, window_seconds
             )
-            db.session.add(violation)
-            db.session.commit()
-            
-            return False, 'Rate limit exceeded'
+            if not allowed:
+                # تسجيل الانتهاك (يكتب ضمن دفعة بعد انتهاء الطلب)
+                record_rate_limit_violation(ip_address, endpoint, request_count, user_id=user_id)
+                return False, 'Rate limit exceeded'
         
         return True, None
 
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+ذاكرة جلسات الأمان المؤقتة
+Session Cache - LRU front cache for SessionToken lookups and buffered activity
+
+SessionManager.validate_session يُستدعى مع كل طلب مصادق. بدلاً من قراءة
+session_tokens وكتابة last_activity في كل مرة:
+- نسخة الجلسة (حسب token_hash) تُقرأ من ذاكرة LRU لمدة SESSION_CACHE_TTL ثانية
+- last_activity يُحفظ في الذاكرة ويُكتب فقط عندما يصبح أقدم من
+  SESSION_ACTIVITY_FLUSH_SECONDS، على دفعات (UPDATE واحد متعدد القيم) بعد
+  انتهاء الطلب
+- تنبيه تغيير IP يُنشأ مرة واحدة لكل (جلسة، IP) في العملية
+
+إلغاء الجلسات (revoke_session / revoke_all_sessions) يحذفها من الذاكرة فوراً
+في العملية الحالية؛ العمليات الأخرى تلتقط الإلغاء بعد انتهاء مدة TTL.
+"""
+
+import time
+import atexit
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy import bindparam
+from flask import current_app
+
+
+class SessionSnapshot:
+    """نسخة خفيفة من صف SessionToken"""
+
+    __slots__ = (
+        'id', 'user_id', 'token_hash', 'ip_address', 'expires_at',
+        'is_active', 'revoked_at', 'last_activity', 'persisted_activity', 'alerted_ips'
+    )
+
+    def __init__(self, session_token):
+        self.id = session_token.id
+        self.user_id = session_token.user_id
+        self.token_hash = session_token.token_hash
+        self.ip_address = session_token.ip_address
+        self.expires_at = session_token.expires_at
+        self.is_active = session_token.is_active
+        self.revoked_at = session_token.revoked_at
+        self.last_activity = session_token.last_activity
+        self.persisted_activity = session_token.last_activity
+        self.alerted_ips = set()
+
+    def is_valid(self):
+        """التحقق من صحة الرمز"""
+        return (
+            self.is_active and
+            self.expires_at > datetime.utcnow() and
+            self.revoked_at is None
+        )
+
+
+class SessionCache:
+    """ذاكرة LRU للجلسات + مخزن مؤقت لأوقات النشاط"""
+
+    def __init__(self, capacity=10000, ttl=30, activity_flush_seconds=60):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.activity_flush_seconds = activity_flush_seconds
+        self._entries = OrderedDict()  # token_hash -> (expires_at, SessionSnapshot)
+        self._pending = {}  # session id -> last_activity
+        self._lock = threading.Lock()
+        self.app = None
+        self.exit_hook_registered = False
+        self.hits = 0
+        self.misses = 0
+        self.activity_writes = 0
+        self.activity_batches = 0
+
+    # ---------------------- LRU ----------------------
+
+    def get(self, token_hash):
+        """البحث عن نسخة جلسة غير منتهية الصلاحية"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token_hash)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(token_hash)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[token_hash]
+            self.misses += 1
+            return None
+
+    def put(self, snapshot):
+        """تخزين نسخة جلسة"""
+        with self._lock:
+            self._entries[snapshot.token_hash] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(snapshot.token_hash)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token_hash=None, user_id=None):
+        """حذف جلسة معينة أو جميع جلسات مستخدم"""
+        with self._lock:
+            if token_hash is not None:
+                self._entries.pop(token_hash, None)
+            if user_id is not None:
+                for key in [key for key, (_, snapshot) in self._entries.items() if snapshot.user_id == user_id]:
+                    del self._entries[key]
+
+    # ---------------------- النشاط ----------------------
+
+    def touch(self, snapshot, now=None):
+        """تحديث آخر نشاط في الذاكرة وجدولته للكتابة إذا أصبح قديماً"""
+        now = now or datetime.utcnow()
+        snapshot.last_activity = now
+        persisted = snapshot.persisted_activity
+        if persisted is None or (now - persisted).total_seconds() >= self.activity_flush_seconds:
+            with self._lock:
+                self._pending[snapshot.id] = now
+            snapshot.persisted_activity = now
+
+    def has_pending(self):
+        return bool(self._pending)
+
+    def flush_activity(self):
+        """كتابة أوقات النشاط المعلقة بعبارة UPDATE واحدة متعددة القيم"""
+        from models import db
+        from security_services import SessionToken
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        table = SessionToken.__table__
+        statement = table.update().where(table.c.id == bindparam('session_id')).values(
+            last_activity=bindparam('activity')
+        )
+        rows = [{'session_id': session_id, 'activity': activity} for session_id, activity in pending.items()]
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(statement, rows)
+            self.activity_writes += len(rows)
+            self.activity_batches += 1
+        except Exception as e:
+            current_app.logger.error(f'Error writing session activity: {str(e)}')
+        return len(rows)
+
+    def flush_on_exit(self):
+        """كتابة أوقات النشاط المتبقية عند إيقاف العملية"""
+        if self.app is None or not self._pending:
+            return
+        with self.app.app_context():
+            self.flush_activity()
+
+    def stats(self):
+        """عدادات الذاكرة"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'capacity': self.capacity,
+                'ttl': self.ttl,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'pending_activity': len(self._pending),
+                'activity_writes': self.activity_writes,
+                'activity_batches': self.activity_batches,
+            }
+
+
+_session_cache = SessionCache()
+
+
+def get_session_cache():
+    """ذاكرة الجلسات للعملية الحالية"""
+    return _session_cache
+
+
+def get_session_cache_stats():
+    """عدادات ذاكرة الجلسات"""
+    return _session_cache.stats()
+
+
+def init_session_cache(app):
+    """تهيئة ذاكرة الجلسات من إعدادات التطبيق"""
+    _session_cache.capacity = app.config.get('SESSION_CACHE_SIZE', 10000)
+    _session_cache.ttl = app.config.get('SESSION_CACHE_TTL', 30)
+    _session_cache.activity_flush_seconds = app.config.get('SESSION_ACTIVITY_FLUSH_SECONDS', 60)
+    _session_cache.app = app
+
+    @app.teardown_request
+    def flush_session_activity(exc=None):
+        if _session_cache.has_pending():
+            _session_cache.flush_activity()
+
+    if not _session_cache.exit_hook_registered:
+        atexit.register(_session_cache.flush_on_exit)
+        _session_cache.exit_hook_registered = True
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+ذاكرة نسخة مع ملف إشارة بين العمليات
+Signalled Snapshot Cache - one in-memory snapshot per worker, reloaded when a shared signal file changes
+
+أساس مشترك لذاكرة إعدادات المؤسسة (org_settings_cache) وإعدادات الأمان
+(security_config): كل عملية تحتفظ بنسخة واحدة، و refresh() يعيد التحميل في
+العملية الحالية ويحدّث ملف الإشارة في مجلد instance بشكل ذري. باقي العمليات
+تقرأ قيمة الملف (بدون قاعدة بيانات) مرة كل check_interval ثانية وتعيد
+التحميل عند تغيرها.
+
+الصنف الفرعي يعرّف _build() التي تعيد النسخة الجديدة، و signal_label لرسائل السجل.
+"""
+
+import os
+import time
+import threading
+from flask import current_app
+
+
+class SignalledSnapshotCache:
+    """نسخة واحدة لكل عملية تُعاد عند تغير ملف الإشارة"""
+
+    signal_label = 'الإعدادات'
+
+    def __init__(self, signal_path, check_interval=2.0):
+        self.signal_path = signal_path
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._loaded = False
+        self._signal_value = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.reads = 0
+
+    def _build(self):
+        """النسخة الجديدة من قاعدة البيانات (يعرّفها الصنف الفرعي)"""
+        raise NotImplementedError
+
+    def _read_signal(self):
+        """قيمة ملف الإشارة (None إذا لم يوجد)"""
+        try:
+            with open(self.signal_path) as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _load(self):
+        # قيمة الإشارة تُقرأ قبل البناء: تعديل أثناء البناء يؤدي لإعادة تحميل لاحقة
+        signal_value = self._read_signal()
+        snapshot = self._build()
+        # استبدال المرجع دفعة واحدة
+        self._snapshot = snapshot
+        self._signal_value = signal_value
+        self._loaded = True
+        self.loads += 1
+
+    def get(self):
+        """النسخة الحالية (تُبنى عند أول قراءة أو عند تغير ملف الإشارة)"""
+        now = time.monotonic()
+        with self._lock:
+            self.reads += 1
+            if self._loaded and now >= self._next_check:
+                self._next_check = now + self.check_interval
+                if self._read_signal() != self._signal_value:
+                    self._loaded = False
+            if not self._loaded:
+                self._load()
+            return self._snapshot
+
+    def refresh(self):
+        """إعادة التحميل في هذه العملية وإعلام باقي العمليات"""
+        with self._lock:
+            self._touch_signal()
+            self._load()
+
+    def _touch_signal(self):
+        """تحديث ملف الإشارة بشكل ذري"""
+        try:
+            os.makedirs(os.path.dirname(self.signal_path), exist_ok=True)
+            tmp_path = f'{self.signal_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(f'{time.time_ns()}-{os.getpid()}')
+            os.replace(tmp_path, self.signal_path)
+        except OSError as e:
+            current_app.logger.warning(f'تعذر تحديث إشارة {self.signal_label}: {e}')
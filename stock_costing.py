@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+تكلفة المخزون التراكمية
+Stock Costing - incremental weighted-average or FIFO cost per item and a maintained stock-value total
+
+بدلاً من ضرب الكمية في Item.unit_price (سعر واحد قابل للتعديل) لكل صنف عند كل
+عرض، تُحدث قيمة الرصيد بالتكلفة مع كل حركة مخزون داخل معاملتها (stock_ledger):
+- items.stock_value: قيمة رصيد الصنف بالتكلفة
+- stock_value_totals: إجمالي القيمة لكل مركز، فقيمة المخزون صف واحد لكل مركز
+
+طريقة التكلفة (INVENTORY_COSTING_METHOD):
+- weighted_average: الاستلام يضيف الكمية × التكلفة، والصرف يخصم بمتوسط
+  stock_value / الكمية قبل الصرف - O(1)
+- fifo: كل استلام طبقة في item_cost_layers، والصرف يستهلك الطبقات المفتوحة
+  من الأقدم؛ كل طبقة تُغلق مرة واحدة فقط فالتكلفة O(1) مطفأة
+
+إجماليات المراكز تُحدث بعد جميع أصناف الحركة ومرتبة حسب المركز، فترتيب
+الأقفال ثابت (الأصناف ثم الإجماليات) في جميع المعاملات.
+
+سكريبت add_performance_columns.py يبني القيم من الأرصدة الحالية عند إضافة
+العمود؛ وبعد تغيير الطريقة:
+    flask stock-costing --rebuild
+مع تقسيم المراكز (center_shards) يُقسم stock_value_totals مع items: إجمالي
+المركز في قاعدته ويُحدث في معاملة الحركة نفسها (بدون كتابة في القاعدة
+المركزية)، وقيمة المؤسس مجموع المراكز عبر federated_map. قواعد المراكز
+الموجودة قبل ذلك تُبنى إجمالياتها بـ --rebuild (for_each_center).
+"""
+
+import click
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from models import db, Item, ItemCostLayer, StockValueTotal
+from tenant_scope import get_tenant_center_id
+from center_shards import for_each_center, federated_map, get_shard_center_id, get_shard_router, using_center
+
+COSTING_METHODS = ('weighted_average', 'fifo')
+
+# هامش أخطاء الفاصلة العائمة (مثل stock_ledger)
+_EPSILON = 1e-9
+
+# عدد الطبقات المقروءة في كل دورة استهلاك
+_LAYER_FETCH = 16
+
+
+def costing_method():
+    method = current_app.config.get('INVENTORY_COSTING_METHOD', 'weighted_average')
+    if method not in COSTING_METHODS:
+        raise ValueError(f'Unknown inventory costing method: {method}')
+    return method
+
+
+def _consume_layers(item_id, quantity, fallback_cost):
+    """استهلاك quantity من الطبقات المفتوحة الأقدم - يعيد التكلفة"""
+    layers = ItemCostLayer.__table__
+    remaining = quantity
+    cost = 0.0
+    while remaining > _EPSILON:
+        rows = db.session.execute(
+            select(layers.c.id, layers.c.unit_cost, layers.c.remaining_quantity)
+            .where(layers.c.item_id == item_id, layers.c.is_open.is_(True))
+            .order_by(layers.c.id).limit(_LAYER_FETCH)
+        ).all()
+        if not rows:
+            break
+        for layer_id, unit_cost, available in rows:
+            take = min(remaining, available)
+            left = available - take
+            db.session.execute(
+                update(layers).where(layers.c.id == layer_id)
+                .values(remaining_quantity=left, is_open=left > _EPSILON)
+            )
+            cost += take * unit_cost
+            remaining -= take
+            if remaining <= _EPSILON:
+                break
+    # رصيد بدون طبقات (قبل تفعيل FIFO أو رصيد سالب مسموح) يُقيّم بالتكلفة الاحتياطية
+    if remaining > _EPSILON:
+        cost += remaining * fallback_cost
+    return cost
+
+
+def record_stock_cost(item_id, delta, unit_cost=None):
+    """
+    تحديث قيمة رصيد الصنف بعد تطبيق delta على الكمية (نفس المعاملة)
+
+    unit_cost: تكلفة وحدة الاستلام (افتراضياً Item.unit_price)
+    يعيد (تغير القيمة، مركز الصنف) - سالب للصرف
+    """
+    if not delta:
+        return 0, None
+    items = Item.__table__
+    row = db.session.execute(
+        select(items.c.quantity_in_stock, items.c.stock_value, items.c.unit_price, items.c.center_id)
+        .where(items.c.id == item_id)
+    ).one()
+    quantity_after = row.quantity_in_stock or 0
+    value_before = row.stock_value or 0
+    method = costing_method()
+
+    if delta > 0:
+        cost = unit_cost if unit_cost is not None else (row.unit_price or 0)
+        value_change = delta * cost
+        if method == 'fifo':
+            db.session.execute(insert(ItemCostLayer.__table__).values(
+                item_id=item_id, unit_cost=cost, original_quantity=delta, remaining_quantity=delta,
+                is_open=True, received_at=datetime.utcnow(),
+            ))
+    else:
+        quantity = -delta
+        quantity_before = quantity_after + quantity
+        # رصيد بدون قيمة (قاعدة قديمة قبل بناء القيم) يُقيّم بسعر الوحدة
+        if quantity_before > _EPSILON and value_before > _EPSILON:
+            average = value_before / quantity_before
+        else:
+            average = row.unit_price or 0
+        if method == 'fifo':
+            value_change = -_consume_layers(item_id, quantity, average)
+        else:
+            value_change = -quantity * average
+        # صرف كامل الرصيد يصفّر القيمة بدقة (بدون بقايا تقريب)
+        if abs(quantity_after) <= _EPSILON:
+            value_change = -value_before
+
+    if value_change:
+        db.session.execute(
+            update(items).where(items.c.id == item_id)
+            .values(stock_value=func.coalesce(items.c.stock_value, 0) + value_change)
+        )
+    return value_change, row.center_id
+
+
+def add_to_stock_value_totals(changes):
+    """إضافة {center_id: تغير القيمة} إلى إجماليات المراكز (مرتبة حسب المركز)"""
+    table = StockValueTotal.__table__
+    for center_key, value_change in sorted(((center_id or '', change) for center_id, change in changes.items())):
+        if not value_change:
+            continue
+        condition = table.c.center_key == center_key
+        values = {'total_value': table.c.total_value + value_change, 'updated_at': datetime.utcnow()}
+        if db.session.execute(update(table).where(condition).values(**values)).rowcount:
+            continue
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(table).values(
+                    center_key=center_key, total_value=value_change, updated_at=datetime.utcnow()
+                ))
+        except IntegrityError:
+            # معاملة أخرى أنشأت صف المركز للتو
+            db.session.execute(update(table).where(condition).values(**values))
+
+
+def _stock_value_total(center_key=None):
+    table = StockValueTotal.__table__
+    statement = select(func.sum(table.c.total_value))
+    if center_key is not None:
+        statement = statement.where(table.c.center_key == center_key)
+    return db.session.execute(statement).scalar() or 0
+
+
+def get_stock_value(center_id=None):
+    """قيمة المخزون بالتكلفة - مركز واحد (افتراضياً نطاق الطلب) أو مجموع المراكز"""
+    center_id = center_id or get_tenant_center_id()
+    if get_shard_router() is None:
+        return _stock_value_total(center_id)
+    if center_id is not None:
+        with using_center(center_id):
+            return _stock_value_total(center_id)
+    # المؤسس: إجمالي كل قاعدة مركز + الأصناف بدون مركز في القاعدة المركزية
+    centers = db.metadata.tables['vocational_centers']
+    center_ids = db.session.execute(select(centers.c.id)).scalars().all()
+    with using_center(None):
+        total = _stock_value_total('')
+    return total + sum(federated_map(_stock_value_total, center_ids).values())
+
+
+def rebuild_stock_costing():
+    """
+    إعادة بناء القيم من الأرصدة الحالية بسعر الوحدة: stock_value لكل صنف،
+    طبقة افتتاحية واحدة لكل صنف (FIFO)، وإجماليات المراكز - يعيد عدد الأصناف
+    """
+    items = Item.__table__
+    quantity = func.coalesce(items.c.quantity_in_stock, 0)
+    db.session.execute(update(items).values(stock_value=quantity * func.coalesce(items.c.unit_price, 0)))
+
+    layers = ItemCostLayer.__table__
+    db.session.execute(delete(layers))
+    now = datetime.utcnow()
+    stocked = db.session.execute(
+        select(items.c.id, items.c.quantity_in_stock, items.c.unit_price).where(items.c.quantity_in_stock > 0)
+    ).all()
+    if costing_method() == 'fifo' and stocked:
+        db.session.execute(insert(layers), [
+            {'item_id': item_id, 'unit_cost': unit_price or 0, 'original_quantity': quantity_in_stock,
+             'remaining_quantity': quantity_in_stock, 'is_open': True, 'received_at': now}
+            for item_id, quantity_in_stock, unit_price in stocked
+        ])
+
+    # داخل قاعدة مركز تُستبدل إجماليات ذلك المركز فقط
+    totals = StockValueTotal.__table__
+    shard_center_id = get_shard_center_id()
+    if shard_center_id is None:
+        db.session.execute(delete(totals))
+    else:
+        db.session.execute(delete(totals).where(totals.c.center_key == shard_center_id))
+    rows = db.session.execute(
+        select(func.coalesce(items.c.center_id, ''), func.sum(items.c.stock_value)).group_by(items.c.center_id)
+    ).all()
+    if rows:
+        db.session.execute(insert(totals), [
+            {'center_key': center_key, 'total_value': total or 0, 'updated_at': now} for center_key, total in rows
+        ])
+    return len(stocked)
+
+
+def init_stock_costing(app):
+    """تسجيل أمر إعادة بناء التكلفة"""
+
+    @app.cli.command('stock-costing')
+    @click.option('--rebuild', is_flag=True, help='إعادة بناء القيم والطبقات من الأرصدة الحالية')
+    def stock_costing_command(rebuild):
+        """عرض قيمة المخزون بالتكلفة أو إعادة بنائها"""
+        if rebuild:
+            count = sum(for_each_center(rebuild_stock_costing).values())
+            click.echo(f'{costing_method()}: {count} صنف برصيد')
+        click.echo(f'قيمة المخزون: {get_stock_value():.2f}')
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+حركات المخزون الذرية
+Stock Ledger - atomic, contention-safe updates of Item.quantity_in_stock
+
+بدلاً من القراءة ثم التعديل في Python (item.quantity_in_stock -= qty) الذي
+يفقد التحديثات عند تزامن الطلبات ويسمح بالرصيد السالب، تُطبق كل حركة بعبارة
+UPDATE واحدة مشروطة:
+    UPDATE items SET quantity_in_stock = quantity_in_stock + :delta,
+                     stock_version = stock_version + 1
+    WHERE id = :id AND quantity_in_stock + :delta >= 0 [AND stock_version = :v]
+
+- الحركات متعددة المواد تُجمع حسب المادة وتُطبق مرتبة حسب المعرف داخل
+  معاملة الجلسة الحالية، فتُقفل الصفوف بنفس الترتيب دائماً (بدون deadlock)
+- قيمة الرصيد بالتكلفة تُحدث مع كل حركة (stock_costing)، ثم إجماليات
+  المراكز بعد جميع المواد
+- المواد المعدلة تُسجل لتقييم الإنذارات عند تثبيت المعاملة (inventory_alerts)
+- عدم كفاية الرصيد: InsufficientStockError (خطأ في الطلب نفسه)
+- تعارض الإصدار أو deadlock / انتهاء مهلة القفل: StockConflictError
+  (retriable = True) - أعد المحاولة بـ retry_stock_conflicts
+
+المستدعي مسؤول عن commit أو rollback للمعاملة.
+"""
+
+import time
+from collections import OrderedDict
+from sqlalchemy import case, func, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.util import identity_key
+from models import db, Item
+from stock_costing import add_to_stock_value_totals, record_stock_cost
+from inventory_alerts import mark_items_changed
+
+# هامش أخطاء الفاصلة العائمة عند مقارنة الرصيد بالصفر
+STOCK_EPSILON = 1e-9
+
+# اتجاه كل نوع حركة في الرصيد (التحويل والتسوية لا يغيران رصيد الصنف)
+STOCK_DIRECTION = {'purchase': 1, 'return': 1, 'issue': -1}
+
+# رموز deadlock وانتهاء مهلة القفل (MySQL) ورسائل SQLite المكافئة
+_LOCK_ERROR_CODES = (1213, 1205)
+_LOCK_ERROR_MESSAGES = ('deadlock', 'database is locked', 'lock wait timeout')
+
+
+class StockError(Exception):
+    """خطأ في حركة مخزون"""
+    retriable = False
+
+    def __init__(self, message, item_id=None):
+        super().__init__(message)
+        self.item_id = item_id
+
+
+class InsufficientStockError(StockError):
+    """الرصيد لا يكفي للحركة المطلوبة"""
+
+    def __init__(self, item_id, available, requested):
+        super().__init__(f'الكمية الموجودة ({available}) أقل من المطلوبة ({requested})', item_id)
+        self.available = available
+        self.requested = requested
+
+
+class StockConflictError(StockError):
+    """تعارض مع حركة متزامنة - يمكن إعادة المحاولة"""
+    retriable = True
+
+
+def signed_quantity(transactions):
+    """عبارة الكمية بإشارتها حسب نوع الحركة - لجدول transactions"""
+    direction = case(
+        *[(transactions.c.transaction_type == name, sign) for name, sign in STOCK_DIRECTION.items()],
+        else_=0,
+    )
+    return direction * transactions.c.quantity
+
+
+def _aggregate(movements):
+    """جمع الحركات حسب المادة مرتبة حسب المعرف (ترتيب قفل ثابت)"""
+    deltas = {}
+    for item_id, delta in movements:
+        deltas[item_id] = deltas.get(item_id, 0) + delta
+    return OrderedDict(sorted(deltas.items()))
+
+
+def _is_lock_error(error):
+    code = getattr(getattr(error, 'orig', None), 'args', (None,))[0]
+    if code in _LOCK_ERROR_CODES:
+        return True
+    message = str(error).lower()
+    return any(text in message for text in _LOCK_ERROR_MESSAGES)
+
+
+def _refresh_loaded_item(item_id):
+    """إلغاء القيم القديمة لكائن المادة المحمل في الجلسة"""
+    item = db.session.identity_map.get(identity_key(Item, item_id))
+    if item is not None:
+        db.session.expire(item, ['quantity_in_stock', 'stock_version', 'stock_value'])
+
+
+def apply_stock_movements(movements, expected_versions=None, allow_negative=False, unit_costs=None):
+    """
+    تطبيق حركات مخزون [(item_id, delta), ...] ذرياً في المعاملة الحالية
+
+    expected_versions: {item_id: stock_version} اختياري للقفل المتفائل
+    (مثلاً الإصدار الذي رآه المستخدم في النموذج)
+    unit_costs: {item_id: تكلفة الوحدة} للاستلام (افتراضياً سعر الوحدة للمادة)
+    يعيد {item_id: (صافي الكمية، تغير القيمة بالتكلفة)} للمواد المعدلة
+    """
+    table = Item.__table__
+    expected_versions = expected_versions or {}
+    unit_costs = unit_costs or {}
+    applied = OrderedDict()
+    value_changes = {}
+
+    for item_id, delta in _aggregate(movements).items():
+        quantity = func.coalesce(table.c.quantity_in_stock, 0)
+        statement = update(table).where(table.c.id == item_id).values(
+            quantity_in_stock=quantity + delta,
+            stock_version=func.coalesce(table.c.stock_version, 0) + 1,
+        )
+        if delta < 0 and not allow_negative:
+            statement = statement.where(quantity + delta >= -STOCK_EPSILON)
+        if item_id in expected_versions:
+            statement = statement.where(table.c.stock_version == expected_versions[item_id])
+
+        try:
+            updated = db.session.execute(statement).rowcount
+        except OperationalError as e:
+            if _is_lock_error(e):
+                raise StockConflictError(f'تعارض قفل على المادة {item_id}', item_id) from e
+            raise
+
+        if not updated:
+            current = db.session.execute(
+                table.select().with_only_columns(table.c.quantity_in_stock, table.c.stock_version)
+                .where(table.c.id == item_id)
+            ).first()
+            if current is None:
+                raise StockError(f'المادة {item_id} غير موجودة', item_id)
+            if item_id in expected_versions and current.stock_version != expected_versions[item_id]:
+                raise StockConflictError(f'تم تعديل رصيد المادة {item_id} من طلب آخر', item_id)
+            raise InsufficientStockError(item_id, current.quantity_in_stock or 0, -delta)
+
+        value_change, center_id = record_stock_cost(item_id, delta, unit_costs.get(item_id))
+        value_changes[center_id] = value_changes.get(center_id, 0) + value_change
+        applied[item_id] = (delta, value_change)
+        _refresh_loaded_item(item_id)
+
+    add_to_stock_value_totals(value_changes)
+    # تقييم الإنذارات لهذه المواد فقط عند تثبيت المعاملة
+    mark_items_changed(applied, issued=[item_id for item_id, (delta, _) in applied.items() if delta < 0])
+    return applied
+
+
+def adjust_stock(item_id, delta, expected_version=None, allow_negative=False, unit_cost=None):
+    """تطبيق حركة مادة واحدة - يعيد تغير قيمة رصيدها بالتكلفة"""
+    expected = {item_id: expected_version} if expected_version is not None else None
+    unit_costs = {item_id: unit_cost} if unit_cost is not None else None
+    return apply_stock_movements([(item_id, delta)], expected, allow_negative, unit_costs)[item_id][1]
+
+
+def retry_stock_conflicts(func, attempts=3, backoff_seconds=0.05):
+    """تنفيذ func مع rollback وإعادة المحاولة عند StockConflictError"""
+    for attempt in range(1, attempts + 1):
+        try:
+            return func()
+        except StockConflictError:
+            db.session.rollback()
+            if attempt == attempts:
+                raise
+            time.sleep(backoff_seconds * attempt)
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+لقطات المخزون في نقطة زمنية
+Stock Snapshots - period-close balances plus delta replay for any historical date
+
+بدلاً من إعادة تشغيل جدول الحركات بالكامل لمعرفة رصيد تاريخ سابق، يُكتب عند
+إقفال كل فترة رصيد كل صنف في نهاية يوم الإقفال (stock_snapshots مع رأس في
+stock_snapshot_periods)، ثم يُجاب عن أي تاريخ من أقرب لقطة سابقة مع حركات ما
+بعدها فقط - استعلام مجمع واحد مهما طال التاريخ:
+    رصيد(T) = لقطة(D) + مجموع الحركات في (نهاية D، T]
+بدون لقطة سابقة يُحسب بالرجوع من الرصيد الحالي:
+    رصيد(T) = الرصيد الحالي - مجموع الحركات بعد T
+
+- اللقطة نفسها تُحسب بالرجوع من الرصيد الحالي، فيمكن إقفال الفترة بعد
+  نهايتها (مثلاً ليلة 1 من الشهر التالي)
+- الأصناف برصيد صفري لا تُكتب (الغائب في اللقطة = صفر)
+- لقطات المستودعات (اختيارية) تسجل warehouse_inventory كما هو عند الإقفال؛
+  الحركات لا تحمل مستودعاً فلا يُعاد تشغيلها على مستوى المستودع
+- اللقطة إقفال: تعديل حركة قديمة بعدها (edit_transaction) لا يظهر إلا بإعادة
+  كتابة لقطة ذلك التاريخ
+- مع تقسيم المراكز (center_shards) تُكتب أرصدة كل مركز في قاعدته
+  (for_each_center)، ثم رأس الفترة في القاعدة المركزية بعد جميع المراكز
+
+    flask stock-snapshot [--date 2026-03-31] [--warehouses]
+"""
+
+import click
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import delete, func, insert, select
+from models import db, Item, Transaction, WarehouseInventory, StockSnapshot, StockSnapshotPeriod
+from stock_ledger import STOCK_DIRECTION, signed_quantity
+from tenant_scope import get_tenant_center_id
+from center_shards import for_each_center
+
+
+def end_of_day(day):
+    return datetime.combine(day, time.max)
+
+
+def _as_datetime(when):
+    """التاريخ المجرد يعني نهاية ذلك اليوم"""
+    if isinstance(when, date) and not isinstance(when, datetime):
+        return end_of_day(when)
+    return when
+
+
+def _latest_closed_day(when):
+    """آخر يوم تنتهي نهايته قبل when أو عندها"""
+    return when.date() if when >= end_of_day(when.date()) else when.date() - timedelta(days=1)
+
+
+def _movement_sums(after=None, until=None, center_id=None):
+    """{item_id: صافي الحركات} في (after، until]"""
+    transactions = Transaction.__table__
+    statement = (
+        select(transactions.c.item_id, func.sum(signed_quantity(transactions)))
+        .where(transactions.c.transaction_type.in_(list(STOCK_DIRECTION)))
+        .group_by(transactions.c.item_id)
+    )
+    if after is not None:
+        statement = statement.where(transactions.c.transaction_date > after)
+    if until is not None:
+        statement = statement.where(transactions.c.transaction_date <= until)
+    if center_id is not None:
+        items = Item.__table__
+        statement = statement.where(
+            transactions.c.item_id.in_(select(items.c.id).where(items.c.center_id == center_id))
+        )
+    return {item_id: total or 0 for item_id, total in db.session.execute(statement)}
+
+
+def _current_balances(center_id=None):
+    """{item_id: (الرصيد الحالي، مركز الصنف، سعر الوحدة)}"""
+    items = Item.__table__
+    statement = select(items.c.id, items.c.quantity_in_stock, items.c.center_id, items.c.unit_price)
+    if center_id is not None:
+        statement = statement.where(items.c.center_id == center_id)
+    return {row[0]: (row[1] or 0, row[2], row[3]) for row in db.session.execute(statement)}
+
+
+def nearest_snapshot_date(when):
+    """آخر يوم إقفال تنتهي لقطته قبل when أو عنده"""
+    periods = StockSnapshotPeriod.__table__
+    return db.session.execute(
+        select(func.max(periods.c.snapshot_date)).where(periods.c.snapshot_date <= _latest_closed_day(when))
+    ).scalar()
+
+
+def stock_as_of(when, center_id=None):
+    """
+    رصيد كل صنف في اللحظة when - {item_id: الكمية}
+
+    center_id افتراضياً مركز نطاق الطلب الحالي (None للمؤسس = جميع المراكز)
+    """
+    when = _as_datetime(when)
+    center_id = center_id or get_tenant_center_id()
+
+    if when >= datetime.utcnow():
+        return {item_id: quantity for item_id, (quantity, _, _) in _current_balances(center_id).items()}
+
+    snapshot_date = nearest_snapshot_date(when)
+    if snapshot_date is None:
+        balances = {item_id: quantity for item_id, (quantity, _, _) in _current_balances(center_id).items()}
+        for item_id, total in _movement_sums(after=when, center_id=center_id).items():
+            if item_id in balances:
+                balances[item_id] -= total
+        return balances
+
+    snapshots = StockSnapshot.__table__
+    statement = select(snapshots.c.item_id, snapshots.c.quantity).where(
+        snapshots.c.snapshot_date == snapshot_date, snapshots.c.warehouse_id.is_(None)
+    )
+    if center_id is not None:
+        statement = statement.where(snapshots.c.center_id == center_id)
+    balances = dict(db.session.execute(statement).all())
+    for item_id, total in _movement_sums(end_of_day(snapshot_date), when, center_id).items():
+        balances[item_id] = balances.get(item_id, 0) + total
+    return balances
+
+
+def stock_value_as_of(when, center_id=None):
+    """قيمة المخزون في اللحظة when بسعر الوحدة الحالي - (إجمالي القيمة، {item_id: الكمية})"""
+    center_id = center_id or get_tenant_center_id()
+    balances = stock_as_of(when, center_id)
+    items = Item.__table__
+    statement = select(items.c.id, items.c.unit_price)
+    if center_id is not None:
+        statement = statement.where(items.c.center_id == center_id)
+    prices = dict(db.session.execute(statement).all())
+    total = sum(quantity * (prices.get(item_id) or 0) for item_id, quantity in balances.items())
+    return total, balances
+
+
+def warehouse_stock_on(when, warehouse_id):
+    """أرصدة المستودع من آخر لقطة مستودعات قبل when (بدون إعادة تشغيل) - {item_id: الكمية}"""
+    snapshots = StockSnapshot.__table__
+    periods = StockSnapshotPeriod.__table__
+    snapshot_date = db.session.execute(
+        select(func.max(periods.c.snapshot_date))
+        .where(periods.c.snapshot_date <= _latest_closed_day(_as_datetime(when)),
+               periods.c.includes_warehouses.is_(True))
+    ).scalar()
+    if snapshot_date is None:
+        return {}
+    return dict(db.session.execute(
+        select(snapshots.c.item_id, snapshots.c.quantity)
+        .where(snapshots.c.snapshot_date == snapshot_date, snapshots.c.warehouse_id == warehouse_id)
+    ).all())
+
+
+def _write_snapshot_rows(snapshot_date, include_warehouses):
+    """استبدال أرصدة يوم الإقفال في القاعدة الحالية - (عدد الصفوف، عدد الأصناف، القيمة)"""
+    as_of = end_of_day(snapshot_date)
+
+    current = _current_balances()
+    later = _movement_sums(after=as_of)
+    rows = []
+    total_value = 0.0
+    for item_id, (quantity, center_id, unit_price) in current.items():
+        quantity -= later.get(item_id, 0)
+        if not quantity:
+            continue
+        value = quantity * (unit_price or 0)
+        total_value += value
+        rows.append({
+            'snapshot_date': snapshot_date, 'item_id': item_id, 'center_id': center_id,
+            'warehouse_id': None, 'quantity': quantity, 'unit_price': unit_price, 'value': value,
+        })
+    item_count = len(rows)
+
+    if include_warehouses:
+        inventory = WarehouseInventory.__table__
+        for warehouse_id, item_id, quantity in db.session.execute(
+            select(inventory.c.warehouse_id, inventory.c.item_id, inventory.c.quantity_on_hand)
+            .where(inventory.c.quantity_on_hand != 0)
+        ):
+            _, center_id, unit_price = current.get(item_id, (0, None, None))
+            rows.append({
+                'snapshot_date': snapshot_date, 'item_id': item_id, 'center_id': center_id,
+                'warehouse_id': warehouse_id, 'quantity': quantity, 'unit_price': unit_price,
+                'value': quantity * (unit_price or 0),
+            })
+
+    snapshots = StockSnapshot.__table__
+    db.session.execute(delete(snapshots).where(snapshots.c.snapshot_date == snapshot_date))
+    if rows:
+        db.session.execute(insert(snapshots), rows)
+    return len(rows), item_count, total_value
+
+
+def take_stock_snapshot(snapshot_date=None, include_warehouses=False):
+    """
+    كتابة (أو استبدال) لقطة نهاية اليوم - يعيد عدد الصفوف
+
+    الأرصدة تُثبت لكل قاعدة مراكز؛ رأس الفترة يُكتب بعدها (المستدعي يثبته)
+    فلا تظهر الفترة قبل اكتمال أرصدة جميع المراكز
+    """
+    snapshot_date = snapshot_date or date.today() - timedelta(days=1)
+    results = for_each_center(lambda: _write_snapshot_rows(snapshot_date, include_warehouses)).values()
+
+    periods = StockSnapshotPeriod.__table__
+    db.session.execute(delete(periods).where(periods.c.snapshot_date == snapshot_date))
+    db.session.execute(insert(periods).values(
+        snapshot_date=snapshot_date, item_count=sum(result[1] for result in results),
+        total_value=sum(result[2] for result in results),
+        includes_warehouses=bool(include_warehouses), created_at=datetime.utcnow(),
+    ))
+    return sum(result[0] for result in results)
+
+
+def init_stock_snapshots(app):
+    """تسجيل أمر إقفال الفترة"""
+
+    @app.cli.command('stock-snapshot')
+    @click.option('--date', 'snapshot_date', type=click.DateTime(formats=['%Y-%m-%d']),
+                  help='يوم الإقفال (افتراضياً أمس)')
+    @click.option('--warehouses', is_flag=True, help='تسجيل أرصدة المستودعات أيضاً')
+    def stock_snapshot_command(snapshot_date, warehouses):
+        """كتابة لقطة أرصدة المخزون في نهاية يوم الإقفال"""
+        day = snapshot_date.date() if snapshot_date else None
+        count = take_stock_snapshot(day, warehouses)
+        db.session.commit()
+        click.echo(f'{count} رصيد')
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+نطاق المستأجر التلقائي
+Tenant Scope - automatic center_id criteria on every ORM query for center users
+
+بدلاً من الاعتماد على أن يتذكر كل مسار استدعاء filter_query_by_center أو
+MultiTenantQuery، يضيف مستمع do_orm_execute على الجلسة شرط
+center_id = مركز المستخدم إلى كل استعلام (SELECT وكذلك UPDATE/DELETE عبر ORM)
+على النماذج المرتبطة بالمراكز (TENANT_MODELS)، بما في ذلك تحميل العلاقات.
+
+النطاق يُحدد مرة واحدة في before_request (ensure_center_isolation):
+- المؤسس والمدير: بدون نطاق (جميع المراكز)
+- موظفو المركز: مركزهم فقط
+- مستخدم بدون مركز (بيانات ما قبل تعدد المراكز): بدون نطاق، مثل
+  filter_query_by_center
+
+للاستعلامات التي تحتاج جميع المراكز عمداً:
+    with unscoped(): ...
+أو query.execution_options(skip_tenant_scope=True)
+
+الفهارس المركبة (center_id, ...) على هذه الجداول تجعل كل استعلام يقرأ جزء
+مركزه فقط.
+"""
+
+from contextlib import contextmanager
+from flask import g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, with_loader_criteria
+import models
+
+# النماذج التي تملك center_id وتخضع للعزل التلقائي
+# (User و UserPermission مستثناة: الهوية والصلاحيات لها منطقها الخاص)
+TENANT_MODELS = (
+    'Item', 'Supplier', 'PurchaseOrder', 'Transaction', 'AssetRegistration',
+    'Recipe', 'MealRecord', 'ActivityLog', 'TrainingProgram', 'Trainee', 'MaintenanceLog',
+)
+
+_FULL_ACCESS_ROLES = ('founder', 'admin')
+
+
+def set_tenant_scope(user):
+    """تحديد نطاق الطلب الحالي حسب المستخدم"""
+    center_id = None
+    if user is not None and user.is_authenticated and user.role not in _FULL_ACCESS_ROLES:
+        center_id = user.center_id
+    g.tenant_center_id = center_id
+
+
+def get_tenant_center_id():
+    """مركز نطاق الطلب الحالي (None = بدون نطاق)"""
+    if not has_app_context() or g.get('tenant_scope_disabled'):
+        return None
+    return g.get('tenant_center_id')
+
+
+@contextmanager
+def unscoped():
+    """تعطيل نطاق المستأجر مؤقتاً (تقارير المؤسس، المهام الخلفية)"""
+    previous = g.get('tenant_scope_disabled', False)
+    g.tenant_scope_disabled = True
+    try:
+        yield
+    finally:
+        g.tenant_scope_disabled = previous
+
+
+def _tenant_criteria(center_id):
+    return [
+        with_loader_criteria(
+            getattr(models, name), lambda cls: cls.center_id == center_id, include_aliases=True
+        )
+        for name in TENANT_MODELS
+    ]
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _apply_tenant_scope(execute_state):
+    if not (execute_state.is_select or execute_state.is_update or execute_state.is_delete):
+        return
+    # تحميل الأعمدة والعلاقات يرث الشرط من الاستعلام الأصلي
+    if execute_state.is_column_load or execute_state.is_relationship_load:
+        return
+    if execute_state.execution_options.get('skip_tenant_scope'):
+        return
+
+    center_id = get_tenant_center_id()
+    if center_id is None:
+        return
+    execute_state.statement = execute_state.statement.options(*_tenant_criteria(center_id))
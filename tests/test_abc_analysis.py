@@ -0,0 +1,87 @@
+"""
+Tests for the ABC analysis engine
+Verifies period windows, incremental rollups and the vectorized classification
+"""
+
+import pytest
+import sys
+import os
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from models import db, User, Item, ItemCategory_Model, Transaction, InventoryABCAnalysis, ItemConsumptionDaily
+from abc_analysis import classify, refresh_consumption_rollup, run_abc_analysis
+
+
+@pytest.fixture
+def app():
+    """Three items with one recent transaction each and one old transaction"""
+    app = create_app('testing')
+    app.config['RATE_LIMIT_ENABLED'] = False
+    app.config['ABC_REFRESH_LAG_SECONDS'] = 0
+
+    with app.app_context():
+        db.create_all()
+        category = ItemCategory_Model(code='CAT', name='Category', category_type='other')
+        user = User(username='keeper', email='keeper@test.local', first_name='k', last_name='Test', role='admin')
+        user.set_password('testpass123')
+        db.session.add_all([category, user])
+        db.session.flush()
+        app.user_id = user.id
+        for code in ('A', 'B', 'C'):
+            db.session.add(Item(code=code, name=code, unit='unit', category_id=category.id))
+        db.session.flush()
+        app.item_ids = {item.code: item.id for item in Item.query.all()}
+
+        now = datetime.utcnow() - timedelta(minutes=1)
+        for code, value, days_ago in (('A', 850, 1), ('B', 100, 2), ('C', 50, 3), ('C', 5000, 400)):
+            add_transaction(app, code, value, now - timedelta(days=days_ago))
+        db.session.commit()
+
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+def add_transaction(app, code, value, when):
+    db.session.add(Transaction(
+        reference_number=f'T-{code}-{when.timestamp()}', transaction_type='issue',
+        item_id=app.item_ids[code], quantity=1, total_value=value, created_by_id=app.user_id,
+        transaction_date=when, created_at=when,
+    ))
+
+
+class TestABCAnalysis:
+    """Tests for abc_analysis"""
+
+    def test_classify_cumulative_share(self):
+        """Categories follow the cumulative share of the sorted values"""
+        categories, share = classify([50, 850, 100])
+        assert list(categories) == ['C', 'B', 'B']
+        assert round(share.sum(), 6) == 100
+        categories, _ = classify([10, 700, 50, 40, 200])
+        assert list(categories) == ['C', 'A', 'B', 'C', 'B']
+
+    def test_period_window_excludes_old_transactions(self, app):
+        """The yearly window ignores a transaction from 400 days ago"""
+        with app.app_context():
+            run_abc_analysis(['yearly'])
+            db.session.commit()
+            rows = {row.item_id: row for row in InventoryABCAnalysis.query.filter_by(period='yearly')}
+            assert rows[app.item_ids['C']].annual_value == 50
+            assert rows[app.item_ids['A']].percentage_of_total == 85
+
+    def test_incremental_refresh_reads_only_new_transactions(self, app):
+        """A second refresh only folds in transactions after the high-water mark"""
+        with app.app_context():
+            assert refresh_consumption_rollup() == 4
+            assert refresh_consumption_rollup() == 0
+
+            add_transaction(app, 'A', 10, datetime.utcnow() - timedelta(days=1, seconds=-30))
+            db.session.commit()
+            assert refresh_consumption_rollup() == 1
+
+            totals = {row.item_id: row.value for row in ItemConsumptionDaily.query.filter_by(item_id=app.item_ids['A'])}
+            assert sum(totals.values()) == 860
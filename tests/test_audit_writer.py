@@ -0,0 +1,84 @@
+"""
+Tests for the buffered audit trail writer
+Verifies the bounded queue, overflow policies and batch flushing
+"""
+
+import pytest
+import sys
+import os
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import event, func, select
+from app import create_app
+from models import db, SecurityRollup
+from audit_writer import AuditWriter
+from security_middleware import SecurityLog
+
+
+def make_row(n):
+    return {'action': 'request', 'status': 'success', 'new_values': {'n': n}}
+
+
+class TestAuditWriter:
+    """Tests for audit_writer"""
+
+    def test_drop_newest_policy(self):
+        """A full queue rejects new entries and counts them as dropped"""
+        writer = AuditWriter(max_queue=2, overflow_policy='drop_newest', autostart=False)
+        assert writer.enqueue(make_row(1))
+        assert writer.enqueue(make_row(2))
+        assert not writer.enqueue(make_row(3))
+
+        stats = writer.stats()
+        assert stats['queue_depth'] == 2
+        assert stats['dropped'] == 1
+
+    def test_drop_oldest_policy(self):
+        """A full queue discards the oldest entry to make room"""
+        writer = AuditWriter(max_queue=2, overflow_policy='drop_oldest', autostart=False)
+        for n in range(1, 4):
+            assert writer.enqueue(make_row(n))
+
+        remaining = [row['new_values']['n'] for row in writer._drain()]
+        assert remaining == [2, 3]
+        assert writer.stats()['dropped'] == 1
+
+    def test_unknown_policy_rejected(self):
+        """Misconfigured overflow policies fail at startup"""
+        with pytest.raises(ValueError):
+            AuditWriter(overflow_policy='ignore')
+
+    def test_flush_writes_in_batches(self):
+        """flush() drains the queue into the database with one INSERT per batch_size chunk"""
+        app = create_app('testing')
+        with app.app_context():
+            db.create_all()
+            # SecurityLog مسجل في metadata خاصة بنماذج security_enhanced
+            SecurityLog.metadata.create_all(db.engine, tables=[SecurityLog.__table__])
+            writer = AuditWriter(batch_size=2, autostart=False)
+            writer.app = app
+
+            inserts = []
+
+            def record(conn, cursor, statement, parameters, context, executemany):
+                if statement.startswith('INSERT INTO security_logs'):
+                    inserts.append(len(parameters) if executemany else 1)
+
+            for n in range(5):
+                writer.enqueue(dict(make_row(n), timestamp=datetime.utcnow()))
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                assert writer.flush() == 5
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+
+            assert inserts == [2, 2, 1]
+            stats = writer.stats()
+            assert (stats['queue_depth'], stats['written'], stats['failed'], stats['batches']) == (0, 5, 0, 3)
+            assert db.session.execute(select(func.count()).select_from(SecurityLog.__table__)).scalar() == 5
+            assert db.session.query(SecurityRollup).count() > 0
+
+            SecurityLog.metadata.drop_all(db.engine, tables=[SecurityLog.__table__])
+            db.drop_all()
@@ -0,0 +1,200 @@
+"""
+Tests for per-center database shards
+Verifies routing of operational tables to the center database and federated queries
+"""
+
+import pytest
+import sys
+import os
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from models import (
+    db, VocationalCenter, Item, ItemCategory_Model, User, Transaction, SmartInventoryAlert,
+    InventoryCostAnalysis, InventoryABCAnalysis, StockSnapshot
+)
+from stock_ledger import adjust_stock
+from stock_costing import get_stock_value
+from center_shards import (
+    init_center_shards, using_center, federated_map, copy_center_rows, sharded_table_names,
+    UnknownCenterError
+)
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Two centers with sharding enabled and SQLite shard files under tmp_path"""
+    app = create_app('testing')
+    app.config['RATE_LIMIT_ENABLED'] = False
+    app.config['CENTER_SHARDING_ENABLED'] = True
+    app.config['CENTER_SHARD_URL_TEMPLATE'] = 'sqlite:///' + str(tmp_path / 'center_{center_key}.db')
+    init_center_shards(app)
+
+    with app.app_context():
+        db.create_all()
+        first = VocationalCenter(code='C1', name_ar='المركز الأول')
+        second = VocationalCenter(code='C2', name_ar='المركز الثاني')
+        category = ItemCategory_Model(code='CAT', name='Category', category_type='other')
+        db.session.add_all([first, second, category])
+        db.session.commit()
+        app.center_ids = (first.id, second.id)
+        app.category_id = category.id
+
+    yield app
+    with app.app_context():
+        app.extensions['center_shards'].dispose()
+        db.drop_all()
+
+
+def add_item(app, center_id, code, **values):
+    db.session.add(Item(code=code, name=code, unit='unit', category_id=app.category_id, center_id=center_id,
+                        **values))
+    db.session.commit()
+
+
+class TestCenterShards:
+    """Tests for center_shards"""
+
+    def test_rows_are_written_to_center_database(self, app):
+        """Items created under a center live in that center's database only"""
+        first, second = app.center_ids
+        with app.app_context():
+            with using_center(first):
+                add_item(app, first, 'I1')
+                assert Item.query.count() == 1
+            with using_center(second):
+                assert Item.query.count() == 0
+            # القاعدة المركزية بدون مركز محدد
+            assert Item.query.count() == 0
+            # الجداول المشتركة تبقى مركزية
+            with using_center(first):
+                assert User.query.count() == 0
+                assert VocationalCenter.query.count() == 2
+
+    def test_federated_map_merges_results(self, app):
+        """Founder queries fan out to every center database"""
+        first, second = app.center_ids
+        with app.app_context():
+            with using_center(first):
+                add_item(app, first, 'I1')
+                add_item(app, first, 'I2')
+            with using_center(second):
+                add_item(app, second, 'I3')
+
+            counts = federated_map(lambda center_id: Item.query.count(), [first, second])
+            assert counts == {first: 2, second: 1}
+
+    def test_copy_center_rows_moves_central_data(self, app):
+        """Existing central rows, and the rows that reference them, are copied into the center database and purged"""
+        first, _ = app.center_ids
+        with app.app_context():
+            # الحد الأدنى أعلى من الرصيد: إنذار low_stock يشير إلى الصنف
+            add_item(app, first, 'LEGACY', quantity_in_stock=1, minimum_quantity=5)
+            assert SmartInventoryAlert.query.count() == 1
+            router = app.extensions['center_shards']
+            copied = copy_center_rows(router, first, purge_central=True)
+
+            assert copied['items'] == 1
+            assert copied['smart_inventory_alerts'] == 1
+            assert Item.query.count() == 0
+            assert SmartInventoryAlert.query.count() == 0
+            with using_center(first):
+                assert [item.code for item in Item.query.all()] == ['LEGACY']
+                assert SmartInventoryAlert.query.one().alert_type == 'low_stock'
+
+    def test_no_central_table_references_a_shard(self, app):
+        """Every table with a foreign key into a sharded table is sharded with it"""
+        sharded = set(sharded_table_names())
+        for name in ('item_issues', 'stock_request_items', 'inventory_count_items', 'warehouse_inventory',
+                     'inventory_abc_analysis', 'inventory_cost_analysis', 'smart_inventory_alerts',
+                     'item_consumption_daily', 'item_cost_layers', 'stock_snapshots', 'stock_value_totals'):
+            assert name in sharded
+        for table in db.metadata.tables.values():
+            if table.name not in sharded:
+                assert not {fk.column.table.name for fk in table.foreign_keys} & sharded, table.name
+        assert not {'users', 'vocational_centers'} & sharded
+
+    def test_stock_value_totals_stay_in_center_database(self, app):
+        """Stock movements update the center total in the center database; the founder view sums the centers"""
+        first, second = app.center_ids
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            with using_center(first):
+                add_item(app, first, 'I1', unit_price=2)
+                item_id = Item.query.one().id
+            with using_center(second):
+                add_item(app, second, 'I2', unit_price=5)
+                adjust_stock(Item.query.one().id, 3)
+                db.session.commit()
+
+            central_engine = db.engine
+            db.event.listen(central_engine, 'before_cursor_execute', record)
+            try:
+                with using_center(first):
+                    adjust_stock(item_id, 10)
+                    db.session.commit()
+            finally:
+                db.event.remove(central_engine, 'before_cursor_execute', record)
+            assert not [statement for statement in statements if 'stock_value_totals' in statement]
+
+            assert db.session.execute(db.select(db.func.count()).select_from(db.metadata.tables['stock_value_totals'])).scalar() == 0
+            assert get_stock_value(first) == 20
+            assert get_stock_value(second) == 15
+            assert get_stock_value() == 35
+
+    def test_unknown_center_is_not_provisioned(self, app, tmp_path):
+        """An id that is not a center never creates a shard database"""
+        with app.app_context():
+            router = app.extensions['center_shards']
+            with pytest.raises(UnknownCenterError):
+                router.engine_for('../../not-a-center')
+            with using_center('not-a-center'):
+                with pytest.raises(UnknownCenterError):
+                    Item.query.count()
+            assert not list(tmp_path.glob('center_*.db'))
+
+    def test_background_jobs_run_on_every_center(self, app):
+        """CLI jobs without a request center fan out to each center database"""
+        first, second = app.center_ids
+        with app.app_context():
+            user = User(username='keeper', email='keeper@test.local', first_name='k', last_name='Test', role='admin')
+            user.set_password('testpass123')
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+            with using_center(first):
+                add_item(app, first, 'I1', quantity_in_stock=10, minimum_quantity=2, unit_price=3)
+                add_item(app, first, 'I2', quantity_in_stock=1, minimum_quantity=2, unit_price=3)
+            with using_center(second):
+                add_item(app, second, 'I3', quantity_in_stock=4, minimum_quantity=2, unit_price=5)
+            for center_id in app.center_ids:
+                with using_center(center_id):
+                    issued_at = datetime.utcnow() - timedelta(hours=1)
+                    db.session.add_all([
+                        Transaction(reference_number=f'T-{item.code}', transaction_type='issue', item_id=item.id,
+                                    center_id=center_id, quantity=1, total_value=3, created_by_id=user_id,
+                                    transaction_date=issued_at, created_at=issued_at)
+                        for item in Item.query.all()
+                    ])
+                    db.session.commit()
+
+        runner = app.test_cli_runner()
+        for command in (['cost-analysis'], ['abc-analysis'], ['stock-snapshot'], ['inventory-alerts', '--rebuild']):
+            result = runner.invoke(args=command)
+            assert result.exit_code == 0, result.output
+        assert runner.invoke(args=['cost-analysis']).output.strip().endswith('3 صنف')
+
+        with app.app_context():
+            for center_id, items in ((first, 2), (second, 1)):
+                with using_center(center_id):
+                    assert InventoryCostAnalysis.query.count() == items
+                    assert InventoryABCAnalysis.query.filter_by(period='yearly').count() == items
+                    assert StockSnapshot.query.count() == items
+            with using_center(first):
+                assert [alert.alert_type for alert in SmartInventoryAlert.query.all()] == ['low_stock']
@@ -0,0 +1,80 @@
+"""
+Tests for the grouped center statistics
+Verifies that all counters for all centers come from one query and are cached
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import event
+from app import create_app
+from models import db, User, VocationalCenter, Item, ItemCategory_Model, Supplier
+from center_stats import get_center_stats, invalidate_center_stats
+
+
+@pytest.fixture
+def app():
+    """Two centers with different amounts of data"""
+    app = create_app('testing')
+    app.config['RATE_LIMIT_ENABLED'] = False
+    invalidate_center_stats()
+
+    with app.app_context():
+        db.create_all()
+        first = VocationalCenter(code='C1', name_ar='المركز الأول')
+        second = VocationalCenter(code='C2', name_ar='المركز الثاني')
+        category = ItemCategory_Model(code='CAT', name='Category', category_type='other')
+        db.session.add_all([first, second, category])
+        db.session.flush()
+
+        for code in ('I1', 'I2'):
+            db.session.add(Item(code=code, name=code, unit='unit', category_id=category.id, center_id=first.id))
+        db.session.add(Item(code='OLD', name='OLD', unit='unit', category_id=category.id,
+                            center_id=first.id, is_active=False))
+        db.session.add(Supplier(code='S1', name='S1', center_id=second.id))
+        user = User(username='worker', email='worker@test.local', first_name='w',
+                    last_name='Test', role='worker', center_id=second.id)
+        user.set_password('testpass123')
+        db.session.add(user)
+        db.session.commit()
+        app.center_ids = (first.id, second.id)
+
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+class TestCenterStats:
+    """Tests for center_stats"""
+
+    def test_counters_for_all_centers(self, app):
+        """Active rows are counted per center and missing counters are zero"""
+        first, second = app.center_ids
+        with app.app_context():
+            stats = get_center_stats([first, second])
+            assert stats[first]['inventory_items'] == 2
+            assert stats[first]['employees'] == 0
+            assert stats[second] == {
+                'employees': 1, 'inventory_items': 0, 'suppliers': 1,
+                'recipes': 0, 'total_transactions': 0,
+            }
+
+    def test_one_query_then_cache(self, app):
+        """All centers load in one statement and repeated calls hit the cache"""
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                get_center_stats(app.center_ids)
+                assert len(statements) == 1
+                get_center_stats(app.center_ids)
+                assert len(statements) == 1
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
@@ -0,0 +1,110 @@
+"""
+Tests for the batch cost-analysis engine
+Verifies the ledger-derived time-weighted average and the bulk job output
+"""
+
+import pytest
+import sys
+import os
+import numpy as np
+from datetime import date, datetime, time, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from sqlalchemy import update
+from models import db, User, Item, ItemCategory_Model, Transaction, InventoryCostAnalysis, BackgroundJobState
+from cost_analysis_engine import CostAnalysisJob, time_weighted_average
+
+
+@pytest.fixture
+def app():
+    """Item A bought 20 days ago and issued 10 days ago, item B without movements"""
+    app = create_app('testing')
+    app.config['RATE_LIMIT_ENABLED'] = False
+
+    with app.app_context():
+        db.create_all()
+        category = ItemCategory_Model(code='CAT', name='Category', category_type='other')
+        user = User(username='keeper', email='keeper@test.local', first_name='k', last_name='Test', role='admin')
+        user.set_password('testpass123')
+        db.session.add_all([category, user])
+        db.session.flush()
+        for code, quantity in (('A', 20), ('B', 5)):
+            db.session.add(Item(code=code, name=code, unit='unit', category_id=category.id,
+                                quantity_in_stock=quantity, unit_price=2))
+        db.session.flush()
+        app.item_ids = {item.code: item.id for item in Item.query.all()}
+
+        # نهاية نافذة الفترة هي نهاية اليوم
+        end = datetime.combine(date.today(), time.max)
+        for number, (kind, quantity, days_ago) in enumerate((('purchase', 30, 20), ('issue', 10, 10))):
+            db.session.add(Transaction(
+                reference_number=f'T-{number}', transaction_type=kind, item_id=app.item_ids['A'],
+                quantity=quantity, unit_price=2, total_value=quantity * 2, created_by_id=user.id,
+                transaction_date=end - timedelta(days=days_ago),
+            ))
+        db.session.commit()
+
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+class TestCostAnalysisEngine:
+    """Tests for cost_analysis_engine"""
+
+    def test_time_weighted_average(self):
+        """Balances are rebuilt backwards from the current quantity and weighted by duration"""
+        average = time_weighted_average(
+            np.array([10.0, 4.0]), np.array([0, 0]), np.array([25.0, 75.0]), np.array([6.0, -2.0]), 100.0
+        )
+        # 6 لمدة 25، ثم 12 لمدة 50، ثم 10 لمدة 25
+        assert average.tolist() == [10.0, 4.0]
+
+    def test_job_writes_all_items(self, app):
+        """One run replaces the period's rows with ledger-derived costs for every item"""
+        with app.app_context():
+            db.session.add(InventoryCostAnalysis(item_id=app.item_ids['B'], period='monthly'))
+            db.session.commit()
+
+            status = CostAnalysisJob().run(app, 'monthly')
+            assert status['state'] == 'done'
+            assert status['items'] == 2
+
+            rows = {row.item_id: row for row in InventoryCostAnalysis.query.filter_by(period='monthly')}
+            assert len(rows) == 2
+            a, b = rows[app.item_ids['A']], rows[app.item_ids['B']]
+            # 0 لمدة 10 أيام، 30 لمدة 10، 20 لمدة 10
+            assert a.average_inventory == pytest.approx(50 / 3, rel=1e-3)
+            assert a.ordering_cost == 50
+            assert a.total_inventory_value == 80
+            assert a.holding_cost == pytest.approx(50 / 3 * 2 * 0.2 * 30 / 365, rel=1e-3)
+            assert b.average_inventory == 5
+            assert b.ordering_cost == 0
+
+    def test_job_lock_is_shared_between_workers(self, app):
+        """A claimed run blocks other workers, which still see its progress"""
+        first_worker, second_worker = CostAnalysisJob(), CostAnalysisJob()
+        owner = first_worker._claim(app, 'monthly')
+        assert owner is not None
+        with app.app_context():
+            first_worker._update(owner, stage='writing', done=1, total=2)
+
+        assert not second_worker.start(app, 'quarterly')
+        assert second_worker.run(app, 'quarterly') is None
+        with app.app_context():
+            status = second_worker.status()
+            assert (status['state'], status['period'], status['stage'], status['done']) == ('running', 'monthly', 'writing', 1)
+
+            # عملية توقفت: نبضات أقدم من COST_ANALYSIS_STALE_SECONDS
+            table = BackgroundJobState.__table__
+            with db.engine.begin() as conn:
+                conn.execute(update(table).values(heartbeat_at=datetime.utcnow() - timedelta(hours=1)))
+
+        status = second_worker.run(app, 'quarterly')
+        assert (status['state'], status['period'], status['items']) == ('done', 'quarterly', 2)
+        with app.app_context():
+            # التشغيل القديم لا يكتب فوق حالة التشغيل الجديد
+            first_worker._update(owner, state='failed', error='late')
+            assert first_worker.status()['state'] == 'done'
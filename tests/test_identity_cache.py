@@ -0,0 +1,111 @@
+"""
+Tests for the cached user loader
+Verifies that authenticated requests reuse the identity snapshot and that edits invalidate it
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import event
+from app import create_app
+from models import db, User, VocationalCenter
+from identity_cache import is_center_active, get_identity_cache_stats
+
+
+@pytest.fixture
+def app():
+    """Creates an in-memory application with one center and one user"""
+    app = create_app('testing')
+    app.config['SQLALCHEMY_ECHO'] = False
+    app.config['RATE_LIMIT_ENABLED'] = False
+
+    with app.app_context():
+        db.create_all()
+
+        center = VocationalCenter(code='IDC', name_ar='مركز الهوية')
+        db.session.add(center)
+        db.session.flush()
+
+        user = User(
+            username='identity_user',
+            email='identity_user@test.local',
+            first_name='Identity',
+            last_name='User',
+            role='worker',
+            center_id=center.id,
+        )
+        user.set_password('testpass123')
+        db.session.add(user)
+        db.session.commit()
+
+        app.center_id = center.id
+        app.user_id = user.id
+
+    yield app
+
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Logged-in test client"""
+    client = app.test_client()
+    client.post('/auth/login', data={
+        'username': 'identity_user',
+        'password': 'testpass123',
+        'center_id': app.center_id,
+    })
+    return client
+
+
+@pytest.fixture
+def user_queries(app):
+    """Collects SELECT statements against the users table"""
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        if 'FROM users' in statement:
+            statements.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+    yield statements
+    with app.app_context():
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+
+class TestIdentityCache:
+    """Tests for identity_cache"""
+
+    def test_loader_served_from_snapshot(self, client, user_queries):
+        """A repeated authenticated GET does not query the users table"""
+        client.get('/auth/profile')
+        user_queries.clear()
+        response = client.get('/auth/profile')
+        assert response.status_code == 200
+        assert user_queries == []
+
+    def test_edit_invalidates_snapshot(self, app, client):
+        """Saving the user row drops the cached snapshot"""
+        client.get('/auth/profile')
+        with app.app_context():
+            user = db.session.get(User, app.user_id)
+            user.first_name = 'Renamed'
+            db.session.commit()
+
+        response = client.get('/auth/profile')
+        assert 'Renamed' in response.get_data(as_text=True)
+
+    def test_center_deactivation_invalidates_flag(self, app):
+        """Deactivating a center is visible immediately in this worker"""
+        with app.app_context():
+            assert is_center_active(app.center_id)
+            center = db.session.get(VocationalCenter, app.center_id)
+            center.is_active = False
+            db.session.commit()
+            assert not is_center_active(app.center_id)
+            assert get_identity_cache_stats()['centers']['invalidations'] >= 1
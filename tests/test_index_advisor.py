@@ -0,0 +1,54 @@
+"""
+Tests for the index advisor
+Verifies full-scan detection on SQLite plans and the suggested index columns
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from models import db
+from index_advisor import explain_full_scans, suggest_index
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+class TestIndexAdvisor:
+    """Tests for index_advisor"""
+
+    def test_indexed_query_is_not_flagged(self, app):
+        """The curated notifications index serves the unread-count query"""
+        with app.app_context(), db.engine.connect() as conn:
+            statement = (
+                'SELECT notifications.id FROM notifications WHERE notifications.user_id = ? '
+                'AND notifications.is_read = ? ORDER BY notifications.created_at DESC'
+            )
+            assert explain_full_scans(conn, statement, ('u1', 0)) == []
+
+    def test_unindexed_filter_is_flagged(self, app):
+        """A filter on an unindexed column is reported as a full scan"""
+        with app.app_context(), db.engine.connect() as conn:
+            statement = 'SELECT transactions.id FROM transactions WHERE transactions.quantity > ?'
+            assert [table for table, _, _ in explain_full_scans(conn, statement, (5,))] == ['transactions']
+
+    def test_suggestion_orders_equality_before_range(self):
+        """Equality columns lead, range and ORDER BY columns follow"""
+        statement = (
+            'SELECT t.id FROM transactions AS t WHERE t.created_at >= ? AND t.user_id = ? '
+            'ORDER BY t.quantity DESC LIMIT ?'
+        )
+        assert suggest_index(statement, 'transactions', 't') == (
+            'CREATE INDEX ix_transactions_user_id_created_at_quantity '
+            'ON transactions (user_id, created_at, quantity)'
+        )
@@ -0,0 +1,124 @@
+"""
+Tests for event-driven inventory alerts
+Verifies commit-time evaluation, de-duplication and the slow-moving sweep
+"""
+
+import pytest
+import sys
+import os
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from models import db, Item, ItemCategory_Model, SmartInventoryAlert
+from stock_ledger import adjust_stock
+from sqlalchemy import update
+from inventory_alerts import rebuild_item_alerts, sweep_slow_moving
+
+
+@pytest.fixture
+def app():
+    """Item A with 10 units and a minimum of 4, created long ago"""
+    app = create_app('testing')
+    app.config['RATE_LIMIT_ENABLED'] = False
+
+    with app.app_context():
+        db.create_all()
+        category = ItemCategory_Model(code='CAT', name='Category', category_type='other')
+        db.session.add(category)
+        db.session.flush()
+        item = Item(code='A', name='A', unit='unit', category_id=category.id, quantity_in_stock=10,
+                    minimum_quantity=4, unit_price=10, created_at=datetime.utcnow() - timedelta(days=200))
+        db.session.add(item)
+        db.session.commit()
+        app.item_id = item.id
+
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+def open_alerts(alert_type):
+    return SmartInventoryAlert.query.filter_by(alert_type=alert_type, is_resolved=False).all()
+
+
+class TestInventoryAlerts:
+    """Tests for inventory_alerts"""
+
+    def test_stock_movements_open_update_and_resolve(self, app):
+        """Low stock opens one alert, later issues update it and replenishment resolves it"""
+        with app.app_context():
+            adjust_stock(app.item_id, -7)
+            db.session.commit()
+            adjust_stock(app.item_id, -3)
+            db.session.commit()
+            alerts = open_alerts('low_stock')
+            assert len(alerts) == 1
+            assert alerts[0].current_value == 0
+            assert alerts[0].severity == 'critical'
+
+            adjust_stock(app.item_id, 25)
+            db.session.commit()
+            assert open_alerts('low_stock') == []
+            assert open_alerts('overstock')[0].current_value == 25
+            assert SmartInventoryAlert.query.filter_by(alert_type='low_stock', is_resolved=True).count() == 1
+
+    def test_price_change_on_edit(self, app):
+        """An ORM price edit beyond the threshold raises a price alert at commit"""
+        with app.app_context():
+            item = db.session.get(Item, app.item_id)
+            item.unit_price = 11
+            db.session.commit()
+            assert open_alerts('price_alert') == []
+            item.unit_price = 15
+            db.session.commit()
+            alert = open_alerts('price_alert')[0]
+            assert alert.current_value == pytest.approx(36.36)
+
+    def test_rollback_discards_old_prices(self, app):
+        """A rolled-back price edit does not leave its old price behind for the next commit"""
+        with app.app_context():
+            item = db.session.get(Item, app.item_id)
+            item.unit_price = 20
+            db.session.flush()
+            db.session.rollback()
+
+            # كاتب آخر غير السعر في الأثناء، ثم تثبيت لا يعدل السعر عبر ORM
+            db.session.execute(update(Item.__table__).where(Item.__table__.c.id == app.item_id).values(unit_price=21))
+            db.session.commit()
+            assert open_alerts('price_alert') == []
+
+    def test_rebuild_adopts_legacy_open_alerts(self, app):
+        """Open alerts written before dedup_key are updated in place; older duplicates are resolved"""
+        with app.app_context():
+            db.session.execute(update(Item.__table__).where(Item.__table__.c.id == app.item_id).values(quantity_in_stock=3))
+            for days in (3, 1):
+                db.session.add(SmartInventoryAlert(
+                    item_id=app.item_id, alert_type='low_stock', threshold_value=4, current_value=5,
+                    triggered_at=datetime.utcnow() - timedelta(days=days),
+                ))
+            db.session.commit()
+
+            assert rebuild_item_alerts() == 1
+            db.session.commit()
+            alerts = open_alerts('low_stock')
+            assert len(alerts) == 1
+            assert alerts[0].current_value == 3
+            assert alerts[0].dedup_key is not None
+            duplicate = SmartInventoryAlert.query.filter_by(alert_type='low_stock', is_resolved=True).one()
+            assert duplicate.action_taken == 'duplicate'
+            assert duplicate.triggered_at < alerts[0].triggered_at
+
+    def test_slow_moving_sweep(self, app):
+        """The periodic sweep flags idle stock and an issue resolves it immediately"""
+        with app.app_context():
+            assert sweep_slow_moving() == (1, 0)
+            db.session.commit()
+            assert sweep_slow_moving() == (1, 0)
+            db.session.commit()
+            assert len(open_alerts('slow_moving')) == 1
+
+            adjust_stock(app.item_id, -1)
+            db.session.commit()
+            assert open_alerts('slow_moving') == []
@@ -0,0 +1,73 @@
+"""
+Tests for the log retention engine
+Verifies chunked deletes, the date-partitioned archive and dry runs
+"""
+
+import pytest
+import sys
+import os
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from models import db, LoginAttempt
+from log_retention import LogArchive, purge_expired_logs
+
+
+@pytest.fixture
+def app(tmp_path):
+    """In-memory application with old and recent login attempts"""
+    app = create_app('testing')
+    app.config['RATE_LIMIT_ENABLED'] = False
+    app.config['SECURITY_LOG_RETENTION_DAYS'] = 30
+    app.config['RETENTION_CHUNK_SIZE'] = 2
+    app.config['RETENTION_PAUSE_SECONDS'] = 0
+    app.config['RETENTION_ARCHIVE_DIR'] = str(tmp_path / 'archive')
+
+    with app.app_context():
+        db.create_all()
+        now = datetime.utcnow()
+        for days_ago in (40, 40, 45, 60, 1):
+            db.session.add(LoginAttempt(
+                username=f'user{days_ago}', ip_address='10.0.0.1',
+                created_at=now - timedelta(days=days_ago)
+            ))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+class TestLogRetention:
+    """Tests for log_retention"""
+
+    def test_expired_rows_are_archived_then_deleted(self, app):
+        """Old rows move to per-day gzip segments in chunks; recent rows stay"""
+        progress = []
+        with app.app_context():
+            report = purge_expired_logs(
+                table_names=['login_attempts'],
+                progress=lambda table, deleted, elapsed: progress.append(deleted),
+            )
+            assert [row.username for row in LoginAttempt.query.all()] == ['user1']
+
+        table = report['tables'][0]
+        assert table['deleted'] == table['archived'] == 4
+        assert table['chunks'] == 2
+        assert progress == [2, 4]
+        assert 'duration_ms' in table
+
+        archive = LogArchive(app.config['RETENTION_ARCHIVE_DIR'])
+        index = archive.read_index('login_attempts')
+        assert sorted(entry['rows'] for entry in index) == [1, 1, 2]
+        assert sorted(row['username'] for row in archive.iter_rows('login_attempts')) == [
+            'user40', 'user40', 'user45', 'user60'
+        ]
+
+    def test_dry_run_only_counts(self, app):
+        """A dry run reports expired rows without touching the table"""
+        with app.app_context():
+            report = purge_expired_logs(table_names=['login_attempts'], dry_run=True)
+            assert report['tables'][0]['expired'] == 4
+            assert LoginAttempt.query.count() == 5
@@ -0,0 +1,82 @@
+"""
+Tests for the in-memory OrganizationSettings snapshot
+Verifies that settings are read once per worker and refreshed through the change signal
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from models import db, OrganizationSettings
+from org_settings_cache import (
+    get_org_settings, refresh_org_settings, get_org_settings_cache_stats,
+    OrgSettingsCache
+)
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Creates an in-memory application with a private signal file"""
+    app = create_app('testing')
+    app.config['SQLALCHEMY_ECHO'] = False
+    app.extensions['org_settings_cache'] = OrgSettingsCache(
+        str(tmp_path / 'org_settings.signal'), check_interval=0
+    )
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(OrganizationSettings(ministry_name='وزارة', meal_cost_per_unit=2.5))
+        db.session.commit()
+
+    yield app
+
+    with app.app_context():
+        db.drop_all()
+
+
+class TestOrgSettingsCache:
+    """Tests for org_settings_cache"""
+
+    def test_snapshot_loaded_once(self, app):
+        """Repeated reads are served from memory"""
+        with app.app_context():
+            for _ in range(5):
+                assert get_org_settings().meal_cost_per_unit == 2.5
+            assert get_org_settings_cache_stats()['loads'] == 1
+
+    def test_snapshot_is_read_only(self, app):
+        """The snapshot cannot be modified by callers"""
+        with app.app_context():
+            org_settings = get_org_settings()
+            with pytest.raises(AttributeError):
+                org_settings.meal_cost_per_unit = 10
+            assert org_settings.get_header_text().startswith('وزارة')
+
+    def test_refresh_after_save(self, app):
+        """Saving settings and calling refresh_org_settings updates the snapshot"""
+        with app.app_context():
+            get_org_settings()
+            OrganizationSettings.query.first().meal_cost_per_unit = 4.0
+            db.session.commit()
+            assert get_org_settings().meal_cost_per_unit == 2.5
+
+            refresh_org_settings()
+            assert get_org_settings().meal_cost_per_unit == 4.0
+
+    def test_signal_reaches_other_workers(self, app):
+        """Another worker sharing the signal file reloads on its next read"""
+        cache = app.extensions['org_settings_cache']
+        other_worker = OrgSettingsCache(cache.signal_path, check_interval=0)
+
+        with app.app_context():
+            assert other_worker.get().meal_cost_per_unit == 2.5
+
+            OrganizationSettings.query.first().meal_cost_per_unit = 3.0
+            db.session.commit()
+            refresh_org_settings()
+
+            assert other_worker.get().meal_cost_per_unit == 3.0
+            assert other_worker.loads == 2
@@ -0,0 +1,65 @@
+"""
+Tests for the index migration script
+Verifies that indexes missing from existing tables are created, including the
+tables of the separate security_enhanced metadata
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import inspect, text
+from app import create_app
+from models import db
+from security_services import RateLimitViolation, SecurityAlert
+from security_middleware import SecurityLog
+from add_performance_indexes import create_missing_indexes
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+def index_names(table_name):
+    return {index['name'] for index in inspect(db.engine).get_indexes(table_name)}
+
+
+class TestPerformanceIndexes:
+    """Tests for add_performance_indexes"""
+
+    def test_creates_missing_security_indexes(self, app):
+        """An existing rate_limit_violations table gets its timestamp index"""
+        with app.app_context():
+            table = RateLimitViolation.__table__
+            RateLimitViolation.metadata.create_all(db.engine, tables=[table])
+            with db.engine.begin() as conn:
+                conn.execute(text('DROP INDEX ix_rate_limit_violations_timestamp'))
+            assert 'ix_rate_limit_violations_timestamp' not in index_names(table.name)
+
+            assert 'ix_rate_limit_violations_timestamp' in create_missing_indexes()
+            assert 'ix_rate_limit_violations_timestamp' in index_names(table.name)
+            assert create_missing_indexes() == []
+            RateLimitViolation.metadata.drop_all(db.engine, tables=[table])
+
+    def test_creates_rollup_scan_indexes(self, app):
+        """Existing security_logs and security_alerts tables get their time indexes"""
+        with app.app_context():
+            tables = [SecurityLog.__table__, SecurityAlert.__table__]
+            SecurityLog.metadata.create_all(db.engine, tables=tables)
+            with db.engine.begin() as conn:
+                conn.execute(text('DROP INDEX ix_security_logs_timestamp'))
+                conn.execute(text('DROP INDEX ix_security_alerts_created_at'))
+
+            created = create_missing_indexes()
+            assert {'ix_security_logs_timestamp', 'ix_security_alerts_created_at'} <= set(created)
+            assert 'ix_security_logs_timestamp' in index_names('security_logs')
+            assert 'ix_security_alerts_created_at' in index_names('security_alerts')
+            SecurityLog.metadata.drop_all(db.engine, tables=tables)
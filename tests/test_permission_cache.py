@@ -0,0 +1,149 @@
+"""
+Tests for the per-request compiled permission set
+Verifies that permission checks resolve in memory after a single query per request
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from models import db, User, UserPermission, VocationalCenter
+from permission_cache import (
+    get_permission_query_count, get_permission_cache_stats, bump_permission_version
+)
+from permissions_config import PERMISSION_CATALOGUE
+from navigation_config import get_employee_modules
+
+
+@pytest.fixture
+def app():
+    """Creates an in-memory application with one center and one user"""
+    app = create_app('testing')
+    app.config['SQLALCHEMY_ECHO'] = False
+    app.config['RATE_LIMIT_ENABLED'] = False
+    app.query_counts = []
+
+    @app.after_request
+    def record_permission_queries(response):
+        app.query_counts.append(get_permission_query_count())
+        return response
+
+    with app.app_context():
+        db.create_all()
+
+        center = VocationalCenter(code='TST', name_ar='مركز الاختبار')
+        db.session.add(center)
+        db.session.flush()
+
+        user = User(
+            username='perm_user',
+            email='perm_user@test.local',
+            first_name='Perm',
+            last_name='User',
+            role='worker',
+            center_id=center.id,
+        )
+        user.set_password('testpass123')
+        db.session.add(user)
+        db.session.flush()
+
+        for key in ['dashboard_view', 'inventory_view_items', 'reports_low_stock']:
+            db.session.add(UserPermission(
+                user_id=user.id,
+                permission_key=key,
+                permission_name=key,
+                permission_category='test',
+                is_allowed=True
+            ))
+        db.session.commit()
+
+        app.center_id = center.id
+
+    yield app
+
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Logged-in test client"""
+    client = app.test_client()
+    client.post('/auth/login', data={
+        'username': 'perm_user',
+        'password': 'testpass123',
+        'center_id': app.center_id,
+    })
+    app.query_counts.clear()
+    return client
+
+
+class TestPermissionCache:
+    """Tests for permission_cache"""
+
+    def test_single_permission_query_per_page(self, app, client):
+        """The sidebar and route guards share one permission query"""
+        response = client.get('/dashboard/admin')
+        assert response.status_code == 200
+        assert app.query_counts[-1] <= 1
+
+    def test_permission_checks_resolve_in_memory(self, app):
+        """Repeated checks in one request do not hit the database again"""
+        with app.test_request_context():
+            user = User.query.filter_by(username='perm_user').first()
+            assert user.has_granular_permission('dashboard_view')
+            assert user.has_granular_permission('reports_low_stock')
+            assert not user.has_granular_permission('admin_view_users')
+            assert user.get_all_permissions() == {
+                'dashboard_view', 'inventory_view_items', 'reports_low_stock'
+            }
+            assert get_permission_query_count() == 1
+
+    def test_cross_request_cache_hit(self, app, client):
+        """A second page view is served from the process-wide cache"""
+        client.get('/dashboard/admin')
+        before = get_permission_cache_stats()
+        client.get('/dashboard/admin')
+        after = get_permission_cache_stats()
+        assert after['hits'] > before['hits']
+        assert app.query_counts[-1] == 0
+
+    def test_version_bump_evicts_stale_entry(self, app, client):
+        """Bumping permission_version forces a reload on the next request"""
+        client.get('/dashboard/admin')
+        with app.app_context():
+            user = User.query.filter_by(username='perm_user').first()
+            UserPermission.query.filter_by(
+                user_id=user.id, permission_key='dashboard_view'
+            ).delete()
+            bump_permission_version(user.id)
+            db.session.commit()
+
+        response = client.get('/dashboard/admin')
+        assert response.status_code == 403
+        assert app.query_counts[-1] == 1
+
+    def test_catalogue_masks(self, app):
+        """has_any_permission/has_all_permissions evaluate against the bitset"""
+        catalogue = PERMISSION_CATALOGUE
+        assert len(set(catalogue.bits.values())) == len(catalogue)
+        assert catalogue.keys_of(catalogue.mask('dashboard_view', 'reports_low_stock')) == [
+            'dashboard_view', 'reports_low_stock'
+        ]
+
+        with app.test_request_context():
+            user = User.query.filter_by(username='perm_user').first()
+            assert user.has_any_permission('admin_view_users', 'reports_low_stock')
+            assert not user.has_any_permission('admin_view_users', 'admin_add_user')
+            assert user.has_all_permissions('dashboard_view', 'inventory_view_items')
+            assert not user.has_all_permissions('dashboard_view', 'admin_add_user')
+
+    def test_employee_modules_from_mask(self):
+        """Module visibility is derived from the compiled masks"""
+        mask = PERMISSION_CATALOGUE.mask('inventory_view_items', 'reports_low_stock')
+        modules = {m['key']: m for m in get_employee_modules(mask)}
+        assert set(modules) == {'inventory', 'reports'}
+        assert modules['inventory']['link_count'] == 1
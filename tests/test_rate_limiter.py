@@ -0,0 +1,80 @@
+"""
+Tests for the sliding-window rate limiter
+Verifies bounded memory, shared SQLite counters and the request middleware
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from models import db
+from rate_limiter import (
+    MemoryBackend, SQLiteBackend, SlidingWindowLimiter, ViolationBuffer, get_rate_limiter_stats
+)
+import rate_limiter
+
+
+class TestRateLimiter:
+    """Tests for rate_limiter"""
+
+    def test_memory_backend_is_bounded(self):
+        """The in-process backend never holds more than max_keys counters"""
+        backend = MemoryBackend(max_keys=50)
+        for i in range(500):
+            backend.hit(f'client-{i}', 60, 1000.0)
+        assert backend.stats()['keys'] == 50
+
+    def test_idle_keys_are_evicted(self):
+        """Keys without traffic for two full windows are dropped"""
+        backend = MemoryBackend()
+        backend.hit('idle', 60, 1000.0)
+        backend.hit('active', 60, 1200.0)
+        assert backend.stats()['keys'] == 1
+
+    def test_sliding_window_blocks_over_limit(self):
+        """Requests above the limit in one window are rejected"""
+        limiter = SlidingWindowLimiter(MemoryBackend())
+        results = [limiter.hit('client', 3, 60)[0] for _ in range(5)]
+        assert results == [True, True, True, False, False]
+
+    def test_sqlite_backend_shares_counts(self, tmp_path):
+        """Two workers using the same SQLite file enforce one combined limit"""
+        path = str(tmp_path / 'rate_limits.sqlite')
+        worker_a = SlidingWindowLimiter(SQLiteBackend(path))
+        worker_b = SlidingWindowLimiter(SQLiteBackend(path))
+
+        results = [(worker_a if i % 2 else worker_b).hit('client', 4, 60)[0] for i in range(6)]
+        assert results == [True, True, True, True, False, False]
+
+    def test_middleware_returns_429(self):
+        """The before_request hook rejects clients over RATE_LIMIT_DEFAULT_PER_MINUTE"""
+        app = create_app('testing')
+        app.config['RATE_LIMIT_ENABLED'] = True
+        app.config['RATE_LIMIT_DEFAULT_PER_MINUTE'] = 5
+        with app.app_context():
+            db.create_all()
+
+        client = app.test_client()
+        codes = [client.get('/auth/login').status_code for _ in range(7)]
+        assert codes[:5] == [200] * 5
+        assert codes[5:] == [429, 429]
+
+        # only the two genuine violations are buffered for the batch writer
+        assert get_rate_limiter_stats()['violations']['pending'] == 2
+
+        with app.app_context():
+            rate_limiter._violations.flush()
+            db.drop_all()
+
+    def test_violation_buffer_batches_by_size(self):
+        """Violations are written only once the batch is full"""
+        buffer = ViolationBuffer(batch_size=3, flush_seconds=3600)
+        buffer.record('10.0.0.1', 'auth.login', 11)
+        buffer.record('10.0.0.1', 'auth.login', 12)
+        assert not buffer.is_due()
+        buffer.record('10.0.0.1', 'auth.login', 13)
+        assert buffer.is_due()
+        assert buffer.stats()['pending'] == 3
@@ -0,0 +1,66 @@
+"""
+Tests for the reference number allocator
+Verifies block reservation, per-key sequences and uniqueness across workers
+"""
+
+import pytest
+import sys
+import os
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from models import db, VocationalCenter, DocumentSequence
+from reference_numbers import SequenceAllocator, next_references
+
+
+@pytest.fixture
+def app():
+    """In-memory application with one center"""
+    app = create_app('testing')
+    app.config['RATE_LIMIT_ENABLED'] = False
+    app.config['REFERENCE_BLOCK_SIZE'] = 5
+
+    with app.app_context():
+        db.create_all()
+        center = VocationalCenter(code='c-01', name_ar='المركز')
+        db.session.add(center)
+        db.session.commit()
+        app.center_id = center.id
+
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+class TestReferenceNumbers:
+    """Tests for reference_numbers"""
+
+    def test_numbers_are_unique_and_formatted(self, app):
+        """Bulk allocation returns distinct numbers with the center code and period"""
+        with app.app_context():
+            when = datetime(2026, 1, 15)
+            references = next_references('MEAL', 3, center_id=app.center_id, when=when)
+            assert references[0] == 'MEAL-C01-202601-000001'
+            assert len(set(references)) == 3
+
+    def test_blocks_are_reserved_once(self, app):
+        """Numbers inside a block need no database access and the stored high-water mark covers them"""
+        with app.app_context():
+            allocator = SequenceAllocator(block_size=5)
+            key = ('', 'TRN', '202601')
+            assert allocator.allocate(db.engine, key, 4) == [1, 2, 3, 4]
+            assert allocator.allocate(db.engine, key, 3) == [5, 6, 7]
+            assert allocator.blocks_reserved == 2
+            sequence = DocumentSequence.query.filter_by(doc_type='TRN').one()
+            assert sequence.next_value == 11
+
+    def test_workers_never_share_numbers(self, app):
+        """Two allocators (two processes) hand out disjoint blocks"""
+        with app.app_context():
+            key = ('', 'REQ', '202601')
+            first, second = SequenceAllocator(block_size=3), SequenceAllocator(block_size=3)
+            numbers = first.allocate(db.engine, key, 2) + second.allocate(db.engine, key, 2) \
+                + first.allocate(db.engine, key, 2)
+            assert len(set(numbers)) == len(numbers)
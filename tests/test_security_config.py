@@ -0,0 +1,182 @@
+"""
+Tests for the security config snapshot
+Verifies the CIDR trie, read-only policy defaults and atomic rebuilds
+"""
+
+import pytest
+import sys
+import os
+import ipaddress
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from models import db, User, FeatureFlag
+from security_config import (
+    SecurityConfigCache, CIDRTrie, WhitelistEntry, get_security_config, invalidate_security_config, is_feature_enabled
+)
+from sqlalchemy import event
+from identity_cache import TTLCache
+from security_services import PasswordValidator, PasswordPolicy, IPSecurityManager, IPWhitelist
+from security_middleware import SecurityLog
+
+
+@pytest.fixture
+def app(tmp_path):
+    """In-memory application with a private signal file"""
+    app = create_app('testing')
+    app.config['RATE_LIMIT_ENABLED'] = False
+    app.extensions['security_config'].signal_path = str(tmp_path / 'security_config.signal')
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+def _entry(entry_id, cidr, expires_at=None):
+    network = ipaddress.ip_network(cidr, strict=False)
+    return network, WhitelistEntry(entry_id, network, expires_at)
+
+
+class TestSecurityConfig:
+    """Tests for security_config"""
+
+    def test_trie_returns_most_specific_network(self):
+        """The longest matching prefix wins for IPv4 and IPv6"""
+        trie = CIDRTrie()
+        for entry_id, cidr in [(1, '10.0.0.0/8'), (2, '10.1.2.0/24'), (3, '2001:db8::/32')]:
+            trie.insert(*_entry(entry_id, cidr))
+
+        assert trie.lookup(ipaddress.ip_address('10.1.2.7')).id == 2
+        assert trie.lookup(ipaddress.ip_address('10.9.9.9')).id == 1
+        assert trie.lookup(ipaddress.ip_address('2001:db8::1')).id == 3
+        assert trie.lookup(ipaddress.ip_address('192.168.1.1')) is None
+
+    def test_trie_skips_expired_entries(self):
+        """An expired host entry falls back to its still-valid parent network"""
+        trie = CIDRTrie()
+        trie.insert(*_entry(1, '10.0.0.0/16'))
+        trie.insert(*_entry(2, '10.0.0.5/32', datetime.utcnow() - timedelta(days=1)))
+        assert trie.lookup(ipaddress.ip_address('10.0.0.5')).id == 1
+
+    def test_policy_read_does_not_write(self, app):
+        """Reading the password policy returns column defaults without inserting"""
+        with app.app_context():
+            policy = PasswordValidator.get_policy()
+            assert policy.min_length == 12
+            assert not db.session.new
+            with pytest.raises(AttributeError):
+                policy.min_length = 4
+
+    def test_invalidate_swaps_snapshot(self, app):
+        """Feature flag edits become visible in a new snapshot version"""
+        with app.app_context():
+            admin = User(username='flags_admin', email='flags@test.local',
+                         first_name='Flags', last_name='Admin', role='admin')
+            admin.set_password('testpass123')
+            db.session.add(admin)
+            db.session.commit()
+
+            before = get_security_config()
+            assert not is_feature_enabled('realtime_dashboard')
+
+            db.session.add(FeatureFlag(flag_name='realtime_dashboard', is_enabled=True,
+                                       feature_type='realtime', enabled_for_roles=['admin'],
+                                       updated_by_id=admin.id))
+            db.session.commit()
+            invalidate_security_config()
+
+            after = get_security_config()
+            assert after.version == before.version + 1
+            assert 'realtime_dashboard' not in before.feature_flags
+            assert is_feature_enabled('realtime_dashboard', admin)
+            assert not is_feature_enabled('realtime_dashboard')
+
+    def test_policy_form_refreshes_snapshot(self, app):
+        """Saving the password policy form writes the row and swaps the snapshot"""
+        with app.app_context():
+            # نماذج security_enhanced مسجلة في metadata خاصة بها
+            security_tables = [PasswordPolicy.__table__, SecurityLog.__table__]
+            PasswordPolicy.metadata.create_all(db.engine, tables=security_tables)
+            admin = User(username='policy_admin', email='policy@test.local',
+                         first_name='Policy', last_name='Admin', role='admin')
+            admin.set_password('testpass123')
+            db.session.add(admin)
+            db.session.commit()
+            admin_id = admin.id
+            before = get_security_config()
+            assert before.password_policy.min_length == 12
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(admin_id)
+            session['_fresh'] = True
+        response = client.post('/security/password-policy', data={
+            'min_length': 16, 'require_uppercase': 'on', 'require_numbers': 2, 'require_special_chars': 1,
+            'expiry_days': 60, 'history_count': 3, 'lockout_threshold': 4, 'lockout_duration_minutes': 15,
+        })
+        assert response.status_code == 302
+
+        with app.app_context():
+            after = get_security_config()
+            assert after.version == before.version + 1
+            assert (after.password_policy.min_length, after.password_policy.require_numbers) == (16, 2)
+            assert after.password_policy.require_lowercase is False
+            assert db.session.query(PasswordPolicy).count() == 1
+            assert db.session.query(SecurityLog).filter_by(action='password_policy_updated').count() == 1
+            PasswordPolicy.metadata.drop_all(db.engine, tables=security_tables)
+
+    def test_whitelist_last_used_writes_are_bounded(self, app, monkeypatch):
+        """last_used_at is written once per entry per interval, in a bounded cache"""
+        monkeypatch.setattr(IPSecurityManager, '_last_used_writes', TTLCache(ttl=3600, capacity=2))
+        with app.app_context():
+            IPWhitelist.__table__.create(db.engine)
+            user = User(username='roamer', email='roamer@test.local', first_name='R', last_name='Test', role='admin')
+            user.set_password('testpass123')
+            db.session.add(user)
+            db.session.commit()
+            for cidr in ('10.0.1.0/24', '10.0.2.0/24', '10.0.3.0/24'):
+                db.session.add(IPWhitelist(user_id=user.id, ip_address=cidr))
+            db.session.commit()
+            invalidate_security_config()
+
+            updates = []
+
+            def record(conn, cursor, statement, parameters, context, executemany):
+                if statement.startswith('UPDATE ip_whitelist'):
+                    updates.append(statement)
+
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                for _ in range(3):
+                    assert IPSecurityManager.is_ip_whitelisted(user.id, '10.0.1.5')
+                assert len(updates) == 1
+                for ip_address in ('10.0.2.5', '10.0.3.5', '10.0.2.6'):
+                    assert IPSecurityManager.is_ip_whitelisted(user.id, ip_address)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+
+            assert len(updates) == 3
+            assert IPSecurityManager._last_used_writes.stats()['size'] == 2
+            IPWhitelist.__table__.drop(db.engine)
+
+    def test_signal_reaches_other_workers(self, app):
+        """Another worker sharing the signal file rebuilds on its next read"""
+        other_worker = SecurityConfigCache(app.extensions['security_config'].signal_path, check_interval=0)
+        with app.app_context():
+            assert 'audit_export' not in other_worker.get().feature_flags
+            admin = User(username='signal_admin', email='signal@test.local',
+                         first_name='Signal', last_name='Admin', role='admin')
+            admin.set_password('testpass123')
+            db.session.add(admin)
+            db.session.flush()
+            db.session.add(FeatureFlag(flag_name='audit_export', is_enabled=True, feature_type='export',
+                                       updated_by_id=admin.id))
+            db.session.commit()
+            invalidate_security_config()
+
+            assert other_worker.get().feature_flags['audit_export'].is_enabled
+            assert other_worker.get().feature_flags['audit_export'].is_enabled
+            assert other_worker.loads == 2
@@ -0,0 +1,131 @@
+"""
+Tests for the request inspection in security_middleware
+Verifies the XSS sanitizer and SQL keyword matcher against the original
+per-pattern implementations, lazy sanitized_data and the Server-Timing header
+"""
+
+import pytest
+import random
+import re
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from config import TestingConfig
+from models import db
+from security_middleware import InputSanitizer, SQLInjectionProtection
+
+
+def _reference_sanitize(data):
+    """The original sequential re.sub passes"""
+    for pattern in InputSanitizer.DANGEROUS_PATTERNS:
+        data = re.sub(pattern, '', data, flags=re.IGNORECASE | re.DOTALL)
+    return data
+
+
+def _reference_sql_check(data):
+    """The original substring scan over the upper-cased value"""
+    data_upper = data.upper()
+    return any(keyword in data_upper for keyword in SQLInjectionProtection.DANGEROUS_KEYWORDS)
+
+
+KNOWN_INPUTS = [
+    '<ifrjavascript:ame src=x>',
+    '<scr<script>x</script>ipt>alert(1)</script>',
+    '<img src=x onerror=alert(1)>',
+    'JaVaScRiPt:alert(1)',
+    '<objonclick=ect data=x>',
+    'قلم رصاص أزرق',
+    "1' UNION SELECT password FROM users --",
+    'xp_cmdshell',
+    'a/*b*/c; DROP TABLE items',
+]
+
+
+def _random_inputs(count=2000, seed=7):
+    alphabet = ['<', '>', '/', '=', ' ', ':', 'script', 'iframe', 'embed', 'object',
+                'javascript', 'on', 'click', 'x', 'SELECT', '--', ';', '*', 'xp_', 'a']
+    generator = random.Random(seed)
+    return [''.join(generator.choice(alphabet) for _ in range(generator.randint(1, 12)))
+            for _ in range(count)]
+
+
+class TestInputInspection:
+    """Tests for InputSanitizer and SQLInjectionProtection"""
+
+    def test_nested_pattern_is_removed(self):
+        """Removing one pattern must not leave a tag the later passes would have stripped"""
+        assert InputSanitizer.sanitize_input('<ifrjavascript:ame src=x>') == ''
+
+    def test_sanitizer_matches_sequential_passes(self):
+        for value in KNOWN_INPUTS + _random_inputs():
+            assert InputSanitizer.sanitize_input(value) == _reference_sanitize(value), value
+
+    def test_sql_matcher_matches_substring_scan(self):
+        for value in KNOWN_INPUTS + _random_inputs():
+            assert SQLInjectionProtection.check_sql_injection(value) == _reference_sql_check(value), value
+
+    def test_nested_containers(self):
+        """Dicts and lists are sanitized recursively; the SQL check walks dict values"""
+        data = {'name': '<embed src=x>قلم', 'tags': ['javascript:x', 7]}
+        assert InputSanitizer.sanitize_input(data) == {'name': 'قلم', 'tags': ['x', 7]}
+        assert SQLInjectionProtection.check_sql_injection({'q': 'pen', 'sort': 'name; drop'})
+        assert not SQLInjectionProtection.check_sql_injection({'q': 'pen'})
+
+
+class TestRequestInspection:
+    """Tests for the middleware hooks"""
+
+    @pytest.fixture
+    def app(self, monkeypatch):
+        monkeypatch.setattr(TestingConfig, 'SECURITY_SERVER_TIMING', True, raising=False)
+        app = create_app('testing')
+        app.config['RATE_LIMIT_ENABLED'] = False
+        app.config['AUDIT_LOGGING_ENABLED'] = False
+
+        from flask import request
+
+        @app.route('/_probe/ignore', methods=['POST'])
+        def probe_ignore():
+            return 'ok'
+
+        @app.route('/_probe/read', methods=['POST'])
+        def probe_read():
+            first = request.sanitized_data
+            assert request.sanitized_data is first
+            return first['note']
+
+        with app.app_context():
+            db.create_all()
+        yield app
+        with app.app_context():
+            db.drop_all()
+
+    def test_sanitized_data_is_lazy(self, app, monkeypatch):
+        """The form is sanitized once, and only when a view reads sanitized_data"""
+        calls = []
+        original = InputSanitizer.sanitize_input
+        monkeypatch.setattr(InputSanitizer, 'sanitize_input',
+                            staticmethod(lambda data: calls.append(data) or original(data)))
+        client = app.test_client()
+
+        assert client.post('/_probe/ignore', data={'note': '<embed>x'}).status_code == 200
+        assert calls == []
+
+        response = client.post('/_probe/read', data={'note': '<embed>x'})
+        assert response.get_data(as_text=True) == 'x'
+        assert [data for data in calls if isinstance(data, dict)] == [{'note': '<embed>x'}]
+
+    def test_server_timing_header(self, app):
+        """SECURITY_SERVER_TIMING adds the inspection time to every response"""
+        client = app.test_client()
+        response = client.post('/_probe/read?q=pen', data={'note': 'x'})
+        header = response.headers.get('Server-Timing')
+        assert header is not None
+        assert re.fullmatch(r'security-inspection;dur=\d+\.\d{3}', header)
+
+    def test_injection_returns_400(self, app):
+        client = app.test_client()
+        assert client.get('/auth/login?q=1%20UNION%20SELECT%201').status_code == 400
@@ -0,0 +1,105 @@
+"""
+Tests for the security dashboard rollups
+Verifies that batched and ORM log writes keep the hourly/daily counters current
+"""
+
+import pytest
+import sys
+import os
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from models import db, SecurityRollup
+from audit_writer import AuditWriter
+from security_middleware import SecurityLog
+from security_services import SecurityAlert
+from security_rollups import get_security_dashboard_stats, rebuild_security_rollups
+import security_rollups
+
+
+@pytest.fixture
+def app():
+    """In-memory application with the security log tables"""
+    app = create_app('testing')
+    app.config['RATE_LIMIT_ENABLED'] = False
+    with app.app_context():
+        db.create_all()
+        SecurityLog.__table__.create(db.engine)
+        SecurityAlert.__table__.create(db.engine)
+    yield app
+    with app.app_context():
+        SecurityAlert.__table__.drop(db.engine)
+        SecurityLog.__table__.drop(db.engine)
+        db.drop_all()
+
+
+def login_row(status):
+    return {'action': 'login', 'status': status, 'timestamp': datetime.utcnow()}
+
+
+class TestSecurityRollups:
+    """Tests for security_rollups"""
+
+    def test_audit_batches_update_rollups(self, app):
+        """Failed logins written by the audit writer are counted without scanning the log"""
+        writer = AuditWriter(batch_size=2, autostart=False)
+        writer.app = app
+        for status in ('failed', 'failed', 'success'):
+            writer.enqueue(login_row(status))
+        writer.flush()
+
+        with app.app_context():
+            stats = get_security_dashboard_stats()
+            assert stats['failed_logins_today'] == 2
+            assert stats['logins'] == 1
+
+    def test_alert_acknowledgement_moves_count(self, app):
+        """Acknowledging a critical alert removes it from the open count"""
+        with app.app_context():
+            alert = SecurityAlert(alert_type='suspicious_login', severity='critical', title='t')
+            db.session.add(alert)
+            db.session.commit()
+
+            stats = get_security_dashboard_stats()
+            assert stats['critical_alerts'] == 1
+            assert stats['alerts_today'] == 1
+            assert stats['alert_types'] == {'suspicious_login': 1}
+
+            alert.is_acknowledged = True
+            db.session.commit()
+            assert get_security_dashboard_stats()['critical_alerts'] == 0
+            assert get_security_dashboard_stats()['alerts_today'] == 1
+
+    def test_failed_rollup_write_is_rolled_back_alone(self, app, monkeypatch):
+        """A failing delta write undoes its partial counts, keeps the log row and logs an error"""
+        def fail_midway(conn, deltas):
+            conn.execute(SecurityRollup.__table__.insert().values(
+                period='hour', bucket=datetime.utcnow(), source='log', kind='partial',
+                severity='', status='success', count=1
+            ))
+            raise RuntimeError('rollup write failed')
+
+        monkeypatch.setattr(security_rollups, 'apply_rollup_deltas', fail_midway)
+        with app.app_context():
+            errors = []
+            monkeypatch.setattr(app.logger, 'error', errors.append)
+            db.session.add(SecurityLog(action='login', status='failed', timestamp=datetime.utcnow()))
+            db.session.commit()
+
+            assert db.session.query(SecurityLog).count() == 1
+            assert db.session.query(SecurityRollup).count() == 0
+            assert len(errors) == 1 and 'rebuild-security-rollups' in errors[0]
+
+    def test_rebuild_matches_incremental_counts(self, app):
+        """Rebuilding from the raw tables reproduces the maintained counters"""
+        writer = AuditWriter(autostart=False)
+        writer.app = app
+        writer.enqueue(login_row('failed'))
+        writer.flush()
+
+        with app.app_context():
+            before = get_security_dashboard_stats()
+            rebuild_security_rollups()
+            assert get_security_dashboard_stats() == before
@@ -0,0 +1,163 @@
+"""
+Tests for the session cache
+Verifies LRU lookups with TTL expiry, batched activity writes and SessionManager
+creation, revocation and IP-change alerts on top of the cache
+"""
+
+import pytest
+import sys
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import event
+from app import create_app
+from models import db, User
+from session_cache import SessionCache, SessionSnapshot, get_session_cache
+from security_services import SessionManager, SessionToken, SecurityAlert
+import session_cache
+
+
+@pytest.fixture
+def app():
+    """One user with an empty session cache"""
+    app = create_app('testing')
+    app.config['RATE_LIMIT_ENABLED'] = False
+
+    with app.app_context():
+        db.create_all()
+        # نماذج security_enhanced مسجلة في metadata خاصة بها
+        security_tables = [SessionToken.__table__, SecurityAlert.__table__]
+        SessionToken.metadata.create_all(db.engine, tables=security_tables)
+        user = User(username='keeper', email='keeper@test.local', first_name='k', last_name='Test', role='admin')
+        user.set_password('testpass123')
+        db.session.add(user)
+        db.session.commit()
+        app.user_id = user.id
+
+    cache = get_session_cache()
+    cache.invalidate(user_id=app.user_id)
+    cache._pending.clear()
+    yield app
+    with app.app_context():
+        SessionToken.metadata.drop_all(db.engine, tables=security_tables)
+        db.drop_all()
+
+
+def _snapshot(token_hash, session_id=1, user_id='u1', last_activity=None):
+    return SessionSnapshot(SimpleNamespace(
+        id=session_id, user_id=user_id, token_hash=token_hash, ip_address='10.0.0.1',
+        expires_at=datetime.utcnow() + timedelta(hours=1), is_active=True, revoked_at=None,
+        last_activity=last_activity,
+    ))
+
+
+def _add_token(user_id, token, last_activity):
+    row = SessionToken(
+        user_id=user_id, token=token, token_hash=f'hash-{token}', ip_address='10.0.0.1', user_agent='pytest',
+        expires_at=datetime.utcnow() + timedelta(hours=24), last_activity=last_activity,
+    )
+    db.session.add(row)
+    db.session.commit()
+    return row
+
+
+class TestSessionCache:
+    """Tests for session_cache and SessionManager"""
+
+    def test_lru_hit_miss_and_ttl(self, monkeypatch):
+        """Lookups hit until the TTL passes; the least recently used entry is evicted first"""
+        clock = [1000.0]
+        monkeypatch.setattr(session_cache.time, 'monotonic', lambda: clock[0])
+        cache = SessionCache(capacity=2, ttl=30)
+
+        assert cache.get('a') is None
+        cache.put(_snapshot('a'))
+        cache.put(_snapshot('b'))
+        assert cache.get('a').token_hash == 'a'
+        cache.put(_snapshot('c'))
+        assert cache.get('b') is None
+        assert cache.get('a') is not None
+
+        clock[0] += 31
+        assert cache.get('a') is None
+        assert cache.stats()['size'] == 1
+        assert (cache.stats()['hits'], cache.stats()['misses']) == (2, 3)
+
+    def test_touch_is_gated_by_staleness(self):
+        """last_activity is only queued for writing once it is older than activity_flush_seconds"""
+        cache = SessionCache(activity_flush_seconds=60)
+        now = datetime.utcnow()
+        snapshot = _snapshot('a', last_activity=now - timedelta(seconds=10))
+
+        cache.touch(snapshot, now)
+        assert not cache.has_pending()
+        assert snapshot.last_activity == now
+
+        cache.touch(snapshot, now + timedelta(seconds=51))
+        assert cache.has_pending()
+        assert snapshot.persisted_activity == now + timedelta(seconds=51)
+
+    def test_flush_activity_is_one_batched_update(self, app):
+        """Pending activity for several sessions is written by one executemany UPDATE"""
+        with app.app_context():
+            first = _add_token(app.user_id, 'first', datetime.utcnow() - timedelta(minutes=5))
+            second = _add_token(app.user_id, 'second', datetime.utcnow() - timedelta(minutes=5))
+            cache = SessionCache(activity_flush_seconds=60)
+            now = datetime.utcnow()
+            for row in (first, second):
+                cache.touch(SessionSnapshot(row), now)
+
+            updates = []
+
+            def record(conn, cursor, statement, parameters, context, executemany):
+                if statement.startswith('UPDATE session_tokens'):
+                    updates.append(executemany)
+
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                assert cache.flush_activity() == 2
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+
+            assert updates == [True]
+            assert not cache.has_pending()
+            db.session.expire_all()
+            assert {row.last_activity for row in db.session.query(SessionToken).all()} == {now}
+
+    def test_create_session_expires_idle_sessions(self, app):
+        """Sessions idle for more than an hour are deactivated in one statement; recent ones stay"""
+        with app.app_context():
+            _add_token(app.user_id, 'idle', datetime.utcnow() - timedelta(hours=2))
+            _add_token(app.user_id, 'recent', datetime.utcnow() - timedelta(minutes=5))
+
+            SessionManager.create_session(app.user_id, ip_address='10.0.0.1', user_agent='pytest')
+
+            db.session.expire_all()
+            active = {row.token: row.is_active for row in db.session.query(SessionToken).filter(SessionToken.token != None)}
+            assert active['idle'] is False
+            assert active['recent'] is True
+            assert sum(active.values()) == 2
+
+    def test_revoke_all_sessions_evicts_cache(self, app):
+        """A revoked session is not served from the cache of this process"""
+        with app.app_context():
+            _add_token(app.user_id, 'live', datetime.utcnow())
+            assert SessionManager.validate_session('hash-live') is not None
+            assert get_session_cache().get('hash-live') is not None
+
+            assert SessionManager.revoke_all_sessions(app.user_id) == 1
+            assert get_session_cache().get('hash-live') is None
+            assert SessionManager.validate_session('hash-live') is None
+
+    def test_ip_change_alerts_once_per_ip(self, app):
+        """Each new IP for a session raises one alert, however many requests follow"""
+        with app.app_context():
+            _add_token(app.user_id, 'roaming', datetime.utcnow())
+            for ip_address in ('10.0.0.1', '10.0.0.2', '10.0.0.2', '10.0.0.3', '10.0.0.2'):
+                assert SessionManager.validate_session('hash-roaming', ip_address) is not None
+
+            alerts = db.session.query(SecurityAlert).filter_by(alert_type='ip_change').all()
+            assert sorted(alert.ip_address for alert in alerts) == ['10.0.0.2', '10.0.0.3']
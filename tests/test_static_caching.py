@@ -0,0 +1,32 @@
+"""
+Tests for static file caching
+Verifies that only fingerprinted static URLs get the long browser max-age
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+
+
+class TestStaticCaching:
+    """Tests for FingerprintedStaticFlask"""
+
+    def test_only_fingerprinted_urls_are_cached_long(self):
+        app = create_app('testing')
+        client = app.test_client()
+        with app.test_request_context():
+            fingerprinted = app.jinja_env.globals['static_url']('css/base.css')
+        assert 'v=' in fingerprinted
+
+        response = client.get(fingerprinted)
+        assert response.status_code == 200
+        assert response.cache_control.max_age == 365 * 24 * 3600
+        response.close()
+
+        response = client.get('/static/css/base.css')
+        assert response.status_code == 200
+        assert response.cache_control.max_age is None
+        response.close()
@@ -0,0 +1,78 @@
+"""
+Tests for incremental stock costing
+Verifies weighted-average and FIFO issue costs and the maintained stock-value total
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from models import db, Item, ItemCategory_Model, ItemCostLayer
+from stock_ledger import adjust_stock, apply_stock_movements
+from stock_costing import get_stock_value, rebuild_stock_costing
+
+
+@pytest.fixture(params=['weighted_average', 'fifo'])
+def app(request):
+    """Item A with 10 units at 2 (opening balance built by rebuild_stock_costing)"""
+    app = create_app('testing')
+    app.config['RATE_LIMIT_ENABLED'] = False
+    app.config['INVENTORY_COSTING_METHOD'] = request.param
+
+    with app.app_context():
+        db.create_all()
+        category = ItemCategory_Model(code='CAT', name='Category', category_type='other')
+        db.session.add(category)
+        db.session.flush()
+        item = Item(code='A', name='A', unit='unit', category_id=category.id, quantity_in_stock=10, unit_price=2)
+        db.session.add(item)
+        db.session.flush()
+        app.item_id = item.id
+        rebuild_stock_costing()
+        db.session.commit()
+
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+class TestStockCosting:
+    """Tests for stock_costing"""
+
+    def test_issue_cost_follows_method(self, app):
+        """Issues are valued at the running average or from the oldest layers"""
+        with app.app_context():
+            assert get_stock_value() == 20
+            assert adjust_stock(app.item_id, 10, unit_cost=4) == 40
+            issued = -adjust_stock(app.item_id, -15)
+            db.session.commit()
+
+            if app.config['INVENTORY_COSTING_METHOD'] == 'fifo':
+                # 10 × 2 من الطبقة الافتتاحية ثم 5 × 4
+                assert issued == 40
+                assert ItemCostLayer.query.filter_by(is_open=True).count() == 1
+            else:
+                # المتوسط 60 / 20 = 3
+                assert issued == 45
+            assert db.session.get(Item, app.item_id).stock_value == pytest.approx(60 - issued)
+            assert get_stock_value() == pytest.approx(60 - issued)
+
+    def test_full_issue_clears_value(self, app):
+        """Issuing the whole balance leaves no rounding residue in item or total"""
+        with app.app_context():
+            adjust_stock(app.item_id, 3, unit_cost=1.1)
+            applied = apply_stock_movements([(app.item_id, -7), (app.item_id, -6)])
+            db.session.commit()
+            assert applied[app.item_id] == (-13, pytest.approx(-23.3))
+            assert db.session.get(Item, app.item_id).stock_value == 0
+            assert get_stock_value() == pytest.approx(0)
+
+    def test_unvalued_balance_issues_at_unit_price(self, app):
+        """A balance left without stock_value (column added to an old database) issues at unit_price"""
+        with app.app_context():
+            db.session.execute(db.update(Item.__table__).values(stock_value=0))
+            db.session.execute(db.delete(ItemCostLayer.__table__))
+            assert adjust_stock(app.item_id, -2) == pytest.approx(-4)
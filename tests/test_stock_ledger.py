@@ -0,0 +1,105 @@
+"""
+Tests for the atomic stock ledger
+Verifies conditional updates, multi-item movements and optimistic version conflicts
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from models import db, Item, ItemCategory_Model, Transaction, User
+from stock_ledger import (
+    apply_stock_movements, adjust_stock, InsufficientStockError, StockConflictError
+)
+
+
+@pytest.fixture
+def app():
+    """Two items with known balances"""
+    app = create_app('testing')
+    app.config['RATE_LIMIT_ENABLED'] = False
+
+    with app.app_context():
+        db.create_all()
+        category = ItemCategory_Model(code='CAT', name='Category', category_type='other')
+        db.session.add(category)
+        db.session.flush()
+        for code, quantity in (('A', 10), ('B', 3)):
+            db.session.add(Item(code=code, name=code, unit='unit', category_id=category.id,
+                                quantity_in_stock=quantity))
+        db.session.commit()
+        app.item_ids = {item.code: item.id for item in Item.query.all()}
+
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+class TestStockLedger:
+    """Tests for stock_ledger"""
+
+    def test_movements_update_loaded_items(self, app):
+        """Several movements of the same item are netted and loaded objects see the new balance"""
+        with app.app_context():
+            item = db.session.get(Item, app.item_ids['A'])
+            assert item.quantity_in_stock == 10
+            apply_stock_movements([(item.id, -4), (app.item_ids['B'], 2), (item.id, -1)])
+            db.session.commit()
+            assert item.quantity_in_stock == 5
+            assert item.stock_version == 1
+            assert db.session.get(Item, app.item_ids['B']).quantity_in_stock == 5
+
+    def test_insufficient_stock_is_rejected(self, app):
+        """An issue larger than the balance fails without changing any item"""
+        with app.app_context():
+            with pytest.raises(InsufficientStockError) as error:
+                apply_stock_movements([(app.item_ids['A'], -1), (app.item_ids['B'], -4)])
+            db.session.rollback()
+            assert error.value.available == 3
+            assert db.session.get(Item, app.item_ids['A']).quantity_in_stock == 10
+            assert db.session.get(Item, app.item_ids['B']).quantity_in_stock == 3
+
+    def test_version_conflict_is_retriable(self, app):
+        """A stale expected version surfaces as a retriable conflict"""
+        with app.app_context():
+            item_id = app.item_ids['A']
+            adjust_stock(item_id, 1)
+            db.session.commit()
+            with pytest.raises(StockConflictError) as error:
+                adjust_stock(item_id, -1, expected_version=0)
+            assert error.value.retriable
+            db.session.rollback()
+            adjust_stock(item_id, -1, expected_version=1)
+            db.session.commit()
+            assert db.session.get(Item, item_id).quantity_in_stock == 10
+
+    def test_editing_an_adjustment_does_not_move_stock(self, app):
+        """edit_transaction follows STOCK_DIRECTION: only issues and returns change the balance"""
+        with app.app_context():
+            user = User(username='keeper', email='keeper@test.local', first_name='k', last_name='Test', role='admin')
+            user.set_password('testpass123')
+            db.session.add(user)
+            db.session.flush()
+            for reference, transaction_type in (('T-ADJ', 'adjustment'), ('T-ISS', 'issue')):
+                db.session.add(Transaction(reference_number=reference, transaction_type=transaction_type,
+                                           item_id=app.item_ids['A'], quantity=2, created_by_id=user.id))
+            db.session.commit()
+            transaction_ids = {t.reference_number: t.id for t in Transaction.query.all()}
+            user_id = user.id
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = user_id
+            session['_fresh'] = True
+        for reference in ('T-ADJ', 'T-ISS'):
+            response = client.post(f"/inventory/transactions/{transaction_ids[reference]}/edit",
+                                   data={'quantity': '5', 'unit_price': '0', 'description': ''})
+            assert response.status_code == 302
+
+        with app.app_context():
+            # التسوية لا تغير الرصيد، وزيادة الإصدار من 2 إلى 5 تنقصه 3
+            assert db.session.get(Item, app.item_ids['A']).quantity_in_stock == 7
+            assert {t.reference_number: t.quantity for t in Transaction.query.all()} == {'T-ADJ': 5, 'T-ISS': 5}
@@ -0,0 +1,104 @@
+"""
+Tests for point-in-time stock snapshots
+Verifies backward replay, snapshot writing and replay from the nearest snapshot
+"""
+
+import pytest
+import sys
+import os
+from datetime import date, datetime, time, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from models import (
+    db, User, UserPermission, Item, ItemCategory_Model, Transaction, StockSnapshot, InventoryCountItem
+)
+from stock_snapshots import stock_as_of, take_stock_snapshot
+
+
+@pytest.fixture
+def app():
+    """Item A: +10 ten days ago, -3 five days ago, +5 yesterday (balance 12)"""
+    app = create_app('testing')
+    app.config['RATE_LIMIT_ENABLED'] = False
+
+    with app.app_context():
+        db.create_all()
+        category = ItemCategory_Model(code='CAT', name='Category', category_type='other')
+        user = User(username='keeper', email='keeper@test.local', first_name='k', last_name='Test', role='admin')
+        user.set_password('testpass123')
+        db.session.add_all([category, user])
+        db.session.flush()
+        item = Item(code='A', name='A', unit='unit', category_id=category.id, quantity_in_stock=12, unit_price=2)
+        db.session.add(item)
+        db.session.flush()
+        app.item_id = item.id
+        app.user_id = user.id
+
+        noon = datetime.combine(date.today(), time(12))
+        for number, (kind, quantity, days_ago) in enumerate((('purchase', 10, 10), ('issue', 3, 5), ('purchase', 5, 1))):
+            db.session.add(Transaction(
+                reference_number=f'T-{number}', transaction_type=kind, item_id=item.id, quantity=quantity,
+                created_by_id=user.id, transaction_date=noon - timedelta(days=days_ago),
+            ))
+        db.session.commit()
+
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+def days_ago(days):
+    return date.today() - timedelta(days=days)
+
+
+class TestStockSnapshots:
+    """Tests for stock_snapshots"""
+
+    def test_replay_back_from_current_balance(self, app):
+        """Without snapshots the balance is the current quantity minus later movements"""
+        with app.app_context():
+            assert stock_as_of(days_ago(11))[app.item_id] == 0
+            assert stock_as_of(days_ago(7))[app.item_id] == 10
+            assert stock_as_of(days_ago(3))[app.item_id] == 7
+            assert stock_as_of(date.today())[app.item_id] == 12
+
+    def test_replay_from_nearest_snapshot(self, app):
+        """Later dates start from the nearest earlier snapshot and add only newer movements"""
+        with app.app_context():
+            assert take_stock_snapshot(days_ago(6)) == 1
+            assert take_stock_snapshot(days_ago(11)) == 0
+            db.session.commit()
+            snapshot = StockSnapshot.query.filter_by(snapshot_date=days_ago(6)).one()
+            assert snapshot.quantity == 10
+            assert snapshot.value == 20
+
+            # تعديل اللقطة يثبت أن الاستعلام يبدأ منها بدلاً من إعادة تشغيل كل الحركات
+            snapshot.quantity = 100
+            db.session.commit()
+            assert stock_as_of(days_ago(3))[app.item_id] == 97
+            assert stock_as_of(days_ago(8))[app.item_id] == 10
+
+    def test_inventory_count_uses_live_balance_for_today(self, app):
+        """A count without a past date reads quantity_in_stock; a past date replays from the snapshot"""
+        with app.app_context():
+            db.session.add(UserPermission(user_id=app.user_id, permission_key='inventory_add_count',
+                                          permission_name='inventory_add_count', permission_category='test',
+                                          is_allowed=True))
+            take_stock_snapshot(days_ago(6))
+            # لقطة منحرفة عن الحركات: لا تظهر في جرد اليوم
+            StockSnapshot.query.one().quantity = 100
+            db.session.commit()
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = app.user_id
+            session['_fresh'] = True
+        for count_date in ('', days_ago(3).isoformat()):
+            response = client.post('/inventory/inventory-counts/new', data={'count_type': 'full', 'count_date': count_date})
+            assert response.status_code == 302
+
+        with app.app_context():
+            quantities = sorted(row.system_quantity for row in InventoryCountItem.query.all())
+            assert quantities == [12, 97]
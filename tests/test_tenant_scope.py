@@ -0,0 +1,90 @@
+"""
+Tests for the automatic tenant scope
+Verifies that center users only see their own center's rows without explicit filters
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from flask_login import login_user
+from app import create_app
+from models import db, User, VocationalCenter, Item, ItemCategory_Model
+from tenant_scope import unscoped
+
+
+@pytest.fixture
+def app():
+    """Two centers with one item each and one worker in the first center"""
+    app = create_app('testing')
+    app.config['RATE_LIMIT_ENABLED'] = False
+
+    with app.app_context():
+        db.create_all()
+        first = VocationalCenter(code='C1', name_ar='المركز الأول')
+        second = VocationalCenter(code='C2', name_ar='المركز الثاني')
+        category = ItemCategory_Model(code='CAT', name='Category', category_type='other')
+        db.session.add_all([first, second, category])
+        db.session.flush()
+
+        for code, center in (('I1', first), ('I2', second)):
+            db.session.add(Item(code=code, name=code, unit='unit', category_id=category.id, center_id=center.id))
+        for username, role, center in (('worker', 'worker', first), ('founder', 'founder', None)):
+            user = User(username=username, email=f'{username}@test.local', first_name=username,
+                        last_name='Test', role=role, center_id=center.id if center else None)
+            user.set_password('testpass123')
+            db.session.add(user)
+        db.session.commit()
+        app.first_center_id = first.id
+        app.second_item_id = Item.query.filter_by(code='I2').one().id
+
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+def request_as(app, username):
+    """Request context that ran the before_request hooks for the given user"""
+    ctx = app.test_request_context('/')
+    ctx.push()
+    login_user(User.query.filter_by(username=username).one())
+    app.preprocess_request()
+    return ctx
+
+
+class TestTenantScope:
+    """Tests for tenant_scope"""
+
+    def test_center_user_sees_only_own_center(self, app):
+        """Unfiltered queries and primary-key lookups are limited to the user's center"""
+        ctx = request_as(app, 'worker')
+        try:
+            db.session.expunge_all()
+            assert [item.code for item in Item.query.all()] == ['I1']
+            assert db.session.get(Item, app.second_item_id) is None
+            with unscoped():
+                assert Item.query.count() == 2
+        finally:
+            ctx.pop()
+
+    def test_founder_is_not_scoped(self, app):
+        """Founders keep the cross-center view"""
+        ctx = request_as(app, 'founder')
+        try:
+            assert Item.query.count() == 2
+        finally:
+            ctx.pop()
+
+    def test_bulk_update_is_scoped(self, app):
+        """ORM bulk updates from a center user only touch that center's rows"""
+        ctx = request_as(app, 'worker')
+        try:
+            Item.query.update({Item.minimum_quantity: 5}, synchronize_session=False)
+            db.session.commit()
+            with unscoped():
+                quantities = {item.code: item.minimum_quantity for item in Item.query.all()}
+            assert quantities == {'I1': 5, 'I2': 0}
+        finally:
+            ctx.pop()